@@ -1,64 +1,74 @@
 """
 Aplicação Streamlit para preenchimento automático de documentos de estágio.
+
+A página é dividida em fragmentos (st.fragment): editar um campo dos dados do
+estudante ou do estágio, paginar os turnos ou clicar em gerar reexecuta só a
+seção correspondente. A página inteira só é reexecutada quando muda um campo
+usado pelas outras seções (disciplina, turma, semestre, polo, carga horária).
 """
 import streamlit as st
 from datetime import date, time
-from typing import List, Tuple
+from typing import List
 import os
-import json
-import fitz  # PyMuPDF
 
-from models import UserData, InternshipData, ShiftData, DocumentData, ActivityStorage
-from docs_filler import DocFiller
-from mid_internship_fillers import CompanyActivitiesDocxFiller, SupervisionReportDocxFiller
+from models import (
+    DOCUMENT_FILLING_TITLE, UserData, InternshipData, ShiftData, ShiftIndex, DocumentData, ActivityStorage
+)
+from planning import HoursSummary, plan_for_hours
+from docs_filler import PDFConfig
+from build_graph import build_final_documents, build_mid_internship_documents
+from scheduler import INTERACTIVE, INTERACTIVE_TIMEOUT, SchedulerBusy, get_scheduler
+from output_retention import get_retention_manager, OutputRetentionManager
+from metrics import start_metrics_server
+from warmup import WarmupReport, start_warmup
+from template_repository import TemplateKey, get_template_repository
+from schedule import build_template_schedule, get_schedule_cache, template_schedule_version
+from shift_io import EXPORT_FORMATS, available_formats, export_shifts, import_shifts
+from tabular_io import import_formats
 import datetime
-import zipfile
 from date_utils import (
     generate_date_range, is_brazilian_holiday, get_holiday_name, 
     get_weekday_name, get_custom_holidays
 )
 
 
-TEMPLATE_CONFIG_FILE = "./internship_template.json"
+# Turnos exibidos por página nas listas de turnos
+SHIFTS_PER_PAGE = 20
 
+# Problemas de importação listados na tela (o restante é resumido)
+MAX_IMPORT_ISSUES = 50
+
+SHIFT_SORT_OPTIONS = {
+    "Data (crescente)": ShiftIndex.ORDER_DATE,
+    "Data (decrescente)": ShiftIndex.ORDER_DATE_DESC,
+    "Ordem de adição": ShiftIndex.ORDER_ADDED,
+}
+
+
+@st.cache_resource
+def start_output_retention() -> OutputRetentionManager:
+    """Inicia (uma vez por processo) a varredura de retenção de filled_docs"""
+    manager = get_retention_manager(PDFConfig.OUTPUT_PATH)
+    manager.start_background_sweep()
+    return manager
 
-def load_template_config() -> dict:
-    """Carrega a configuração do template de estágio"""
-    if os.path.exists(TEMPLATE_CONFIG_FILE):
-        try:
-            with open(TEMPLATE_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-
-def generate_mid_internship_documents(document_data: DocumentData, ra: str) -> Tuple[str, bool]:
-    """Gera os documentos intermediários e retorna o caminho do ZIP e se faltou conversão para PDF"""
-    fillers = (
-        CompanyActivitiesDocxFiller,
-        SupervisionReportDocxFiller,
-    )
-    generated_paths: list[str] = []
-    for filler_cls in fillers:
-        filler = filler_cls(document_data)
-        generated_paths.append(filler.fill())
 
-    mid_zip = f"./filled_docs/mid_documents_{ra}.zip"
-    os.makedirs(os.path.dirname(mid_zip), exist_ok=True)
-    with zipfile.ZipFile(mid_zip, "w") as zf:
-        for path in generated_paths:
-            if path and os.path.exists(path):
-                zf.write(path, os.path.basename(path))
+@st.cache_resource
+def start_metrics_exporter():
+    """Inicia (uma vez por processo) o servidor local de métricas em /metrics"""
+    return start_metrics_server()
 
-    missing_pdf = all(p.lower().endswith('.docx') for p in generated_paths if p)
-    return mid_zip, missing_pdf
+
+@st.cache_resource
+def start_warmup_routine() -> WarmupReport:
+    """Inicia (uma vez por processo) o aquecimento de templates, feriados e LibreOffice"""
+    return start_warmup()
 
 
 def init_session_state():
     """Inicializa o estado da sessão"""
     if 'shifts' not in st.session_state:
-        st.session_state.shifts = []
+        st.session_state.shifts = ShiftIndex()
     if 'step' not in st.session_state:
         st.session_state.step = 1
     if 'custom_holidays_initialized' not in st.session_state:
@@ -67,42 +77,183 @@ def init_session_state():
         st.session_state.activity_descriptions = {}
 
 
+def load_shifts_from_template(template_config: dict, polo: str, version: tuple):
+    """
+    Aponta a sessão para o cronograma compartilhado desta versão do template.
+    
+    O cronograma é montado uma vez por processo e versão (template, revisão e
+    calendário do polo); a sessão guarda só a referência aos turnos e às
+    descrições, que são somente leitura (ver editable_shifts).
+    """
+    schedule = get_schedule_cache().get(
+        version, lambda: build_template_schedule(template_config, polo, version))
+    st.session_state.shifts = schedule.shifts
+    st.session_state.activity_descriptions = schedule.descriptions
+
+
+def editable_shifts() -> ShiftIndex:
+    """Turnos da sessão para alteração (copia o cronograma compartilhado na primeira alteração)"""
+    if st.session_state.shifts.frozen:
+        st.session_state.shifts = st.session_state.shifts.copy()
+    return st.session_state.shifts
+
+
+def editable_descriptions() -> dict:
+    """Descrições da sessão para alteração (copia as do template na primeira alteração)"""
+    if not isinstance(st.session_state.activity_descriptions, dict):
+        st.session_state.activity_descriptions = dict(st.session_state.activity_descriptions)
+    return st.session_state.activity_descriptions
+
+
 def add_shift(shift: ShiftData):
     """Adiciona um turno à lista"""
-    st.session_state.shifts.append(shift)
+    editable_shifts().append(shift)
 
 
-def remove_shift(index: int):
-    """Remove um turno da lista"""
-    st.session_state.shifts.pop(index)
+def remove_shift(shift_id: int):
+    """Remove um turno da lista pelo id"""
+    editable_shifts().remove(shift_id)
 
 
-def merge_pdfs_to_single_file(files: dict, ra: str) -> str:
-    """Mescla todos os PDFs gerados em um único arquivo"""
-    output_path = f"./filled_docs/documentos_estagio_{ra}.pdf"
+def render_shift_page(shift_index: ShiftIndex, key: str, order: str = ShiftIndex.ORDER_DATE,
+                      removable: bool = False):
+    """Renderiza somente a página atual da lista de turnos"""
+    pages = shift_index.page_count(SHIFTS_PER_PAGE)
+    page_key = f"{key}_page"
+    page_number = 1
+    if pages > 1:
+        # Ajustar a página se turnos foram removidos
+        if st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = pages
+        page_number = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, step=1, key=page_key)
     
-    # Criar documento PDF final
-    merged_pdf = fitz.open()
+    for shift_id, shift in shift_index.page(page_number, SHIFTS_PER_PAGE, order):
+        with st.container():
+            if removable:
+                col1, col2, col3 = st.columns([3, 1, 1])
+            else:
+                col1, col2 = st.columns([3, 1])
+            
+            with col1:
+                # Destacar feriados
+                if shift.atividade_realizada == "FERIADO":
+                    st.write(f"🎉 **{shift.data}** | {shift.horario_inicio} - {shift.horario_fim}")
+                    st.caption("⚠️ FERIADO")
+                else:
+                    st.write(f"**{shift.data}** | {shift.horario_inicio} - {shift.horario_fim}")
+                    st.caption(shift.atividade_realizada)
+            
+            with col2:
+                st.metric("Horas", f"{shift.get_hours():.1f}h")
+            
+            if removable:
+                with col3:
+                    if st.button("🗑️", key=f"{key}_remove_{shift_id}", help="Remover turno"):
+                        remove_shift(shift_id)
+                        st.rerun()
+            
+            st.divider()
     
-    # Ordem desejada dos documentos
-    order = ["checklist", "frequency_sheets", "internship_declaration", "mandatory_activity"]
+    if pages > 1:
+        first = (page_number - 1) * SHIFTS_PER_PAGE + 1
+        last = min(page_number * SHIFTS_PER_PAGE, len(shift_index))
+        st.caption(f"Turnos {first}–{last} de {len(shift_index)}")
     
-    for category in order:
-        if category in files:
-            for file_path in files[category]:
-                if os.path.exists(file_path):
-                    # Abrir e adicionar cada PDF
-                    pdf_document = fitz.open(file_path)
-                    merged_pdf.insert_pdf(pdf_document)
-                    pdf_document.close()
+    # Estatísticas
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total de Horas", f"{shift_index.total_hours:.1f}h")
+    with col2:
+        st.metric("Total de Turnos", len(shift_index))
+    with col3:
+        st.metric("Feriados", shift_index.holiday_count)
+
+
+def get_hours_summary(carga_horaria: float) -> HoursSummary:
+    """Plano de carga horária dos turnos da sessão (total mantido incrementalmente pelo ShiftIndex)"""
+    return plan_for_hours(st.session_state.shifts.total_hours, carga_horaria)
+
+
+def render_hours_summary(summary: HoursSummary, internship_data: dict):
+    """Métricas de carga horária e divisão das horas complementares"""
+    col1, col2, col3, col4 = st.columns(4)
     
-    # Salvar PDF mesclado
-    merged_pdf.save(output_path)
-    merged_pdf.close()
+    with col1:
+        st.metric("Carga Horária Total", f"{summary.carga_horaria:g}h")
     
-    return output_path
+    with col2:
+        st.metric("Horas de Turnos", f"{summary.shift_hours:.1f}h")
+    
+    with col3:
+        if not summary.is_complete:
+            st.metric("Horas Faltantes", f"{summary.missing_hours:.1f}h", delta=f"-{summary.missing_hours:.1f}h")
+        else:
+            st.metric("Status", "✅ Completo", delta="0h")
+    
+    with col4:
+        if not summary.is_complete:
+            st.metric("Horas Complementares", f"{summary.complementary_hours:.1f}h")
+        else:
+            st.metric("Horas Complementares", "0h")
+    
+    # Explicação
+    if not summary.is_complete:
+        st.info(
+            f"⚙️ **Cálculo Automático:** Faltam {summary.missing_hours:.1f}h para completar a carga horária. "
+            f"Serão adicionadas automaticamente:\n"
+            f"- **{summary.mandatory_hours:.1f}h** de '{internship_data.get('titulo_atividade_obrigatoria', 'Atividade Obrigatória')}'\n" +
+            (f"- **{summary.document_hours:.1f}h** de '{DOCUMENT_FILLING_TITLE}'" if summary.document_hours > 0 else "")
+        )
+
 
+# Valores iniciais dos formulários (compartilhados pelos widgets e pelas leituras do estado)
+USER_DEFAULTS = {
+    "nome": "", "ra": "", "polo": "", "turma": "",
+    "telefone_ddd": "", "telefone_numero": "", "email": "", "semestre": "",
+    "data": "Brasília, 12 de Junho de 2026",
+}
+INTERNSHIP_DEFAULTS = {
+    "disciplina_estagio": "Alimentos",
+    "codigo_disciplina": "7433-100",
+    "local_estagio": "UNIP",
+    "supervisor_estagio": "Breno Silva de Abreu",
+    "carga_horaria": 100,
+    "titulo_atividade_obrigatoria": "Análise de Rotulagem",
+}
+
+
+def get_user_data() -> dict:
+    """Dados do estudante a partir do estado dos widgets (sem renderizar o formulário)"""
+    return {name: st.session_state.get(f"user_{name}", default) for name, default in USER_DEFAULTS.items()}
+
+
+def get_internship_data() -> dict:
+    """Dados do estágio a partir do estado dos widgets (sem renderizar o formulário)"""
+    data = {name: st.session_state.get(f"internship_{name}", default)
+            for name, default in INTERNSHIP_DEFAULTS.items()}
+    data["carga_horaria"] = int(data["carga_horaria"])
+    return data
+
+
+def get_page_inputs() -> tuple:
+    """Campos que alteram outras seções da página (template, feriados, carga horária)"""
+    user_data, internship_data = get_user_data(), get_internship_data()
+    return (
+        internship_data["codigo_disciplina"], user_data["turma"], user_data["semestre"], user_data["polo"],
+        internship_data["carga_horaria"], internship_data["titulo_atividade_obrigatoria"],
+    )
 
+
+def rerun_page_if_needed():
+    """
+    Chamado ao fim dos fragmentos dos formulários: editar nome, e-mail etc. reexecuta
+    só o fragmento; se mudou um campo usado por outras seções, reexecuta a página.
+    """
+    if st.session_state.get('page_inputs') != get_page_inputs():
+        st.rerun()
+
+
+@st.fragment
 def render_user_data_form():
     """Renderiza o formulário de dados do usuário"""
     st.header("📋 Dados do Estudante")
@@ -110,36 +261,27 @@ def render_user_data_form():
     col1, col2 = st.columns(2)
     
     with col1:
-        nome = st.text_input("Nome completo*", placeholder="João Silva")
-        ra = st.text_input("RA*", placeholder="123456789")
-        polo = st.text_input("Polo*", placeholder="Polo Central")
-        turma = st.text_input("Turma*", placeholder="Turma A")
+        st.text_input("Nome completo*", placeholder="João Silva", key="user_nome")
+        st.text_input("RA*", placeholder="123456789", key="user_ra")
+        st.text_input("Polo*", placeholder="Polo Central", key="user_polo")
+        st.text_input("Turma*", placeholder="Turma A", key="user_turma")
     
     with col2:
-        telefone_ddd = st.text_input("DDD*", placeholder="11", max_chars=2)
-        telefone_numero = st.text_input("Telefone*", placeholder="987654321", max_chars=9)
-        email = st.text_input("E-mail*", placeholder="joao.silva@aluno.unip.br")
-        semestre = st.text_input("Semestre*", placeholder="2025/2")
+        st.text_input("DDD*", placeholder="11", max_chars=2, key="user_telefone_ddd")
+        st.text_input("Telefone*", placeholder="987654321", max_chars=9, key="user_telefone_numero")
+        st.text_input("E-mail*", placeholder="joao.silva@aluno.unip.br", key="user_email")
+        st.text_input("Semestre*", placeholder="2025/2", key="user_semestre")
     
-    data_assinatura = st.text_input(
+    st.text_input(
         "Data de assinatura*",
-        value="Brasília, 12 de Junho de 2026",
-        help="Formato livre, ex: 'Brasília, 12 de Junho de 2026'"
+        value=USER_DEFAULTS["data"],
+        help="Formato livre, ex: 'Brasília, 12 de Junho de 2026'",
+        key="user_data"
     )
-    
-    return {
-        "nome": nome,
-        "ra": ra,
-        "polo": polo,
-        "turma": turma,
-        "telefone_ddd": telefone_ddd,
-        "telefone_numero": telefone_numero,
-        "email": email,
-        "semestre": semestre,
-        "data": data_assinatura
-    }
+    rerun_page_if_needed()
 
 
+@st.fragment
 def render_internship_data_form():
     """Renderiza o formulário de dados do estágio"""
     st.header("🏥 Dados do Estágio")
@@ -147,46 +289,103 @@ def render_internship_data_form():
     col1, col2 = st.columns(2)
     
     with col1:
-        disciplina_estagio = st.text_input(
+        st.text_input(
             "Disciplina de Estágio*",
-            value="Alimentos"
+            value=INTERNSHIP_DEFAULTS["disciplina_estagio"],
+            key="internship_disciplina_estagio"
         )
-        codigo_disciplina = st.text_input(
+        st.text_input(
             "Código da Disciplina*",
-            value="7433-100"
+            value=INTERNSHIP_DEFAULTS["codigo_disciplina"],
+            key="internship_codigo_disciplina"
         )
-        local_estagio = st.text_input(
+        st.text_input(
             "Local do Estágio*",
-            value="UNIP"
+            value=INTERNSHIP_DEFAULTS["local_estagio"],
+            key="internship_local_estagio"
         )
     
     with col2:
-        supervisor_estagio = st.text_input(
+        st.text_input(
             "Supervisor do Estágio*",
-            value="Breno Silva de Abreu"
+            value=INTERNSHIP_DEFAULTS["supervisor_estagio"],
+            key="internship_supervisor_estagio"
         )
-        carga_horaria = st.number_input(
+        st.number_input(
             "Carga Horária Total*",
             min_value=1,
-            value=100,
-            step=10
+            value=INTERNSHIP_DEFAULTS["carga_horaria"],
+            step=10,
+            key="internship_carga_horaria"
         )
-        titulo_atividade = st.text_input(
+        st.text_input(
             "Título da Atividade Obrigatória*",
-            value="Análise de Rotulagem"
+            value=INTERNSHIP_DEFAULTS["titulo_atividade_obrigatoria"],
+            key="internship_titulo_atividade_obrigatoria"
         )
+    rerun_page_if_needed()
+
+
+@st.fragment
+def render_shift_import_export(polo: str = ""):
+    """
+    Importa/exporta turnos e descrições em lote (CSV, XLSX ou ICS).
+    
+    Escolher o arquivo reexecuta só este fragmento; importar reexecuta a página,
+    porque os turnos alimentam o resumo de carga horária e a geração.
+    """
+    st.write("Importe vários turnos de uma vez a partir de uma planilha ou calendário:")
+    st.caption("Colunas: data (DD/MM/YYYY), horario_inicio, horario_fim (HH:MM), atividade e descricao (opcional). "
+               "No ICS, cada evento é um turno.")
+    
+    uploaded = st.file_uploader("Arquivo de turnos", type=import_formats(), key="shift_import_file")
+    mark_holidays = st.checkbox("Marcar turnos em feriados como FERIADO", value=True, key="shift_import_holidays")
+    
+    if uploaded is not None:
+        result = import_shifts(uploaded.getvalue(), uploaded.name,
+                               mark_holidays=mark_holidays, polo=polo)
+        
+        # Ignorar turnos já cadastrados (mesma data e horários)
+        existing = {(s.data, s.horario_inicio, s.horario_fim) for s in st.session_state.shifts}
+        new_shifts = [s for s in result.shifts if (s.data, s.horario_inicio, s.horario_fim) not in existing]
+        
+        if result.errors:
+            with st.expander(f"❌ {len(result.errors)} linha(s) com erro (serão ignoradas)", expanded=not result.shifts):
+                for issue in result.errors[:MAX_IMPORT_ISSUES]:
+                    st.write(f"- {issue}")
+                if len(result.errors) > MAX_IMPORT_ISSUES:
+                    st.caption(f"... e mais {len(result.errors) - MAX_IMPORT_ISSUES} erro(s)")
+        if result.warnings:
+            with st.expander(f"⚠️ {len(result.warnings)} turno(s) em feriado", expanded=False):
+                for issue in result.warnings[:MAX_IMPORT_ISSUES]:
+                    st.write(f"- {issue}")
+        if len(new_shifts) < len(result.shifts):
+            st.info(f"ℹ️ {len(result.shifts) - len(new_shifts)} turno(s) já cadastrado(s) serão ignorados.")
+        
+        if new_shifts:
+            if st.button(f"📥 Importar {len(new_shifts)} turno(s)", type="primary", use_container_width=True):
+                editable_shifts().extend(new_shifts)
+                editable_descriptions().update(result.descriptions)
+                st.success(f"✅ {len(new_shifts)} turno(s) importado(s)!")
+                st.rerun()
     
-    return {
-        "disciplina_estagio": disciplina_estagio,
-        "codigo_disciplina": codigo_disciplina,
-        "local_estagio": local_estagio,
-        "supervisor_estagio": supervisor_estagio,
-        "carga_horaria": int(carga_horaria),
-        "titulo_atividade_obrigatoria": titulo_atividade
-    }
+    if st.session_state.shifts:
+        st.write("---")
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            fmt = st.selectbox("Formato de exportação", available_formats(), key="shift_export_format")
+        extension, mime = EXPORT_FORMATS[fmt]
+        with col2:
+            st.download_button(
+                "📤 Exportar Turnos",
+                data=export_shifts(st.session_state.shifts, st.session_state.activity_descriptions, fmt),
+                file_name=f"turnos{extension}",
+                mime=mime,
+                use_container_width=True
+            )
 
 
-def render_shifts_form():
+def render_shifts_form(polo: str = ""):
     """Renderiza o formulário de turnos/atividades"""
     st.header("⏰ Turnos e Atividades")
     
@@ -207,7 +406,7 @@ def render_shifts_form():
     st.markdown("---")
     
     # Tabs para escolher modo de entrada
-    tab1, tab2 = st.tabs(["📅 Range de Datas", "➕ Turno Individual"])
+    tab1, tab2, tab3 = st.tabs(["📅 Range de Datas", "➕ Turno Individual", "📥 Importar/Exportar"])
     
     # Tab 1: Range de datas
     with tab1:
@@ -300,7 +499,7 @@ def render_shifts_form():
                         
                         # Verificar feriado
                         atividade_dia = atividade_range
-                        if auto_detect_holidays and is_brazilian_holiday(current_date):
+                        if auto_detect_holidays and is_brazilian_holiday(current_date, polo):
                             atividade_dia = "FERIADO"
                             holidays_count += 1
                         
@@ -341,8 +540,8 @@ def render_shifts_form():
             data_turno = st.date_input("Data", value=date.today(), key="single_date", format="DD/MM/YYYY")
             
             # Verificar se é feriado
-            if is_brazilian_holiday(data_turno):
-                holiday_name = get_holiday_name(data_turno)
+            if is_brazilian_holiday(data_turno, polo):
+                holiday_name = get_holiday_name(data_turno, polo)
                 st.warning(f"⚠️ Esta data é feriado: **{holiday_name}**")
         
         atividade = st.text_area(
@@ -355,7 +554,7 @@ def render_shifts_form():
         # Botão para preencher automaticamente "FERIADO"
         col1, col2 = st.columns([1, 1])
         with col1:
-            if is_brazilian_holiday(data_turno):
+            if is_brazilian_holiday(data_turno, polo):
                 if st.button("🎉 Marcar como Feriado", use_container_width=True):
                     st.session_state.single_activity_override = "FERIADO"
                     st.rerun()
@@ -377,6 +576,10 @@ def render_shifts_form():
                     st.rerun()
                 else:
                     st.error("Por favor, descreva a atividade realizada.")
+    
+    # Tab 3: Importação/exportação em lote
+    with tab3:
+        render_shift_import_export(polo)
     st.markdown("---")
     
     # Mostrar turnos adicionados
@@ -388,65 +591,19 @@ def render_shifts_form():
         with col1:
             sort_option = st.selectbox(
                 "Ordenar por:",
-                ["Data (crescente)", "Data (decrescente)", "Ordem de adição"],
+                list(SHIFT_SORT_OPTIONS),
                 key="sort_option"
             )
         with col3:
             if st.button("🗑️ Limpar Todos", type="secondary"):
-                st.session_state.shifts = []
+                st.session_state.shifts = ShiftIndex()
                 st.rerun()
         
-        # Ordenar turnos
-        display_shifts = st.session_state.shifts.copy()
-        if sort_option == "Data (crescente)":
-            display_shifts.sort(key=lambda x: tuple(reversed(x.data.split('/'))))
-        elif sort_option == "Data (decrescente)":
-            display_shifts.sort(key=lambda x: tuple(reversed(x.data.split('/'))), reverse=True)
-        
-        # Mostrar turnos
-        for idx, shift in enumerate(display_shifts):
-            original_idx = st.session_state.shifts.index(shift)
-            
-            with st.container():
-                col1, col2, col3 = st.columns([3, 1, 1])
-                
-                with col1:
-                    # Destacar feriados
-                    if shift.atividade_realizada == "FERIADO":
-                        st.write(f"🎉 **{shift.data}** | {shift.horario_inicio} - {shift.horario_fim}")
-                        st.caption("⚠️ FERIADO")
-                    else:
-                        st.write(f"**{shift.data}** | {shift.horario_inicio} - {shift.horario_fim}")
-                        st.caption(shift.atividade_realizada)
-                
-                with col2:
-                    horas = (
-                        int(shift.horario_fim.split(':')[0]) - 
-                        int(shift.horario_inicio.split(':')[0])
-                    )
-                    st.metric("Horas", f"{horas}h")
-                
-                with col3:
-                    if st.button("🗑️", key=f"remove_{original_idx}", help="Remover turno"):
-                        remove_shift(original_idx)
-                        st.rerun()
-                
-                st.divider()
-        
-        # Estatísticas
-        total_horas = sum([
-            int(shift.horario_fim.split(':')[0]) - int(shift.horario_inicio.split(':')[0])
-            for shift in st.session_state.shifts
-        ])
-        feriados_count = sum([1 for shift in st.session_state.shifts if shift.atividade_realizada == "FERIADO"])
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total de Horas", f"{total_horas}h")
-        with col2:
-            st.metric("Total de Turnos", len(st.session_state.shifts))
-        with col3:
-            st.metric("Feriados", feriados_count)
+        # Mostrar apenas a página atual, na ordem escolhida
+        render_shift_page(
+            st.session_state.shifts, key="shifts_form",
+            order=SHIFT_SORT_OPTIONS[sort_option], removable=True
+        )
     else:
         st.warning("⚠️ Nenhum turno cadastrado ainda. Adicione pelo menos um turno para continuar.")
 
@@ -471,44 +628,9 @@ def render_activity_descriptions_form(internship_data: dict):
     
     st.write("Adicione descrições detalhadas para cada dia de atividade:")
     
-    # Calcular horas e mostrar previsão
-    total_shift_hours = sum([shift.get_hours() for shift in st.session_state.shifts])
-    carga_horaria = internship_data.get("carga_horaria", 100)
-    missing_hours = max(0, carga_horaria - total_shift_hours)
-    
+    # Mostrar previsão de carga horária
     with st.expander("📊 Resumo de Carga Horária", expanded=True):
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Carga Horária Total", f"{carga_horaria}h")
-        
-        with col2:
-            st.metric("Horas de Turnos", f"{total_shift_hours:.1f}h")
-        
-        with col3:
-            if missing_hours > 0:
-                st.metric("Horas Faltantes", f"{missing_hours:.1f}h", delta=f"-{missing_hours:.1f}h")
-            else:
-                st.metric("Status", "✅ Completo", delta="0h")
-        
-        with col4:
-            complementary_hours = 0
-            if missing_hours > 0:
-                atividade_obrigatoria_hours = min(20, missing_hours)
-                remaining = missing_hours - atividade_obrigatoria_hours
-                complementary_hours = atividade_obrigatoria_hours + remaining
-                st.metric("Horas Complementares", f"{complementary_hours:.1f}h")
-            else:
-                st.metric("Horas Complementares", "0h")
-        
-        # Explicação
-        if missing_hours > 0:
-            st.info(
-                f"⚙️ **Cálculo Automático:** Faltam {missing_hours:.1f}h para completar a carga horária. "
-                f"Serão adicionadas automaticamente:\n"
-                f"- **{min(20, missing_hours):.1f}h** de '{internship_data.get('titulo_atividade_obrigatoria', 'Atividade Obrigatória')}'\n" +
-                (f"- **{max(0, missing_hours - 20):.1f}h** de 'Preenchimento de Documentos'" if missing_hours > 20 else "")
-            )
+        render_hours_summary(get_hours_summary(internship_data.get("carga_horaria", 100)), internship_data)
     
     st.write("---")
     
@@ -537,13 +659,13 @@ def render_activity_descriptions_form(internship_data: dict):
             
             if st.button("💾 Salvar Descrição", key=f"save_desc_{date_str}"):
                 if description and description.strip():
-                    st.session_state.activity_descriptions[date_str] = description.strip()
+                    editable_descriptions()[date_str] = description.strip()
                     st.success(f"✅ Descrição salva para {date_str}")
                     st.rerun()
                 else:
                     # Remover se vazio
                     if date_str in st.session_state.activity_descriptions:
-                        del st.session_state.activity_descriptions[date_str]
+                        del editable_descriptions()[date_str]
                         st.info("Descrição removida")
                         st.rerun()
     
@@ -583,192 +705,50 @@ def validate_form_data(user_data: dict, internship_data: dict) -> tuple[bool, Li
     return len(errors) == 0, errors
 
 
-def main():
-    """Função principal da aplicação"""
-    st.set_page_config(
-        page_title="Preenchedor de Documentos de Estágio",
-        page_icon="📄",
-        layout="wide"
+@st.fragment
+def render_shift_details():
+    """Lista paginada dos turnos (trocar de página reexecuta só este fragmento)"""
+    render_shift_page(st.session_state.shifts, key="shift_details")
+
+
+def build_document_data() -> DocumentData:
+    """DocumentData da sessão, montado somente quando um documento é gerado"""
+    user_data, internship_data = get_user_data(), get_internship_data()
+    if not user_data.get('data') and st.session_state.get('template_document_date'):
+        user_data['data'] = st.session_state.template_document_date
+    return DocumentData(
+        user=UserData(**user_data),
+        internship=InternshipData(**internship_data),
+        shifts=st.session_state.shifts.to_list(),
+        activity_descriptions=[
+            ActivityStorage(encounter_date=date_str, description=desc)
+            for date_str, desc in st.session_state.activity_descriptions.items()
+        ]
     )
-    
-    init_session_state()
-    
-    # Cabeçalho
-    st.title("📄 Sistema de Preenchimento de Documentos de Estágio")
-    st.markdown("---")
-    
-    # Carregar template do supervisor silenciosamente
-    template_config = load_template_config()
-    
-    if template_config:
-        # Auto-carregar template se ainda não foi carregado
-        if not st.session_state.shifts:
-            # Gerar turnos baseado no template
-            all_dates = generate_date_range(
-                date.fromisoformat(template_config['start_date']),
-                date.fromisoformat(template_config['end_date'])
-            )
-            
-            filtered_dates = [
-                d for d in all_dates 
-                if d.weekday() in template_config['weekdays'] and not is_brazilian_holiday(d)
-            ]
-            
-            # Adicionar turnos automaticamente
-            for date_obj in filtered_dates:
-                date_str = date_obj.strftime("%d/%m/%Y")
-                
-                # Pegar descrição do template ou usar "FERIADO" se for feriado
-                if is_brazilian_holiday(date_obj):
-                    activity = "FERIADO"
-                else:
-                    activity = template_config.get('activity_descriptions', {}).get(
-                        date_str,
-                        template_config.get('default_activity', 'Atividade de estágio')
-                    )
-                
-                shift = ShiftData(
-                    horario_inicio=template_config['start_time'],
-                    horario_fim=template_config['end_time'],
-                    data=date_str,
-                    atividade_realizada=activity
-                )
-                st.session_state.shifts.append(shift)
-                
-                # Adicionar descrição detalhada se existir
-                if date_str in template_config.get('activity_descriptions', {}):
-                    st.session_state.activity_descriptions[date_str] = template_config['activity_descriptions'][date_str]
-        
-        # Mostrar apenas informação resumida
-        st.info(f"✅ Template de estágio carregado: {len(st.session_state.shifts)} encontros configurados pelo supervisor.")
-    else:
-        st.warning("⚠️ Nenhum template configurado pelo supervisor. Entre em contato com seu supervisor.")
-    
-    st.markdown("---")
-    
-    # Formulários
-    user_data = render_user_data_form()
-    st.markdown("---")
-    
-    internship_data = render_internship_data_form()
-    
-    # Auto-preencher data do documento se existir no template
-    template_config = load_template_config()
-    if template_config and 'document_date' in template_config:
-        if not user_data.get('data'):
-            user_data['data'] = template_config['document_date']
-    
-    st.markdown("---")
-    
-    # Mostrar resumo dos turnos (somente visualização)
-    if st.session_state.shifts:
-        st.header("📋 Turnos Cadastrados pelo Supervisor")
-        
-        with st.expander("Ver Detalhes dos Turnos", expanded=False):
-            # Ordenar turnos por data
-            display_shifts = sorted(
-                st.session_state.shifts, 
-                key=lambda x: tuple(reversed(x.data.split('/')))
-            )
-            
-            for shift in display_shifts:
-                col1, col2 = st.columns([3, 1])
-                
-                with col1:
-                    if shift.atividade_realizada == "FERIADO":
-                        st.write(f"🎉 **{shift.data}** | {shift.horario_inicio} - {shift.horario_fim}")
-                        st.caption("⚠️ FERIADO")
-                    else:
-                        st.write(f"**{shift.data}** | {shift.horario_inicio} - {shift.horario_fim}")
-                        st.caption(shift.atividade_realizada)
-                
-                with col2:
-                    horas = shift.get_hours()
-                    st.metric("Horas", f"{horas:.1f}h")
-                
-                st.divider()
-            
-            # Estatísticas
-            total_horas = sum([shift.get_hours() for shift in st.session_state.shifts])
-            feriados_count = sum([1 for shift in st.session_state.shifts if shift.atividade_realizada == "FERIADO"])
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total de Horas", f"{total_horas:.1f}h")
-            with col2:
-                st.metric("Total de Turnos", len(st.session_state.shifts))
-            with col3:
-                st.metric("Feriados", feriados_count)
-    
-    st.markdown("---")
-    
-    # Mostrar resumo de carga horária
-    if st.session_state.shifts and internship_data.get('carga_horaria'):
-        st.header("📊 Resumo de Carga Horária")
-        
-        total_shift_hours = sum([shift.get_hours() for shift in st.session_state.shifts])
-        carga_horaria = internship_data.get("carga_horaria", 100)
-        missing_hours = max(0, carga_horaria - total_shift_hours)
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Carga Horária Total", f"{carga_horaria}h")
-        
-        with col2:
-            st.metric("Horas de Turnos", f"{total_shift_hours:.1f}h")
-        
-        with col3:
-            if missing_hours > 0:
-                st.metric("Horas Faltantes", f"{missing_hours:.1f}h", delta=f"-{missing_hours:.1f}h")
-            else:
-                st.metric("Status", "✅ Completo", delta="0h")
-        
-        with col4:
-            if missing_hours > 0:
-                atividade_obrigatoria_hours = min(20, missing_hours)
-                remaining = missing_hours - atividade_obrigatoria_hours
-                complementary_hours = atividade_obrigatoria_hours + remaining
-                st.metric("Horas Complementares", f"{complementary_hours:.1f}h")
-            else:
-                st.metric("Horas Complementares", "0h")
-        
-        # Explicação
-        if missing_hours > 0:
-            st.info(
-                f"⚙️ **Cálculo Automático:** Faltam {missing_hours:.1f}h para completar a carga horária. "
-                f"Serão adicionadas automaticamente:\n"
-                f"- **{min(20, missing_hours):.1f}h** de '{internship_data.get('titulo_atividade_obrigatoria', 'Atividade Obrigatória')}'\n" +
-                (f"- **{max(0, missing_hours - 20):.1f}h** de 'Preenchimento de Documentos'" if missing_hours > 20 else "")
-            )
-    
-    st.markdown("---")
 
-    # Preparar dados para geração de documentos
-    user = UserData(**user_data)
-    internship = InternshipData(**internship_data)
-    activity_storage_list = [
-        ActivityStorage(encounter_date=date_str, description=desc)
-        for date_str, desc in st.session_state.activity_descriptions.items()
-    ]
-    document_data = DocumentData(
-        user=user,
-        internship=internship,
-        shifts=st.session_state.shifts,
-        activity_descriptions=activity_storage_list
-    )
+
+@st.fragment
+def render_generation_section(retention: OutputRetentionManager):
+    """Botões de geração e downloads (um clique reexecuta só este fragmento)"""
+    user_data, internship_data = get_user_data(), get_internship_data()
 
     # Seção de Documentos Intermediários
     st.subheader("📝 Documentos Intermediários")
     if st.button("✅ Gerar Documentos Intermediários", type="secondary", use_container_width=True):
         try:
-            mid_zip, missing_pdf = generate_mid_internship_documents(document_data, user_data['ra'])
+            document_data = build_document_data()
+            with get_scheduler().slot(INTERACTIVE, user_data['ra'], INTERACTIVE_TIMEOUT), \
+                    retention.in_flight(user_data['ra']):
+                mid_zip, missing_pdf, mid_report = build_mid_internship_documents(document_data)
+            retention.record_write(mid_zip)
             if missing_pdf:
                 st.warning(
                     "⚠️ Nenhuma conversão para PDF detectada. "
                     "Instale o LibreOffice (soffice) para gerar arquivos PDF automaticamente."
                 )
             st.success("✅ Documentos Intermediários gerados com sucesso!")
+            st.caption(f"Relatórios: {mid_report.summary()}")
+            retention.record_access(mid_zip)
             with open(mid_zip, "rb") as fmid:
                 st.download_button(
                     "⬇️ Baixar Documentos Intermediários",
@@ -779,6 +759,8 @@ def main():
                 )
         except FileNotFoundError:
             st.error("⚠️ Arquivos intermediários não configurados. Peça ao supervisor para carregar os templates no sistema.")
+        except (SchedulerBusy, TimeoutError):
+            st.warning("⏳ Muitas gerações em andamento no momento. Tente novamente em alguns instantes.")
         except Exception as e:
             st.error(f"❌ Erro ao gerar documentos intermediários: {str(e)}")
 
@@ -792,11 +774,8 @@ def main():
         if not final_enabled:
             btn_label = "🚀 Gerar Todos os Documentos (disponível a partir de Junho)"
         if st.button(btn_label, type="primary", use_container_width=True, disabled=not final_enabled):
-            if not final_enabled:
-                st.warning("Documentos finais estarão disponíveis a partir de Junho.")
-            else:
-                # Validar dados
-                is_valid, errors = validate_form_data(user_data, internship_data)
+            # Validar dados
+            is_valid, errors = validate_form_data(user_data, internship_data)
             
             if not is_valid:
                 st.error("❌ Erro na validação dos dados:")
@@ -805,23 +784,8 @@ def main():
             else:
                 with st.spinner("Gerando documentos..."):
                     try:
-                        # Criar objetos de dados
-                        user = UserData(**user_data)
-                        internship = InternshipData(**internship_data)
-                        
-                        # Criar ActivityStorage objects
-                        activity_storage_list = [
-                            ActivityStorage(encounter_date=date_str, description=desc)
-                            for date_str, desc in st.session_state.activity_descriptions.items()
-                        ]
-                        
                         # Criar DocumentData (calculará atividades complementares automaticamente)
-                        document_data = DocumentData(
-                            user=user,
-                            internship=internship,
-                            shifts=st.session_state.shifts,
-                            activity_descriptions=activity_storage_list
-                        )
+                        document_data = build_document_data()
                         
                         # Mostrar resumo de cálculo
                         with st.expander("📊 Resumo de Carga Horária", expanded=True):
@@ -834,30 +798,34 @@ def main():
                                 st.metric("Horas Complementares", f"{document_data.get_total_complementary_hours():.1f}h")
                             
                             with col3:
-                                st.metric("Total", f"{document_data.get_total_hours():.1f}h / {internship.carga_horaria}h")
+                                st.metric("Total", f"{document_data.get_total_hours():.1f}h / {document_data.internship.carga_horaria}h")
                             
                             if document_data.complementary_activities:
                                 st.write("**Atividades Complementares Adicionadas:**")
                                 for act in document_data.complementary_activities:
                                     st.write(f"• {act.titulo}: {act.horas:.1f}h")
                         
-                        # Gerar documentos
-                        doc_filler = DocFiller(document_data)
-                        results = doc_filler.fill_all_documents()
-                        
-                        # Mesclar todos os PDFs em um único arquivo
-                        merged_pdf_path = merge_pdfs_to_single_file(results, user_data['ra'])
+                        # Gerar documentos (protegidos da retenção enquanto em andamento);
+                        # só são refeitos os documentos cujas entradas mudaram
+                        with get_scheduler().slot(INTERACTIVE, user_data['ra'], INTERACTIVE_TIMEOUT), \
+                                retention.in_flight(user_data['ra']):
+                            results, merged_pdf_path, build_report = build_final_documents(document_data)
+                        retention.record_write(merged_pdf_path)
                         
                         # Sucesso
                         st.success("✅ Documentos gerados com sucesso!")
+                        st.caption(f"Documentos: {build_report.summary()}")
                         try:
-                            mid_zip, missing_pdf = generate_mid_internship_documents(document_data, user_data['ra'])
+                            with get_scheduler().slot(INTERACTIVE, user_data['ra'], INTERACTIVE_TIMEOUT), \
+                                    retention.in_flight(user_data['ra']):
+                                mid_zip, missing_pdf, _ = build_mid_internship_documents(document_data)
                         except FileNotFoundError:
                             st.warning("⚠️ Templates dos relatórios intermediários não estão disponíveis. Peça ao supervisor para configurar os templates.")
                         except Exception as e:
                             st.error(f"⚠️ Falha ao gerar os documentos intermediários automaticamente: {str(e)}")
                         else:
                             st.success("✅ Documentos Intermediários gerados automaticamente!")
+                            retention.record_access(mid_zip)
                             with open(mid_zip, "rb") as fmid:
                                 st.download_button(
                                     "⬇️ Baixar Documentos Intermediários",
@@ -880,6 +848,7 @@ def main():
                                     st.write(f"  • {os.path.basename(file)}")
                         
                         # Botão de download do PDF mesclado
+                        retention.record_access(merged_pdf_path)
                         with open(merged_pdf_path, "rb") as f:
                             st.download_button(
                                 label="⬇️ Baixar todos os documentos (PDF único)",
@@ -889,14 +858,105 @@ def main():
                                 use_container_width=True
                             )
                         
+                    except (SchedulerBusy, TimeoutError):
+                        st.warning("⏳ Muitas gerações em andamento no momento. Tente novamente em alguns instantes.")
                     except Exception as e:
                         st.error(f"❌ Erro ao gerar documentos: {str(e)}")
                         st.exception(e)
-                        st.exception(e)
+
+
+def main():
+    """Função principal da aplicação"""
+    st.set_page_config(
+        page_title="Preenchedor de Documentos de Estágio",
+        page_icon="📄",
+        layout="wide"
+    )
+    
+    init_session_state()
+    retention = start_output_retention()
+    start_metrics_exporter()
+    warmup_report = start_warmup_routine()
+    
+    # Cabeçalho
+    st.title("📄 Sistema de Preenchimento de Documentos de Estágio")
+    st.markdown("---")
+    
+    # Resumo do template (preenchido após identificar disciplina/turma/semestre)
+    template_status = st.container()
+    st.markdown("---")
+    
+    # Formulários: cada um é um fragmento, reexecutado sozinho ao editar um campo
+    st.session_state.page_inputs = get_page_inputs()
+    render_user_data_form()
+    st.markdown("---")
+    
+    render_internship_data_form()
+    user_data, internship_data = get_user_data(), get_internship_data()
+    
+    # Carregar o template do supervisor para a disciplina/turma/semestre do estudante
+    templates = get_template_repository()
+    template_key, template_config = templates.resolve(TemplateKey(
+        internship_data.get('codigo_disciplina', ''),
+        user_data.get('turma', ''),
+        user_data.get('semestre', ''),
+    ))
+    
+    with template_status:
+        if template_config:
+            # Recarregar os turnos somente quando o template resolvido (ou sua revisão),
+            # o calendário do polo ou os feriados do período mudarem
+            polo = user_data.get('polo', '')
+            template_state = template_schedule_version(
+                template_key, templates.revision(template_key), template_config, polo)
+            if st.session_state.get('template_state') != template_state or not st.session_state.shifts:
+                load_shifts_from_template(template_config, polo, template_state)
+                st.session_state.template_state = template_state
+            
+            # Mostrar apenas informação resumida
+            st.info(
+                f"✅ Template de estágio carregado ({template_key.label()}): "
+                f"{len(st.session_state.shifts)} encontros configurados pelo supervisor."
+            )
+        else:
+            st.session_state.shifts = ShiftIndex()
+            st.session_state.activity_descriptions = {}
+            st.session_state.pop('template_state', None)
+            st.warning("⚠️ Nenhum template configurado pelo supervisor. Entre em contato com seu supervisor.")
+    
+    # Data do documento do template, usada se o estudante deixar a sua em branco
+    st.session_state.template_document_date = (template_config or {}).get('document_date')
+    
+    st.markdown("---")
+    
+    # Resumo dos turnos e importação/exportação em lote
+    if st.session_state.shifts:
+        st.header("📋 Turnos Cadastrados pelo Supervisor")
+        
+        with st.expander("Ver Detalhes dos Turnos", expanded=False):
+            render_shift_details()
+        
+        # Turnos importados complementam os do supervisor (cópia da sessão, ver editable_shifts)
+        with st.expander("📥 Importar/Exportar Turnos", expanded=False):
+            render_shift_import_export(user_data.get('polo', ''))
+    
+    st.markdown("---")
+    
+    # Mostrar resumo de carga horária
+    if st.session_state.shifts and internship_data.get('carga_horaria'):
+        st.header("📊 Resumo de Carga Horária")
+        
+        render_hours_summary(get_hours_summary(internship_data.get("carga_horaria", 100)), internship_data)
+    
+    st.markdown("---")
+
+    render_generation_section(retention)
     
     # Rodapé
     st.markdown("---")
     st.caption("💡 Preencha todos os campos obrigatórios (*) antes de gerar os documentos.")
+    if not warmup_report.ready:
+        st.caption("⏳ Preparando templates e conversores: a primeira geração pode demorar um pouco mais.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+"""
+Pipeline assíncrono (asyncio) para geração dos documentos intermediários.
+
+Permite manter conversões LibreOffice de vários estudantes em andamento a partir
+de um único event loop, com concorrência limitada por semáforo, timeout por
+conversão e cancelamento (o processo soffice é encerrado se a tarefa for
+cancelada ou exceder o tempo limite). Cada estudante ocupa uma vaga de lote do
+escalonador (scheduler.py), dividida de forma justa entre os supervisores, de
+modo que pedidos interativos continuam sendo atendidos durante o lote.
+
+Exemplo:
+    pipeline = AsyncMidInternshipPipeline(concurrency=4)
+    results = asyncio.run(pipeline.generate_many(lista_de_document_data))
+"""
+import asyncio
+import contextvars
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
+
+from models import DocumentData
+from instrumentation import span
+from metrics import (
+    DOCUMENTS_GENERATED, BUNDLES_GENERATED, BUNDLE_SECONDS, CONVERSION_SECONDS,
+    CONVERSION_FAILURES, QUEUE_DEPTH,
+)
+from scheduler import BATCH, GenerationScheduler, get_scheduler
+from mid_internship_fillers import (
+    BaseDocxFiller, MID_INTERNSHIP_FILLERS, CONVERSION_TIMEOUT,
+    build_soffice_command, get_pdf_path, write_mid_internship_zip,
+)
+
+
+DEFAULT_CONCURRENCY = int(os.environ.get("ESTAGIO_SOFFICE_CONCURRENCY", 2))
+
+
+class ConversionTimeout(RuntimeError):
+    """A conversão DOCX -> PDF excedeu o tempo limite"""
+
+
+async def convert_docx_to_pdf_async(docx_path: str, timeout: float = CONVERSION_TIMEOUT,
+                                    profile_dir: Optional[str] = None) -> str:
+    """Converte um DOCX em PDF com soffice sem bloquear o event loop.
+
+    O processo é encerrado (kill) em caso de timeout ou cancelamento da tarefa.
+    """
+    started = time.perf_counter()
+    with span("soffice.convert", mode="async") as convert_span:
+        try:
+            pdf_path = await _run_soffice_async(docx_path, timeout, profile_dir)
+        except ConversionTimeout:
+            CONVERSION_FAILURES.inc(reason="timeout")
+            raise
+        except (OSError, subprocess.CalledProcessError):
+            CONVERSION_FAILURES.inc(reason="error")
+            raise
+        convert_span.record_file(pdf_path)
+    CONVERSION_SECONDS.observe(time.perf_counter() - started, mode="async")
+    return pdf_path
+
+
+async def _run_soffice_async(docx_path: str, timeout: float, profile_dir: Optional[str]) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        *build_soffice_command(docx_path, profile_dir),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+        # soffice é um script que inicia soffice.bin: o grupo inteiro deve ser encerrado
+        start_new_session=True,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(proc)
+        raise ConversionTimeout(f"soffice excedeu {timeout}s convertendo {os.path.basename(docx_path)}")
+    except asyncio.CancelledError:
+        await _kill(proc)
+        raise
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, "soffice", stderr=stderr)
+    return get_pdf_path(docx_path)
+
+
+def _run_in_executor(executor: ThreadPoolExecutor, func, *args) -> asyncio.Future:
+    """run_in_executor preservando o contexto (span atual) da tarefa que chamou"""
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, ctx.run, func, *args)
+
+
+async def _kill(proc: asyncio.subprocess.Process):
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+
+
+class AsyncMidInternshipPipeline:
+    """Gera os relatórios intermediários de vários estudantes concorrentemente"""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = CONVERSION_TIMEOUT,
+                 executor: Optional[ThreadPoolExecutor] = None,
+                 scheduler: Optional[GenerationScheduler] = None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.scheduler = scheduler or get_scheduler()
+        # Preenchimento de DOCX (python-docx) pode rodar em paralelo
+        self._executor = executor or ThreadPoolExecutor(max_workers=concurrency)
+        # PyMuPDF não é thread-safe: todo trabalho com fitz passa por um único worker
+        self._pdf_executor = ThreadPoolExecutor(max_workers=1)
+        self._profiles: Optional[asyncio.Queue] = None
+        self._profile_root: Optional[str] = None
+        self._waiting = 0
+
+    def _get_profiles(self) -> asyncio.Queue:
+        """Um perfil LibreOffice por vaga de concorrência (soffice não aceita perfis compartilhados)"""
+        if self._profiles is None:
+            self._profile_root = tempfile.mkdtemp(prefix="soffice_profiles_")
+            self._profiles = asyncio.Queue()
+            for slot in range(self.concurrency):
+                self._profiles.put_nowait(os.path.join(self._profile_root, f"slot_{slot}"))
+        return self._profiles
+
+    async def convert(self, docx_path: str) -> str:
+        """Converte respeitando o limite de conversões simultâneas"""
+        profiles = self._get_profiles()
+        self._waiting += 1
+        QUEUE_DEPTH.inc(queue="soffice")
+        try:
+            profile_dir = await profiles.get()
+        finally:
+            self._waiting -= 1
+            QUEUE_DEPTH.dec(queue="soffice")
+        try:
+            return await convert_docx_to_pdf_async(docx_path, self.timeout, profile_dir)
+        finally:
+            profiles.put_nowait(profile_dir)
+
+    @property
+    def queue_depth(self) -> int:
+        """Quantidade de conversões aguardando uma vaga"""
+        return self._waiting
+
+    async def fill_document(self, filler: BaseDocxFiller) -> str:
+        """Preenche um relatório e o converte para PDF (se soffice disponível)"""
+        # PDF pré-renderizado: preenchimento direto, sem conversão
+        pdf_path = await _run_in_executor(self._pdf_executor, filler.render_pdf)
+        if pdf_path:
+            DOCUMENTS_GENERATED.inc(document=filler.__class__.__name__)
+            return pdf_path
+        docx_path = await _run_in_executor(self._executor, filler.fill_docx)
+        DOCUMENTS_GENERATED.inc(document=filler.__class__.__name__)
+        if not shutil.which('soffice'):
+            return docx_path
+        pdf_path = await self.convert(docx_path)
+        await _run_in_executor(self._pdf_executor, filler._add_signature_to_pdf, pdf_path)
+        return pdf_path
+
+    async def generate(self, document_data: DocumentData) -> Tuple[str, bool]:
+        """Equivalente assíncrono de generate_mid_internship_documents.
+
+        Se um dos relatórios falhar, os demais do mesmo estudante são cancelados.
+        O estudante espera uma vaga de lote; o tenant é o supervisor do estágio.
+        """
+        async with self.scheduler.async_slot(BATCH, document_data.internship.supervisor_estagio):
+            return await self._generate(document_data)
+
+    async def _generate(self, document_data: DocumentData) -> Tuple[str, bool]:
+        started = time.perf_counter()
+        with span("mid.generate", ra=document_data.user.ra, mode="async"):
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [
+                        tg.create_task(self.fill_document(filler_cls(document_data)))
+                        for filler_cls in MID_INTERNSHIP_FILLERS
+                    ]
+            except BaseExceptionGroup as group:
+                raise group.exceptions[0]
+            generated_paths = [task.result() for task in tasks]
+            result = await _run_in_executor(
+                self._executor, write_mid_internship_zip, generated_paths, document_data.user.ra
+            )
+        BUNDLE_SECONDS.observe(time.perf_counter() - started, kind="mid")
+        BUNDLES_GENERATED.inc(kind="mid")
+        return result
+
+    async def generate_many(self, documents: Sequence[DocumentData]
+                            ) -> List[Union[Tuple[str, bool], BaseException]]:
+        """Gera os relatórios de vários estudantes; falhas são retornadas na posição do estudante"""
+        return await asyncio.gather(
+            *(self.generate(document_data) for document_data in documents),
+            return_exceptions=True,
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._pdf_executor.shutdown(wait=False)
+        if self._profile_root:
+            shutil.rmtree(self._profile_root, ignore_errors=True)
+            self._profile_root = None
+            self._profiles = None
+
+
+def generate_mid_internship_documents_batch(documents: Sequence[DocumentData],
+                                            concurrency: int = DEFAULT_CONCURRENCY,
+                                            timeout: float = CONVERSION_TIMEOUT
+                                            ) -> List[Union[Tuple[str, bool], BaseException]]:
+    """Ponto de entrada síncrono: gera os relatórios de uma turma em um único event loop"""
+    pipeline = AsyncMidInternshipPipeline(concurrency=concurrency, timeout=timeout)
+    try:
+        return asyncio.run(pipeline.generate_many(documents))
+    finally:
+        pipeline.close()
@@ -0,0 +1,399 @@
+"""
+Geração em lote de uma turma com manifesto e retomada.
+
+Cada estudante concluído (ou que falhou) vira uma linha JSON no manifesto,
+gravada e sincronizada com o disco assim que o estudante termina:
+
+    {"type": "student", "ra": ..., "status": "done" | "failed",
+     "fingerprint": ..., "outputs": [{"path", "bytes", "mtime_ns", "sha256"}],
+     "seconds": ..., "attempts": ..., "finished": ..., "error": ...}
+
+Se a execução morrer no meio (soffice travado, falta de memória), rodar o
+mesmo lote de novo pula os estudantes concluídos cujas entradas não mudaram
+e cujos arquivos continuam no lugar (comparação de tamanho e mtime, sem reler
+os arquivos), e gera apenas os que falharam ou ainda não rodaram. O
+fingerprint de cada estudante cobre o que os fillers de fato escrevem, como na
+geração incremental (build_graph.py): as entradas (get_inputs()) de cada
+documento, que incluem os dados do estudante, os campos do template do
+supervisor usados pelo documento, os digests dos arquivos de template e o
+renderizador (carimbo, LibreOffice ou DOCX). Ao final, uma linha "summary" com o resumo
+da turma é acrescentada ao manifesto.
+
+    python batch_runner.py run --input turma.jsonl --kind mid --manifest turma_mid.jsonl
+    python batch_runner.py run --synthetic 40 --kind final --manifest /tmp/teste.jsonl
+    python batch_runner.py summary --manifest turma_mid.jsonl
+
+    summary = run_batch(lista_de_document_data, "turma_mid.jsonl", kind="mid")
+
+O arquivo de entrada tem um pedido por linha, no formato JSON do serviço de
+geração (generation_service.py). Duas execuções sobre o mesmo manifesto são
+serializadas por uma trava de arquivo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models import DocumentData
+from config_store import file_lock
+from build_graph import build_final_documents, fingerprint
+from docs_filler import DocFiller
+from metrics import REGISTRY
+from mid_pdf_templates import file_digest
+from mid_internship_fillers import MID_INTERNSHIP_FILLERS
+from async_pipeline import DEFAULT_CONCURRENCY, AsyncMidInternshipPipeline
+
+
+MANIFEST_FORMAT = 1
+BATCH_KINDS = ("mid", "final")
+
+DONE = "done"
+FAILED = "failed"
+
+BATCH_STUDENTS = REGISTRY.counter(
+    "estagio_batch_students_total",
+    "Estudantes processados pelo lote com manifesto", ["kind", "outcome"])
+
+
+@dataclass
+class StudentRecord:
+    """Linha de um estudante no manifesto"""
+    ra: str
+    status: str
+    fingerprint: str
+    outputs: List[dict] = field(default_factory=list)
+    seconds: float = 0.0
+    attempts: int = 1
+    finished: float = 0.0
+    missing_pdf: bool = False
+    error: Optional[str] = None
+
+    def as_line(self) -> dict:
+        return {"type": "student", **asdict(self)}
+
+    def outputs_intact(self) -> bool:
+        """Arquivos gerados ainda no lugar, com o mesmo tamanho e mtime"""
+        for output in self.outputs:
+            try:
+                st = os.stat(output["path"])
+            except OSError:
+                return False
+            if st.st_size != output["bytes"] or st.st_mtime_ns != output["mtime_ns"]:
+                return False
+        return bool(self.outputs)
+
+
+@dataclass
+class BatchSummary:
+    """Resumo da turma ao final de uma execução"""
+    kind: str
+    students: int
+    done: int
+    failed: int
+    skipped: int
+    generated: int
+    elapsed: float
+    mean_seconds: float
+    p95_seconds: float
+    missing_pdf: int
+    failures: Dict[str, str] = field(default_factory=dict)
+
+    def as_line(self) -> dict:
+        return {"type": "summary", "finished": time.time(), **asdict(self)}
+
+    def format(self) -> str:
+        lines = [
+            f"Turma ({self.kind}): {self.done}/{self.students} concluído(s), {self.failed} com falha",
+            f"Nesta execução: {self.generated} gerado(s), {self.skipped} pulado(s) em {self.elapsed:.1f}s",
+        ]
+        if self.generated:
+            lines.append(f"Tempo por estudante: média {self.mean_seconds:.2f}s | p95 {self.p95_seconds:.2f}s")
+        if self.missing_pdf:
+            lines.append(f"{self.missing_pdf} estudante(s) só com DOCX (LibreOffice indisponível)")
+        for ra, error in sorted(self.failures.items()):
+            lines.append(f"  falha RA {ra}: {error}")
+        return "\n".join(lines)
+
+
+def describe_outputs(paths: Sequence[str]) -> List[dict]:
+    """Caminho, tamanho, mtime e sha256 de cada arquivo gerado"""
+    outputs = []
+    for path in paths:
+        st = os.stat(path)
+        outputs.append({"path": os.path.abspath(path), "bytes": st.st_size,
+                        "mtime_ns": st.st_mtime_ns, "sha256": file_digest(path)})
+    return outputs
+
+
+def student_inputs(document_data: DocumentData, kind: str) -> Dict[str, dict]:
+    """Entradas de cada documento do estudante, com as mesmas chaves de alvo do build_graph.py"""
+    if kind == "final":
+        return {os.path.splitext(filler.get_template_name())[0]: filler.get_inputs()
+                for fillers in DocFiller(document_data).get_fillers().values() for filler in fillers}
+    return {filler_cls.OUTPUT_PREFIX: filler_cls(document_data).get_inputs() for filler_cls in MID_INTERNSHIP_FILLERS}
+
+
+def student_fingerprint(document_data: DocumentData, kind: str) -> str:
+    return fingerprint({"kind": kind, "targets": student_inputs(document_data, kind)})
+
+
+class BatchManifest:
+    """Manifesto JSONL: uma linha por estudante concluído; a última linha de cada RA vale"""
+
+    def __init__(self, path: str, kind: str):
+        self.path = path
+        self.kind = kind
+        self.records: Dict[str, StudentRecord] = {}
+        self._file = None
+
+    def load(self):
+        """Lê o manifesto (linhas truncadas por uma queda são ignoradas)"""
+        self.records = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for number, line in enumerate(lines, 1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"Manifesto {self.path}: linha {number} ilegível ignorada")
+                continue
+            if entry.get("type") == "batch" and entry.get("kind") != self.kind:
+                raise ValueError(f"Manifesto {self.path} é de um lote '{entry.get('kind')}', não '{self.kind}'")
+            if entry.get("type") == "student":
+                entry.pop("type")
+                record = StudentRecord(**entry)
+                self.records[record.ra] = record
+
+    def open(self):
+        """Reescreve o manifesto compactado (uma linha por RA) e o abre para acréscimo"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"type": "batch", "format": MANIFEST_FORMAT, "kind": self.kind}) + "\n")
+                for record in self.records.values():
+                    f.write(json.dumps(record.as_line(), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, line: dict):
+        """Acrescenta uma linha e a sincroniza com o disco (sobrevive a uma queda logo em seguida)"""
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, record: StudentRecord):
+        self.records[record.ra] = record
+        self.append(record.as_line())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BatchRunner:
+    """Executa um lote contra o manifesto: pula concluídos, refaz falhas e pendentes"""
+
+    def __init__(self, manifest_path: str, kind: str = "mid", concurrency: int = DEFAULT_CONCURRENCY):
+        if kind not in BATCH_KINDS:
+            raise ValueError(f"Tipo de lote desconhecido: {kind}")
+        self.manifest = BatchManifest(manifest_path, kind)
+        self.kind = kind
+        self.concurrency = concurrency
+        self._timings: List[float] = []
+
+    def plan(self, documents: Sequence[DocumentData]) -> Tuple[List[Tuple[DocumentData, str]], int]:
+        """Estudantes a gerar (com o fingerprint) e quantos podem ser pulados"""
+        pending, skipped = [], 0
+        for document_data in documents:
+            current = student_fingerprint(document_data, self.kind)
+            previous = self.manifest.records.get(document_data.user.ra)
+            if previous is not None and previous.status == DONE and previous.fingerprint == current \
+                    and previous.outputs_intact():
+                skipped += 1
+            else:
+                pending.append((document_data, current))
+        return pending, skipped
+
+    def run(self, documents: Sequence[DocumentData]) -> BatchSummary:
+        started = time.perf_counter()
+        self._timings = []
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest.path)), exist_ok=True)
+        with file_lock(self.manifest.path):
+            self.manifest.load()
+            pending, skipped = self.plan(documents)
+            BATCH_STUDENTS.inc(skipped, kind=self.kind, outcome="skipped")
+            print(f"Lote {self.kind}: {len(documents)} estudante(s), {skipped} já concluído(s), "
+                  f"{len(pending)} a gerar")
+            self.manifest.open()
+            try:
+                if self.kind == "mid":
+                    asyncio.run(self._run_mid(pending))
+                else:
+                    self._run_final(pending)
+                summary = self._summarize(documents, skipped, len(pending), time.perf_counter() - started)
+                self.manifest.append(summary.as_line())
+            finally:
+                self.manifest.close()
+        return summary
+
+    def _finish(self, document_data: DocumentData, current: str, started: float,
+                paths: Sequence[str] = (), missing_pdf: bool = False, error: Optional[BaseException] = None):
+        ra = document_data.user.ra
+        previous = self.manifest.records.get(ra)
+        attempts = previous.attempts + 1 if previous is not None and previous.status == FAILED else 1
+        seconds = round(time.perf_counter() - started, 3)
+        if error is None:
+            try:
+                outputs = describe_outputs(paths)
+            except OSError as e:
+                error = e
+        if error is None:
+            record = StudentRecord(ra, DONE, current, outputs, seconds, attempts, time.time(), missing_pdf)
+            self._timings.append(seconds)
+        else:
+            record = StudentRecord(ra, FAILED, current, [], seconds, attempts, time.time(),
+                                   error=str(error) or error.__class__.__name__)
+            print(f"Falha no lote ({self.kind}) para o RA {ra}: {record.error}")
+        self.manifest.record(record)
+        BATCH_STUDENTS.inc(kind=self.kind, outcome=record.status)
+
+    def _run_final(self, pending: Sequence[Tuple[DocumentData, str]]):
+        # PyMuPDF não é thread-safe: os documentos finais são gerados em sequência
+        for document_data, current in pending:
+            started = time.perf_counter()
+            try:
+                files, merged_pdf, _ = build_final_documents(document_data)
+            except Exception as e:
+                self._finish(document_data, current, started, error=e)
+                continue
+            parts = [path for category_files in files.values() for path in category_files]
+            self._finish(document_data, current, started, [merged_pdf, *parts])
+
+    async def _run_mid(self, pending: Sequence[Tuple[DocumentData, str]]):
+        pipeline = AsyncMidInternshipPipeline(concurrency=self.concurrency)
+
+        async def generate(document_data: DocumentData, current: str):
+            started = time.perf_counter()
+            try:
+                zip_path, missing_pdf = await pipeline.generate(document_data)
+            except Exception as e:
+                self._finish(document_data, current, started, error=e)
+                return
+            self._finish(document_data, current, started, [zip_path], missing_pdf)
+
+        try:
+            await asyncio.gather(*(generate(document_data, current) for document_data, current in pending))
+        finally:
+            pipeline.close()
+
+    def _summarize(self, documents: Sequence[DocumentData], skipped: int, generated: int,
+                   elapsed: float) -> BatchSummary:
+        records = [self.manifest.records[ra] for ra in {d.user.ra for d in documents}
+                   if ra in self.manifest.records]
+        timings = sorted(self._timings)
+        return BatchSummary(
+            kind=self.kind,
+            students=len(documents),
+            done=sum(record.status == DONE for record in records),
+            failed=sum(record.status == FAILED for record in records),
+            skipped=skipped,
+            generated=generated,
+            elapsed=round(elapsed, 3),
+            mean_seconds=round(statistics.mean(timings), 3) if timings else 0.0,
+            p95_seconds=timings[min(len(timings) - 1, int(0.95 * len(timings)))] if timings else 0.0,
+            missing_pdf=sum(record.status == DONE and record.missing_pdf for record in records),
+            failures={record.ra: record.error for record in records if record.status == FAILED},
+        )
+
+
+def run_batch(documents: Sequence[DocumentData], manifest_path: str, kind: str = "mid",
+              concurrency: int = DEFAULT_CONCURRENCY) -> BatchSummary:
+    """Gera a turma retomando do manifesto e imprime o resumo"""
+    summary = BatchRunner(manifest_path, kind, concurrency).run(documents)
+    print(summary.format())
+    return summary
+
+
+def load_cohort(path: str) -> List[DocumentData]:
+    """Turma em JSONL: um pedido por linha no formato do serviço de geração"""
+    from generation_service import PayloadError, parse_document_data
+
+    documents = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                documents.append(parse_document_data(json.loads(line)))
+            except PayloadError as e:
+                raise ValueError(f"{path}, linha {number}: {'; '.join(e.errors)}")
+            except ValueError as e:
+                raise ValueError(f"{path}, linha {number}: JSON inválido: {e}")
+    return documents
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Geração em lote de uma turma com manifesto e retomada")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Gera a turma (pula os estudantes já concluídos)")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSONL com um pedido por linha (formato do serviço)")
+    source.add_argument("--synthetic", type=int, help="Turma sintética do benchmark.py com N estudantes")
+    run.add_argument("--kind", choices=BATCH_KINDS, default="mid")
+    run.add_argument("--manifest", required=True)
+    run.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                     help="Conversões LibreOffice simultâneas (lote mid)")
+    summary = subparsers.add_parser("summary", help="Resumo da última execução registrada no manifesto")
+    summary.add_argument("--manifest", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        try:
+            with open(args.manifest, encoding="utf-8") as f:
+                summaries = [entry for entry in map(json.loads, filter(str.strip, f))
+                             if entry.get("type") == "summary"]
+        except (OSError, ValueError) as e:
+            print(f"Erro: {e}")
+            return 1
+        if not summaries:
+            print("Nenhuma execução concluída registrada")
+            return 1
+        print(json.dumps(summaries[-1], indent=2, ensure_ascii=False))
+        return 0
+
+    if args.synthetic is not None:
+        from benchmark import make_cohort
+        documents = make_cohort(args.synthetic)
+    else:
+        try:
+            documents = load_cohort(args.input)
+        except (OSError, ValueError) as e:
+            print(f"Erro: {e}")
+            return 1
+    try:
+        result = run_batch(documents, args.manifest, args.kind, args.concurrency)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return 1
+    return 0 if result.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmarks reprodutível para o preenchimento de documentos.
+
+Mede cada BasePDFFiller, DocFiller.fill_all_documents, merge_pdfs_to_single_file,
+generate_mid_internship_documents (com um soffice simulado e com PDFs
+pré-renderizados sintéticos), _replace_placeholders
+e as consultas de feriados, para turmas sintéticas de 1, 50 e 500 estudantes.
+Os resultados são gravados em JSON para comparação entre execuções.
+
+Uso:
+    python benchmark.py                                   # todos os tamanhos
+    python benchmark.py --sizes 1 50 --only checklist merge
+    python benchmark.py --output depois.json --compare antes.json
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import fitz  # PyMuPDF
+from docx import Document
+
+import mid_internship_fillers
+import mid_pdf_templates
+from models import UserData, InternshipData, ShiftData, DocumentData
+from docs_filler import (
+    PDFConfig, ChecklistPDFFiller, FrequencySheetPDFFiller,
+    InternshipDeclarationPDFFiller, MandatoryActivityPDFFiller,
+    DocFiller, merge_pdfs_to_single_file,
+)
+from mid_internship_fillers import (
+    CompanyActivitiesDocxFiller, MID_INTERNSHIP_FILLERS, generate_mid_internship_documents, TEMPLATES_DIR,
+)
+from date_utils import is_brazilian_holiday, get_holiday_name
+
+
+DEFAULT_SIZES = [1, 50, 500]
+DEFAULT_OUTPUT = "./benchmark_results.json"
+SHIFTS_PER_STUDENT = 18
+BASE_SHIFT_DATE = date(2025, 8, 15)
+
+# soffice simulado: copia um PDF pronto para o --outdir com o nome do DOCX
+STUB_SOFFICE = """#!/bin/sh
+outdir=""
+for arg; do
+    if [ "$prev" = "--outdir" ]; then outdir="$arg"; fi
+    prev="$arg"
+    last="$arg"
+done
+cp "{stub_pdf}" "$outdir/$(basename "$last" .docx).pdf"
+"""
+
+
+# ----------------------------------------------------------------------
+# Dados sintéticos
+# ----------------------------------------------------------------------
+def make_document_data(index: int) -> DocumentData:
+    """Cria um DocumentData determinístico para o estudante de índice `index`"""
+    user = UserData(
+        nome=f"Estudante Sintético {index:04d}",
+        ra=f"9{index:08d}",
+        polo="Polo Central",
+        turma=f"Turma {'ABC'[index % 3]}",
+        telefone_ddd="61",
+        telefone_numero=f"9{index:08d}",
+        email=f"estudante{index}@aluno.unip.br",
+        semestre="2025/2",
+        data="Brasília, 12 de Junho de 2026",
+    )
+    internship = InternshipData(
+        disciplina_estagio="Alimentos",
+        codigo_disciplina="7433-100",
+        local_estagio="UNIP",
+        supervisor_estagio="Breno Silva de Abreu",
+        carga_horaria=100,
+        titulo_atividade_obrigatoria="Análise de Rotulagem",
+    )
+    shifts = [
+        ShiftData(
+            horario_inicio="13:00",
+            horario_fim="18:00",
+            data=(BASE_SHIFT_DATE + timedelta(weeks=week)).strftime("%d/%m/%Y"),
+            atividade_realizada=f"Atividade do encontro {week + 1}",
+        )
+        for week in range(SHIFTS_PER_STUDENT)
+    ]
+    return DocumentData(user=user, internship=internship, shifts=shifts)
+
+
+def make_cohort(size: int) -> List[DocumentData]:
+    return [make_document_data(i) for i in range(size)]
+
+
+# ----------------------------------------------------------------------
+# Ambiente isolado
+# ----------------------------------------------------------------------
+class BenchmarkEnvironment:
+    """Redireciona as saídas para um diretório temporário e instala o soffice simulado"""
+    # Ambiente ativo (usado pelos benchmarks que dependem dos arquivos sintéticos)
+    current: Optional["BenchmarkEnvironment"] = None
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="estagio_bench_")
+        self.output_dir = os.path.join(self.root, "filled_docs")
+        self.bin_dir = os.path.join(self.root, "bin")
+        self.prerendered_dir = os.path.join(self.root, "mid_pdf")
+        self._saved = {}
+
+    def __enter__(self) -> "BenchmarkEnvironment":
+        os.makedirs(self.output_dir)
+        os.makedirs(self.bin_dir)
+
+        stub_pdf = os.path.join(self.root, "stub.pdf")
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "INSTITUIÇÃO DE ENSINO", fontsize=12)
+        doc.save(stub_pdf)
+        doc.close()
+
+        # PDFs pré-renderizados sintéticos: uma linha por placeholder dos relatórios
+        for filler_cls in MID_INTERNSHIP_FILLERS:
+            doc = fitz.open()
+            page = doc.new_page()
+            for i, key in enumerate(("nome", "ra", "polo", "email", "start_date", "end_date", "data_documento")):
+                page.insert_text((72, 100 + 20 * i), f"{key}: {{{{{key}}}}}", fontsize=11)
+            page.insert_text((72, 400), "INSTITUIÇÃO DE ENSINO", fontsize=12)
+            docx_path = os.path.join(TEMPLATES_DIR, filler_cls.TEMPLATE_NAME)
+            mid_pdf_templates.save_prerendered(mid_pdf_templates.PrerenderedTemplate(
+                filler_cls.TEMPLATE_NAME, doc.tobytes(), tuple(mid_pdf_templates.find_anchors(doc)),
+                mid_pdf_templates.file_digest(docx_path),
+            ), self.prerendered_dir)
+            doc.close()
+
+        soffice = os.path.join(self.bin_dir, "soffice")
+        with open(soffice, "w", encoding="utf-8") as f:
+            f.write(STUB_SOFFICE.format(stub_pdf=stub_pdf))
+        os.chmod(soffice, os.stat(soffice).st_mode | stat.S_IEXEC)
+
+        self._saved = {
+            "pdf_output": PDFConfig.OUTPUT_PATH,
+            "docx_output": mid_internship_fillers.OUTPUT_DIR,
+            "prerendered": mid_pdf_templates.PRERENDERED_DIR,
+            "path": os.environ.get("PATH", ""),
+        }
+        # Sem PDFs pré-renderizados por padrão: mid_internship mede a conversão
+        mid_pdf_templates.PRERENDERED_DIR = os.path.join(self.root, "no_prerendered")
+        PDFConfig.OUTPUT_PATH = self.output_dir
+        mid_internship_fillers.OUTPUT_DIR = self.output_dir
+        os.environ["PATH"] = self.bin_dir + os.pathsep + self._saved["path"]
+        BenchmarkEnvironment.current = self
+        return self
+
+    def __exit__(self, *exc):
+        PDFConfig.OUTPUT_PATH = self._saved["pdf_output"]
+        mid_internship_fillers.OUTPUT_DIR = self._saved["docx_output"]
+        mid_pdf_templates.PRERENDERED_DIR = self._saved["prerendered"]
+        os.environ["PATH"] = self._saved["path"]
+        BenchmarkEnvironment.current = None
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+def _pdf_filler_benchmark(make_filler: Callable[[DocumentData], object]) -> Callable:
+    def run(cohort: List[DocumentData]):
+        for document_data in cohort:
+            make_filler(document_data).fill()
+    return run
+
+
+def bench_fill_all_documents(cohort: List[DocumentData]):
+    for document_data in cohort:
+        DocFiller(document_data).fill_all_documents()
+
+
+def prepare_merge(cohort: List[DocumentData]) -> List[tuple]:
+    return [(DocFiller(d).fill_all_documents(), d.user.ra) for d in cohort]
+
+
+def bench_merge(prepared: List[tuple]):
+    for results, ra in prepared:
+        merge_pdfs_to_single_file(results, ra)
+
+
+def bench_mid_internship(cohort: List[DocumentData]):
+    for document_data in cohort:
+        generate_mid_internship_documents(document_data, document_data.user.ra)
+
+
+def bench_mid_internship_stamped(cohort: List[DocumentData]):
+    saved = mid_pdf_templates.PRERENDERED_DIR
+    mid_pdf_templates.PRERENDERED_DIR = BenchmarkEnvironment.current.prerendered_dir
+    try:
+        bench_mid_internship(cohort)
+    finally:
+        mid_pdf_templates.PRERENDERED_DIR = saved
+
+
+def prepare_replace_placeholders(cohort: List[DocumentData]) -> List[tuple]:
+    template = Document(os.path.join(TEMPLATES_DIR, CompanyActivitiesDocxFiller.TEMPLATE_NAME))
+    prepared = []
+    for document_data in cohort:
+        filler = CompanyActivitiesDocxFiller(document_data)
+        prepared.append((filler, copy.deepcopy(template), filler._get_common_mapping()))
+    return prepared
+
+
+def bench_replace_placeholders(prepared: List[tuple]):
+    for filler, doc, mapping in prepared:
+        filler._replace_placeholders(doc, mapping)
+
+
+def prepare_holiday_dates(cohort: List[DocumentData]) -> List[date]:
+    return [
+        datetime.strptime(shift.data, "%d/%m/%Y").date()
+        for document_data in cohort
+        for shift in document_data.shifts
+    ]
+
+
+def bench_holiday_lookups(dates: List[date]):
+    for d in dates:
+        if is_brazilian_holiday(d):
+            get_holiday_name(d)
+
+
+# nome -> (preparação opcional fora da medição, função medida)
+BENCHMARKS: Dict[str, tuple] = {
+    "checklist": (None, _pdf_filler_benchmark(lambda d: ChecklistPDFFiller(d.user))),
+    "frequency_sheet": (None, _pdf_filler_benchmark(
+        lambda d: FrequencySheetPDFFiller(d.user, d.internship, d.shifts[:6], sheet_number=2))),
+    "internship_declaration": (None, _pdf_filler_benchmark(
+        lambda d: InternshipDeclarationPDFFiller(d.user, d.internship))),
+    "mandatory_activity": (None, _pdf_filler_benchmark(
+        lambda d: MandatoryActivityPDFFiller(d.user, d.internship))),
+    "fill_all_documents": (None, bench_fill_all_documents),
+    "merge": (prepare_merge, bench_merge),
+    "mid_internship": (None, bench_mid_internship),
+    "mid_internship_stamped": (None, bench_mid_internship_stamped),
+    "replace_placeholders": (prepare_replace_placeholders, bench_replace_placeholders),
+    "holiday_lookups": (prepare_holiday_dates, bench_holiday_lookups),
+}
+
+
+def run_benchmark(name: str, size: int, repeat: int) -> dict:
+    prepare, func = BENCHMARKS[name]
+    cohort = make_cohort(size)
+    timings = []
+    for _ in range(repeat):
+        arg = prepare(cohort) if prepare else cohort
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "name": name,
+        "size": size,
+        "repeat": repeat,
+        "timings_s": timings,
+        "best_s": best,
+        "mean_s": sum(timings) / len(timings),
+        "per_student_ms": best / size * 1000,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, previous: dict):
+    """Imprime a variação de cada benchmark em relação a uma execução anterior"""
+    before = {(r["name"], r["size"]): r for r in previous.get("results", [])}
+    print(f"\n{'benchmark':<24}{'n':>6}{'antes (ms)':>14}{'depois (ms)':>14}{'variação':>11}")
+    for r in current["results"]:
+        old = before.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        delta = (r["best_s"] - old["best_s"]) / old["best_s"] * 100 if old["best_s"] else 0.0
+        print(f"{r['name']:<24}{r['size']:>6}{old['best_s'] * 1000:>14.1f}"
+              f"{r['best_s'] * 1000:>14.1f}{delta:>+10.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do preenchimento de documentos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Executa apenas estes benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "pymupdf": fitz.VersionBind,
+            "shifts_per_student": SHIFTS_PER_STUDENT,
+        },
+        "results": [],
+    }
+
+    # Silenciar os prints de progresso dos fillers durante a medição
+    with BenchmarkEnvironment(), open(os.devnull, "w") as devnull:
+        for size in args.sizes:
+            for name in names:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    result = run_benchmark(name, size, args.repeat)
+                finally:
+                    sys.stdout = stdout
+                report["results"].append(result)
+                print(f"{name:<24} n={size:<5} melhor={result['best_s'] * 1000:10.1f} ms "
+                      f"({result['per_student_ms']:.2f} ms/estudante)")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Regeneração incremental dos documentos de um estudante.
+
+Cada documento é um alvo que declara as suas entradas: o hash do template e os
+valores que ele de fato escreve (get_inputs() dos fillers). Cada entrada é
+identificada por um fingerprint (sha256 do valor em JSON canônico) e o
+manifesto do RA guarda, por alvo, os fingerprints da última geração e o
+arquivo produzido. Um alvo só é regenerado quando uma das suas próprias
+entradas mudou ou quando o arquivo sumiu ou foi substituído (ex: pela
+retenção); caso contrário o arquivo existente é reaproveitado.
+
+    checklist               campos do estudante impressos no checklist
+    freq1..freq3            nome, RA (o número de folhas depende dos turnos)
+    realizacao/obrigatoria  nome, RA
+    relatórios intermediários   placeholders usados pelo template DOCX,
+                                forma de geração e assinatura
+
+O PDF mesclado e o ZIP também são alvos, cujas entradas são os hashes das
+partes: são remontados a partir das partes em cache, e só quando alguma parte
+mudou. Os manifestos ficam em filled_docs/.build/ (ou ESTAGIO_BUILD_DIR).
+
+    files, merged_pdf, report = build_final_documents(document_data)
+    mid_zip, missing_pdf, report = build_mid_internship_documents(document_data)
+    report.rebuilt, report.reused, report.changed
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field, is_dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from models import DocumentData
+from config_store import file_lock
+from instrumentation import span
+from metrics import BUILD_TARGETS, BUNDLES_GENERATED, BUNDLE_SECONDS, DOCUMENTS_GENERATED
+from mid_pdf_templates import file_digest
+from docs_filler import MERGE_ORDER, DocFiller, PDFConfig, merge_pdfs_to_single_file
+from mid_internship_fillers import MID_INTERNSHIP_FILLERS, write_mid_internship_zip
+
+
+MANIFEST_FORMAT = 1
+
+# Motivos de regeneração que não são entradas
+NEW_TARGET = "(novo)"
+MISSING_OUTPUT = "(arquivo ausente)"
+
+
+def get_build_dir() -> str:
+    """Diretório dos manifestos (resolvido a cada chamada: acompanha PDFConfig.OUTPUT_PATH)"""
+    return os.environ.get("ESTAGIO_BUILD_DIR") or os.path.join(PDFConfig.OUTPUT_PATH, ".build")
+
+
+def _encode(value: Any):
+    if is_dataclass(value):
+        return asdict(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Entrada sem fingerprint: {type(value).__name__}")
+
+
+def fingerprint(value: Any) -> str:
+    """sha256 (16 primeiros hex) do valor serializado em JSON canônico"""
+    payload = json.dumps(value, default=_encode, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class BuildTarget:
+    """Documento do grafo: entradas declaradas e a função que o gera (retorna o caminho)"""
+    key: str
+    inputs: Mapping[str, Any]
+    build: Callable[[], str]
+
+    def fingerprints(self) -> Dict[str, str]:
+        return {name: fingerprint(value) for name, value in self.inputs.items()}
+
+
+@dataclass
+class BuildReport:
+    """Resultado de uma execução: caminhos por alvo, regenerados, reaproveitados e o motivo"""
+    outputs: Dict[str, str] = field(default_factory=dict)
+    rebuilt: List[str] = field(default_factory=list)
+    reused: List[str] = field(default_factory=list)
+    changed: Dict[str, List[str]] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        return f"{len(self.rebuilt)} regenerado(s), {len(self.reused)} reaproveitado(s)"
+
+
+_ra_locks: Dict[str, threading.Lock] = {}
+_ra_locks_guard = threading.Lock()
+
+
+def _ra_lock(name: str) -> threading.Lock:
+    with _ra_locks_guard:
+        return _ra_locks.setdefault(name, threading.Lock())
+
+
+class BuildGraph:
+    """
+    Executa alvos de um RA contra o manifesto da execução anterior.
+
+    Usado como context manager: o manifesto é carregado na entrada e gravado na
+    saída (mesmo se um alvo falhar, os concluídos ficam registrados). Alvos que
+    não foram executados nesta vez saem do manifesto. Gerações do mesmo RA são
+    serializadas entre threads e entre processos (flock no manifesto).
+    """
+
+    def __init__(self, ra: str, bundle: str, build_dir: Optional[str] = None):
+        self.ra = ra
+        self.bundle = bundle
+        self.path = os.path.join(build_dir or get_build_dir(), f"{bundle}_{ra}.json")
+        self.report = BuildReport()
+        self._previous: Dict[str, dict] = {}
+        self._entries: Dict[str, dict] = {}
+        self._stack = ExitStack()
+
+    def __enter__(self) -> "BuildGraph":
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with ExitStack() as stack:
+            stack.enter_context(_ra_lock(self.path))
+            stack.enter_context(file_lock(self.path))
+            self._previous = self._load()
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, *exc):
+        with self._stack:
+            self._save()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Manifesto ignorado ({self.path}): {e}")
+            return {}
+        if manifest.get("format") != MANIFEST_FORMAT:
+            return {}
+        return manifest.get("targets", {})
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"format": MANIFEST_FORMAT, "ra": self.ra, "targets": self._entries},
+                          f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _output_state(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _stale_inputs(self, target: BuildTarget, fingerprints: Dict[str, str]) -> List[str]:
+        """Entradas que mudaram desde a última geração (vazio = arquivo reaproveitável)"""
+        previous = self._previous.get(target.key)
+        if previous is None:
+            return [NEW_TARGET]
+        state = self._output_state(previous["output"])
+        if state is None or list(state) != previous["state"]:
+            return [MISSING_OUTPUT]
+        old = previous["inputs"]
+        return sorted(name for name in set(fingerprints) | set(old) if fingerprints.get(name) != old.get(name))
+
+    def build(self, target: BuildTarget) -> str:
+        """Gera o alvo se alguma entrada mudou; senão retorna o arquivo da geração anterior"""
+        fingerprints = target.fingerprints()
+        changed = self._stale_inputs(target, fingerprints)
+        if changed:
+            with span("build.target", target=target.key, changed=",".join(changed)):
+                output = target.build()
+            self.report.rebuilt.append(target.key)
+            self.report.changed[target.key] = changed
+            BUILD_TARGETS.inc(outcome="rebuilt")
+        else:
+            output = self._previous[target.key]["output"]
+            self.report.reused.append(target.key)
+            BUILD_TARGETS.inc(outcome="reused")
+        state = self._output_state(output)
+        if state is not None:
+            self._entries[target.key] = {"output": output, "state": list(state), "inputs": fingerprints}
+        self.report.outputs[target.key] = output
+        return output
+
+    def assemble(self, key: str, parts: Sequence[str], build: Callable[[], str]) -> str:
+        """Alvo agregado (PDF mesclado, ZIP): as entradas são a ordem e o hash de cada parte"""
+        inputs = {"order": [os.path.basename(path) for path in parts]}
+        for path in parts:
+            inputs[os.path.basename(path)] = file_digest(path) if os.path.exists(path) else None
+        return self.build(BuildTarget(key, inputs, build))
+
+
+def build_final_documents(document_data: DocumentData) -> Tuple[Dict[str, List[str]], str, BuildReport]:
+    """
+    Versão incremental de DocFiller.fill_all_documents + merge_pdfs_to_single_file.
+
+    Retorna os arquivos por categoria (como fill_all_documents), o PDF mesclado
+    e o relatório da execução.
+    """
+    ra = document_data.user.ra
+    started = time.perf_counter()
+    files: Dict[str, List[str]] = {}
+    with span("bundle.build", ra=ra, kind="final"), BuildGraph(ra, "final") as graph:
+        fillers = DocFiller(document_data).get_fillers()
+        for category in MERGE_ORDER:
+            # Chave do alvo: nome do template (ex: 1_checklist, 2_freq1)
+            files[category] = [
+                graph.build(BuildTarget(os.path.splitext(filler.get_template_name())[0],
+                                        filler.get_inputs(), filler.fill))
+                for filler in fillers.get(category, [])
+            ]
+        parts = [path for category in MERGE_ORDER for path in files[category]]
+        merged_pdf = graph.assemble("documentos_estagio", parts,
+                                    lambda: merge_pdfs_to_single_file(files, ra))
+        report = graph.report
+    if report.rebuilt:
+        BUNDLE_SECONDS.observe(time.perf_counter() - started, kind="final")
+        BUNDLES_GENERATED.inc(kind="final")
+    print(f"Documentos finais de {ra}: {report.summary()}")
+    return files, merged_pdf, report
+
+
+def build_mid_internship_documents(document_data: DocumentData) -> Tuple[str, bool, BuildReport]:
+    """
+    Versão incremental de generate_mid_internship_documents: um relatório só passa
+    de novo pelo carimbo/LibreOffice se um dos placeholders do seu template mudou.
+
+    Retorna o ZIP, se faltou conversão para PDF e o relatório da execução.
+    """
+    ra = document_data.user.ra
+    started = time.perf_counter()
+    with span("bundle.build", ra=ra, kind="mid"), BuildGraph(ra, "mid") as graph:
+        paths = []
+        for filler_cls in MID_INTERNSHIP_FILLERS:
+            filler = filler_cls(document_data)
+            path = graph.build(BuildTarget(filler.OUTPUT_PREFIX, filler.get_inputs(), filler.fill))
+            if filler.OUTPUT_PREFIX in graph.report.changed:
+                DOCUMENTS_GENERATED.inc(document=filler_cls.__name__)
+            paths.append(path)
+        mid_zip = graph.assemble("mid_documents", paths, lambda: write_mid_internship_zip(paths, ra)[0])
+        report = graph.report
+    missing_pdf = all(p.lower().endswith('.docx') for p in paths if p)
+    if report.rebuilt:
+        BUNDLE_SECONDS.observe(time.perf_counter() - started, kind="mid")
+        BUNDLES_GENERATED.inc(kind="mid")
+    print(f"Documentos intermediários de {ra}: {report.summary()}")
+    return mid_zip, missing_pdf, report
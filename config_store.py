@@ -0,0 +1,541 @@
+"""
+Armazenamento SQLite das configurações compartilhadas entre as aplicações.
+
+Guarda o template do supervisor, as descrições de atividades por encontro e os
+feriados personalizados em um banco SQLite em modo WAL, permitindo atualizações
+por data em O(1) e leituras consistentes com vários editores simultâneos.
+
+Os arquivos JSON antigos (internship_template.json e custom_holidays.json) são
+importados automaticamente na primeira abertura do banco, e podem ser
+importados/exportados a qualquer momento:
+    python config_store.py export --template internship_template.json --holidays custom_holidays.json
+    python config_store.py import --template internship_template.json --holidays custom_holidays.json
+
+A exportação grava em um arquivo temporário e o renomeia (os.replace) sob uma
+trava de arquivo (<arquivo>.lock), de modo que leitores nunca veem um JSON
+truncado; um JSON inválido gera ConfigFileError em vez de um template vazio.
+
+Cada transação de escrita incrementa um contador de versão (meta.config_version).
+Consumidores com cache registram um callback com add_listener(); alterações
+feitas neste processo notificam imediatamente e start_watcher() consulta o
+contador periodicamente para detectar alterações de outros processos.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("ESTAGIO_DB_PATH", os.path.join(BASE_DIR, "estagio.db"))
+LEGACY_TEMPLATE_FILE = os.path.join(BASE_DIR, "internship_template.json")
+LEGACY_HOLIDAYS_FILE = os.path.join(BASE_DIR, "custom_holidays.json")
+
+# Chave do template padrão (compartilhado por todas as turmas)
+DEFAULT_TEMPLATE_KEY = ""
+
+# Intervalo de consulta do contador de versão pelo watcher (segundos)
+WATCH_INTERVAL = float(os.environ.get("ESTAGIO_CONFIG_POLL_INTERVAL", 2.0))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS template_settings (
+    template_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (template_key, name)
+);
+CREATE TABLE IF NOT EXISTS activity_descriptions (
+    template_key TEXT NOT NULL,
+    encounter_date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (template_key, encounter_date)
+);
+CREATE INDEX IF NOT EXISTS idx_activity_descriptions_date
+    ON activity_descriptions (encounter_date);
+CREATE TABLE IF NOT EXISTS custom_holidays (
+    holiday_date TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS polo_regions (
+    polo TEXT PRIMARY KEY,
+    subdiv TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS polo_holidays (
+    polo TEXT NOT NULL,
+    holiday_date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (polo, holiday_date)
+);
+CREATE TABLE IF NOT EXISTS template_revisions (
+    template_key TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class ConfigFileError(ValueError):
+    """Arquivo JSON de configuração ilegível ou inválido"""
+
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = True):
+    """Trava consultiva (flock) em <path>.lock, compartilhada entre processos"""
+    with open(path + ".lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def write_json_atomic(path: str, data):
+    """Grava JSON em um temporário no mesmo diretório e o renomeia sobre o destino"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with file_lock(path):
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def read_json(path: str):
+    """Lê um JSON de configuração sob trava compartilhada (ConfigFileError se inválido)"""
+    with file_lock(path, exclusive=False):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ConfigFileError(f"Não foi possível ler {path}: {e}") from e
+
+
+def _to_iso(date_str: str) -> str:
+    """DD/MM/YYYY -> YYYY-MM-DD (formato ordenável usado no banco)"""
+    return datetime.strptime(date_str, "%d/%m/%Y").date().isoformat()
+
+
+def _from_iso(iso_str: str) -> str:
+    """YYYY-MM-DD -> DD/MM/YYYY (formato usado pelas aplicações)"""
+    return date.fromisoformat(iso_str).strftime("%d/%m/%Y")
+
+
+class ConfigStore:
+    """Acesso ao banco de configurações (uma conexão por thread)"""
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._listeners: List[Callable[[int], None]] = []
+        self._listeners_lock = threading.Lock()
+        self._seen_version = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watcher = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Conexão
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn.executescript(SCHEMA)
+            self._import_legacy_json(conn)
+            self._initialized = True
+
+    def _import_legacy_json(self, conn: sqlite3.Connection):
+        """Importa os arquivos JSON antigos uma única vez"""
+        if conn.execute("SELECT 1 FROM meta WHERE name = 'legacy_json_imported'").fetchone():
+            return
+
+        def _import():
+            self._import_files(conn, LEGACY_TEMPLATE_FILE, LEGACY_HOLIDAYS_FILE, replace=False)
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('legacy_json_imported', '1')")
+
+        try:
+            self._write(conn, _import)
+        except ConfigFileError as e:
+            # Não marca como importado: a importação é tentada de novo na próxima abertura
+            print(f"Importação dos JSON antigos ignorada: {e}")
+
+    def _write(self, conn: sqlite3.Connection, operation):
+        """Executa operation() em uma transação de escrita (BEGIN IMMEDIATE) e incrementa a versão"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation()
+            conn.execute(
+                "INSERT INTO meta (name, value) VALUES ('config_version', '1') "
+                "ON CONFLICT (name) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            version = int(conn.execute("SELECT value FROM meta WHERE name = 'config_version'").fetchone()[0])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._notify(version)
+        return result
+
+    def transaction(self, operation):
+        """Executa operation(conn) em uma única transação de escrita"""
+        conn = self._connect()
+        return self._write(conn, lambda: operation(conn))
+
+    # ------------------------------------------------------------------
+    # Notificação de alterações
+    # ------------------------------------------------------------------
+    def get_version(self) -> int:
+        """Contador de versão, incrementado a cada transação de escrita"""
+        row = self._connect().execute("SELECT value FROM meta WHERE name = 'config_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def add_listener(self, callback: Callable[[int], None]):
+        """Registra callback(versão), chamado após cada alteração do banco"""
+        with self._listeners_lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[int], None]):
+        with self._listeners_lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, version: int):
+        with self._listeners_lock:
+            if version == self._seen_version:
+                return
+            self._seen_version = version
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(version)
+            except Exception as e:
+                print(f"Erro ao notificar alteração de configuração: {e}")
+
+    def check_for_changes(self) -> bool:
+        """Consulta a versão atual e notifica se houve alteração (ex: por outro processo)"""
+        version = self.get_version()
+        with self._listeners_lock:
+            changed = self._seen_version is not None and version != self._seen_version
+            if self._seen_version is None:
+                self._seen_version = version
+        if changed:
+            self._notify(version)
+        return changed
+
+    def start_watcher(self, interval: float = WATCH_INTERVAL):
+        """Inicia (uma vez) a thread que detecta alterações feitas por outros processos"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self.check_for_changes()
+        self._stop_watcher.clear()
+
+        def _loop():
+            while not self._stop_watcher.wait(interval):
+                try:
+                    self.check_for_changes()
+                except sqlite3.Error as e:
+                    print(f"Erro ao verificar alterações de configuração: {e}")
+
+        self._watcher = threading.Thread(target=_loop, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watcher.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    # ------------------------------------------------------------------
+    # Template do supervisor
+    # ------------------------------------------------------------------
+    def load_template_config(self, template_key: str = DEFAULT_TEMPLATE_KEY) -> dict:
+        """Retorna a configuração no mesmo formato do antigo internship_template.json ({} se não houver)"""
+        conn = self._connect()
+        # Configurações e descrições lidas no mesmo snapshot
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT name, value FROM template_settings WHERE template_key = ?", (template_key,)
+            ).fetchall()
+            descriptions = self.load_activity_descriptions(template_key) if rows else {}
+        finally:
+            conn.execute("COMMIT")
+        if not rows:
+            return {}
+        config = {name: json.loads(value) for name, value in rows}
+        config["activity_descriptions"] = descriptions
+        return config
+
+    def get_template_revision(self, template_key: str = DEFAULT_TEMPLATE_KEY) -> int:
+        """Número de revisão do template, incrementado a cada alteração (0 se nunca gravado)"""
+        row = self._connect().execute(
+            "SELECT revision FROM template_revisions WHERE template_key = ?", (template_key,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def list_template_keys(self) -> List[str]:
+        """Chaves de todos os templates cadastrados"""
+        rows = self._connect().execute(
+            "SELECT DISTINCT template_key FROM template_settings ORDER BY template_key"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _bump_revision(self, conn: sqlite3.Connection, template_key: str):
+        conn.execute(
+            "INSERT INTO template_revisions (template_key, revision) VALUES (?, 1) "
+            "ON CONFLICT (template_key) DO UPDATE SET revision = revision + 1",
+            (template_key,),
+        )
+
+    def load_activity_descriptions(self, template_key: str = DEFAULT_TEMPLATE_KEY) -> Dict[str, str]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT encounter_date, description FROM activity_descriptions "
+            "WHERE template_key = ? ORDER BY encounter_date", (template_key,)
+        ).fetchall()
+        return {_from_iso(iso): description for iso, description in rows}
+
+    def save_template_config(self, config: dict, template_key: str = DEFAULT_TEMPLATE_KEY):
+        """Substitui a configuração inteira (configurações e descrições) em uma transação"""
+        self.transaction(lambda conn: self._replace_template(conn, config, template_key))
+
+    def _replace_template(self, conn: sqlite3.Connection, config: dict, template_key: str):
+        settings = {k: v for k, v in config.items() if k != "activity_descriptions"}
+        conn.execute("DELETE FROM template_settings WHERE template_key = ?", (template_key,))
+        conn.executemany(
+            "INSERT INTO template_settings (template_key, name, value) VALUES (?, ?, ?)",
+            [(template_key, name, json.dumps(value, ensure_ascii=False)) for name, value in settings.items()],
+        )
+        conn.execute("DELETE FROM activity_descriptions WHERE template_key = ?", (template_key,))
+        self._upsert_descriptions(conn, config.get("activity_descriptions", {}), template_key)
+
+    def _upsert_descriptions(self, conn: sqlite3.Connection, descriptions: Dict[str, str], template_key: str):
+        self._bump_revision(conn, template_key)
+        conn.executemany(
+            "INSERT INTO activity_descriptions (template_key, encounter_date, description) VALUES (?, ?, ?) "
+            "ON CONFLICT (template_key, encounter_date) DO UPDATE SET description = excluded.description",
+            [(template_key, _to_iso(date_str), desc) for date_str, desc in descriptions.items() if desc.strip()],
+        )
+
+    def set_activity_description(self, date_str: str, description: str,
+                                 template_key: str = DEFAULT_TEMPLATE_KEY):
+        """Grava (ou remove, se vazia) a descrição de um único encontro"""
+        if not description.strip():
+            self.remove_activity_description(date_str, template_key)
+            return
+        self.transaction(lambda conn: self._upsert_descriptions(conn, {date_str: description}, template_key))
+
+    def set_activity_descriptions(self, descriptions: Dict[str, str],
+                                  template_key: str = DEFAULT_TEMPLATE_KEY):
+        """Grava várias descrições em uma transação"""
+        self.transaction(lambda conn: self._upsert_descriptions(conn, descriptions, template_key))
+
+    def remove_activity_description(self, date_str: str, template_key: str = DEFAULT_TEMPLATE_KEY):
+        def _remove(conn):
+            conn.execute(
+                "DELETE FROM activity_descriptions WHERE template_key = ? AND encounter_date = ?",
+                (template_key, _to_iso(date_str)),
+            )
+            self._bump_revision(conn, template_key)
+        self.transaction(_remove)
+
+    def clear_template_config(self, template_key: str = DEFAULT_TEMPLATE_KEY):
+        def _clear(conn):
+            conn.execute("DELETE FROM template_settings WHERE template_key = ?", (template_key,))
+            conn.execute("DELETE FROM activity_descriptions WHERE template_key = ?", (template_key,))
+            self._bump_revision(conn, template_key)
+        self.transaction(_clear)
+
+    # ------------------------------------------------------------------
+    # Feriados personalizados
+    # ------------------------------------------------------------------
+    def load_custom_holidays(self) -> Dict[str, str]:
+        """Retorna {data ISO: nome}, no mesmo formato do antigo custom_holidays.json"""
+        conn = self._connect()
+        rows = conn.execute("SELECT holiday_date, name FROM custom_holidays ORDER BY holiday_date").fetchall()
+        return dict(rows)
+
+    def add_custom_holiday(self, iso_date: str, name: str):
+        self.transaction(lambda conn: conn.execute(
+            "INSERT INTO custom_holidays (holiday_date, name) VALUES (?, ?) "
+            "ON CONFLICT (holiday_date) DO UPDATE SET name = excluded.name",
+            (iso_date, name),
+        ))
+
+    def remove_custom_holiday(self, iso_date: str):
+        self.transaction(lambda conn: conn.execute(
+            "DELETE FROM custom_holidays WHERE holiday_date = ?", (iso_date,)
+        ))
+
+    def merge_custom_holidays(self, holidays_dict: Dict[str, str]):
+        """Adiciona/atualiza vários feriados em uma transação (uma única alteração de versão)"""
+        self.transaction(lambda conn: conn.executemany(
+            "INSERT INTO custom_holidays (holiday_date, name) VALUES (?, ?) "
+            "ON CONFLICT (holiday_date) DO UPDATE SET name = excluded.name",
+            list(holidays_dict.items()),
+        ))
+
+    def save_custom_holidays(self, holidays_dict: Dict[str, str]):
+        """Substitui todos os feriados personalizados"""
+        def _replace(conn):
+            conn.execute("DELETE FROM custom_holidays")
+            conn.executemany(
+                "INSERT INTO custom_holidays (holiday_date, name) VALUES (?, ?)",
+                list(holidays_dict.items()),
+            )
+        self.transaction(_replace)
+
+    # ------------------------------------------------------------------
+    # Calendários regionais por polo
+    # ------------------------------------------------------------------
+    def load_polo_regions(self) -> Dict[str, str]:
+        """Retorna {polo: subdivisão (UF)}"""
+        rows = self._connect().execute("SELECT polo, subdiv FROM polo_regions ORDER BY polo").fetchall()
+        return dict(rows)
+
+    def set_polo_region(self, polo: str, subdiv: str):
+        self.transaction(lambda conn: conn.execute(
+            "INSERT INTO polo_regions (polo, subdiv) VALUES (?, ?) "
+            "ON CONFLICT (polo) DO UPDATE SET subdiv = excluded.subdiv",
+            (polo, subdiv),
+        ))
+
+    def remove_polo_region(self, polo: str):
+        self.transaction(lambda conn: conn.execute("DELETE FROM polo_regions WHERE polo = ?", (polo,)))
+
+    def load_polo_holidays(self) -> Dict[str, Dict[str, str]]:
+        """Retorna {polo: {data ISO: nome}} com os feriados municipais de cada polo"""
+        rows = self._connect().execute(
+            "SELECT polo, holiday_date, name FROM polo_holidays ORDER BY polo, holiday_date"
+        ).fetchall()
+        result: Dict[str, Dict[str, str]] = {}
+        for polo, iso_date, name in rows:
+            result.setdefault(polo, {})[iso_date] = name
+        return result
+
+    def merge_polo_holidays(self, polo: str, holidays_dict: Dict[str, str]):
+        """Adiciona/atualiza vários feriados municipais de um polo em uma transação"""
+        self.transaction(lambda conn: conn.executemany(
+            "INSERT INTO polo_holidays (polo, holiday_date, name) VALUES (?, ?, ?) "
+            "ON CONFLICT (polo, holiday_date) DO UPDATE SET name = excluded.name",
+            [(polo, iso_date, name) for iso_date, name in holidays_dict.items()],
+        ))
+
+    def remove_polo_holiday(self, polo: str, iso_date: str):
+        self.transaction(lambda conn: conn.execute(
+            "DELETE FROM polo_holidays WHERE polo = ? AND holiday_date = ?", (polo, iso_date)
+        ))
+
+    # ------------------------------------------------------------------
+    # Importação / exportação JSON
+    # ------------------------------------------------------------------
+    def _import_files(self, conn: sqlite3.Connection, template_path: Optional[str],
+                      holidays_path: Optional[str], replace: bool = True):
+        if template_path and os.path.exists(template_path):
+            self._replace_template(conn, read_json(template_path), DEFAULT_TEMPLATE_KEY)
+        if holidays_path and os.path.exists(holidays_path):
+            holidays_dict = read_json(holidays_path)
+            if replace:
+                conn.execute("DELETE FROM custom_holidays")
+            conn.executemany(
+                "INSERT INTO custom_holidays (holiday_date, name) VALUES (?, ?) "
+                "ON CONFLICT (holiday_date) DO UPDATE SET name = excluded.name",
+                list(holidays_dict.items()),
+            )
+
+    def import_json(self, template_path: Optional[str] = None, holidays_path: Optional[str] = None):
+        """Substitui o conteúdo do banco pelos arquivos JSON informados"""
+        self.transaction(lambda conn: self._import_files(conn, template_path, holidays_path))
+
+    def export_json(self, template_path: Optional[str] = None, holidays_path: Optional[str] = None):
+        """Exporta o template padrão e os feriados para arquivos JSON"""
+        if template_path:
+            write_json_atomic(template_path, self.load_template_config())
+        if holidays_path:
+            write_json_atomic(holidays_path, self.load_custom_holidays())
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ConfigStore:
+    """Retorna o ConfigStore compartilhado pelo processo"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore()
+        return _store
+
+
+def add_change_listener(callback: Callable[[int], None]):
+    """Registra callback(versão) para alterações do banco compartilhado"""
+    get_store().add_listener(callback)
+
+
+def load_template_config() -> dict:
+    """Carrega a configuração do template de estágio"""
+    return get_store().load_template_config()
+
+
+def save_template_config(config: dict):
+    """Salva a configuração do template de estágio"""
+    get_store().save_template_config(config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa/exporta as configurações em JSON")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("--template", help="Arquivo JSON do template do supervisor")
+    parser.add_argument("--holidays", help="Arquivo JSON de feriados personalizados")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    store = ConfigStore(args.db)
+    if args.action == "import":
+        try:
+            store.import_json(args.template, args.holidays)
+        except ConfigFileError as e:
+            print(f"Erro: {e}")
+            raise SystemExit(1)
+    else:
+        store.export_json(args.template, args.holidays)
+    print(f"{args.action} concluído ({args.db})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,87 @@
 """
 Utilitários para manipulação de datas e feriados brasileiros.
+
+Os feriados podem ser regionais: cada polo é associado a uma UF (ou outra
+subdivisão de holidays.Brazil, como "São Paulo Capital") e pode ter feriados
+municipais próprios. Os calendários oficiais ficam em um cache LRU por
+(subdivisão, ano), de modo que estudantes de polos da mesma UF compartilham
+o mesmo calendário em execuções em lote.
+
+Os feriados oficiais vêm da tabela pré-calculada (holiday_table.py) quando ela
+cobre a subdivisão e o ano; o pacote holidays só é usado fora desse intervalo.
 """
-import holidays
-from datetime import date, timedelta
-from typing import List, Dict
-import json
 import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, List, Dict, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from datetime import date, timedelta
+
+from config_store import get_store
+from holiday_table import get_holiday_table
+
+try:
+    import holidays
+except ImportError:  # necessário apenas para anos fora da tabela pré-calculada
+    holidays = None
+
 
+# (versão do banco, feriados personalizados) — recarregado quando a versão muda
+_custom_holidays_cache: Optional[Tuple[int, Dict[date, str]]] = None
+_custom_holidays_lock = threading.Lock()
 
-# Caminho para arquivo de feriados personalizados
-CUSTOM_HOLIDAYS_FILE = "./custom_holidays.json"
+# Calendários oficiais (subdivisão, ano) mantidos em memória
+REGIONAL_CACHE_SIZE = int(os.environ.get("ESTAGIO_HOLIDAY_CACHE_SIZE", "256"))
+# Índices de feriados (um por calendário regional) mantidos em memória
+INDEX_CACHE_SIZE = 32
+
+
+def _available_subdivisions() -> Tuple[str, ...]:
+    if holidays is not None:
+        return tuple(holidays.Brazil.subdivisions)
+    table = get_holiday_table()
+    return tuple(s for s in table.subdivisions if s) if table is not None else ()
+
+
+# Subdivisões aceitas por holidays.Brazil (UFs e municípios suportados)
+SUBDIVISIONS: Tuple[str, ...] = _available_subdivisions()
+
+# Polos sem UF cadastrada: capitais reconhecidas pelo nome
+DEFAULT_POLO_SUBDIVISIONS = {
+    "RIO BRANCO": "AC", "MACEIO": "AL", "MANAUS": "AM", "MACAPA": "AP",
+    "SALVADOR": "BA", "FORTALEZA": "CE", "BRASILIA": "DF", "VITORIA": "ES",
+    "GOIANIA": "GO", "SAO LUIS": "MA", "BELO HORIZONTE": "MG",
+    "CAMPO GRANDE": "MS", "CUIABA": "MT", "BELEM": "PA", "JOAO PESSOA": "PB",
+    "RECIFE": "PE", "TERESINA": "PI", "CURITIBA": "PR", "RIO DE JANEIRO": "RJ",
+    "NATAL": "RN", "PORTO VELHO": "RO", "BOA VISTA": "RR", "PORTO ALEGRE": "RS",
+    "FLORIANOPOLIS": "SC", "ARACAJU": "SE", "SAO PAULO": "São Paulo Capital",
+    "PALMAS": "TO",
+}
 
 
 def load_custom_holidays() -> Dict[str, str]:
-    """Carrega feriados personalizados do arquivo"""
-    if os.path.exists(CUSTOM_HOLIDAYS_FILE):
-        try:
-            with open(CUSTOM_HOLIDAYS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Carrega feriados personalizados ({data ISO: nome})"""
+    return get_store().load_custom_holidays()
 
 
 def save_custom_holidays(holidays_dict: Dict[str, str]):
-    """Salva feriados personalizados no arquivo"""
-    with open(CUSTOM_HOLIDAYS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(holidays_dict, f, ensure_ascii=False, indent=2)
+    """Salva (substitui) todos os feriados personalizados"""
+    get_store().save_custom_holidays(holidays_dict)
 
 
 def add_custom_holiday(date_obj: date, name: str):
     """Adiciona um feriado personalizado"""
-    holidays_dict = load_custom_holidays()
-    holidays_dict[date_obj.isoformat()] = name
-    save_custom_holidays(holidays_dict)
+    get_store().add_custom_holiday(date_obj.isoformat(), name)
 
 
 def remove_custom_holiday(date_obj: date):
     """Remove um feriado personalizado"""
-    holidays_dict = load_custom_holidays()
-    date_str = date_obj.isoformat()
-    if date_str in holidays_dict:
-        del holidays_dict[date_str]
-        save_custom_holidays(holidays_dict)
+    get_store().remove_custom_holiday(date_obj.isoformat())
 
 
 def clear_custom_holidays():
@@ -50,39 +89,242 @@ def clear_custom_holidays():
     save_custom_holidays({})
 
 
+def set_polo_subdivision(polo: str, subdiv: str):
+    """Associa o polo a uma subdivisão de holidays.Brazil (UF ou município suportado)"""
+    if subdiv not in SUBDIVISIONS:
+        raise ValueError(f"Subdivisão desconhecida: {subdiv}")
+    get_store().set_polo_region(normalize_polo(polo), subdiv)
+
+
+def remove_polo_subdivision(polo: str):
+    """Remove a UF cadastrada para o polo (volta a ser deduzida pelo nome)"""
+    get_store().remove_polo_region(normalize_polo(polo))
+
+
+def merge_polo_holidays(polo: str, holidays_dict: Dict[str, str]):
+    """Adiciona/atualiza feriados municipais do polo ({data ISO: nome}) em uma transação"""
+    get_store().merge_polo_holidays(normalize_polo(polo), holidays_dict)
+
+
+def remove_polo_holiday(polo: str, date_obj: date):
+    """Remove um feriado municipal do polo"""
+    get_store().remove_polo_holiday(normalize_polo(polo), date_obj.isoformat())
+
+
+def _custom_holidays_snapshot() -> Dict[date, str]:
+    """Feriados personalizados em cache, validado pelo contador de versão do banco"""
+    global _custom_holidays_cache
+    store = get_store()
+    version = store.get_version()
+    cached = _custom_holidays_cache
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _custom_holidays_lock:
+        holidays_dict = store.load_custom_holidays()
+        snapshot = {date.fromisoformat(k): v for k, v in holidays_dict.items()}
+        _custom_holidays_cache = (version, snapshot)
+    return snapshot
+
+
 def get_custom_holidays() -> Dict[date, str]:
     """Retorna todos os feriados personalizados"""
-    holidays_dict = load_custom_holidays()
-    return {date.fromisoformat(k): v for k, v in holidays_dict.items()}
+    return dict(_custom_holidays_snapshot())
+
+
+@lru_cache(maxsize=REGIONAL_CACHE_SIZE)
+def _official_holidays(subdiv: str, year: int) -> Mapping[date, str]:
+    """Feriados oficiais de uma subdivisão ("" = apenas nacionais) em um ano"""
+    table = get_holiday_table()
+    if table is not None and table.covers(subdiv, year):
+        return MappingProxyType(table.holidays(subdiv, year))
+    if holidays is None:
+        raise RuntimeError(f"Feriados de {year} fora da tabela pré-calculada: instale o pacote holidays")
+    calendar = holidays.Brazil(years=year, subdiv=subdiv or None)
+    return MappingProxyType(dict(calendar.items()))
+
+
+def get_brazilian_holidays(year: int, subdiv: Optional[str] = None) -> Mapping[date, str]:
+    """Retorna os feriados brasileiros (nacionais e, se informada, da subdivisão) de um ano"""
+    return _official_holidays(subdiv or "", year)
+
+
+def normalize_polo(polo: Optional[str]) -> str:
+    """Nome do polo sem acentos, espaços extras e diferença de maiúsculas"""
+    text = unicodedata.normalize("NFKD", str(polo or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split()).upper()
 
 
-def get_brazilian_holidays(year: int) -> holidays.HolidayBase:
-    """Retorna os feriados brasileiros para um ano específico"""
-    return holidays.Brazil(years=year)
+def _guess_subdivision(normalized_polo: str) -> str:
+    """UF pelo sufixo do nome ("Polo Centro - DF", "Campinas/SP") ou pela capital"""
+    match = re.search(r"[-/(,]\s*([A-Z]{2})\)?$", normalized_polo)
+    if match and match.group(1) in SUBDIVISIONS:
+        return match.group(1)
+    name = re.sub(r"^POLO\s+", "", normalized_polo)
+    return DEFAULT_POLO_SUBDIVISIONS.get(name, "")
 
 
-def is_brazilian_holiday(date_obj: date) -> bool:
-    """Verifica se uma data é feriado brasileiro (oficial ou personalizado)"""
-    # Verificar feriados personalizados
-    custom_holidays = get_custom_holidays()
-    if date_obj in custom_holidays:
-        return True
+# (versão do banco, {polo: subdivisão}, {polo: {data: nome}}) — chaves normalizadas
+_regional_cache: Optional[Tuple[int, Dict[str, str], Dict[str, Dict[date, str]]]] = None
+
+
+def _regional_snapshot() -> Tuple[Dict[str, str], Dict[str, Dict[date, str]]]:
+    """Cadastro de polos e feriados municipais, validado pelo contador de versão do banco"""
+    global _regional_cache
+    store = get_store()
+    version = store.get_version()
+    cached = _regional_cache
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    regions = {normalize_polo(polo): subdiv for polo, subdiv in store.load_polo_regions().items()}
+    local: Dict[str, Dict[date, str]] = {}
+    for polo, holidays_dict in store.load_polo_holidays().items():
+        local.setdefault(normalize_polo(polo), {}).update(
+            (date.fromisoformat(k), v) for k, v in holidays_dict.items())
+    _regional_cache = (version, regions, local)
+    return regions, local
+
+
+def get_polo_subdivision(polo: Optional[str]) -> str:
+    """Subdivisão (UF) do polo: cadastrada, deduzida do nome ou "" (apenas nacionais)"""
+    normalized = normalize_polo(polo)
+    if not normalized:
+        return ""
+    regions, _ = _regional_snapshot()
+    return regions.get(normalized) or _guess_subdivision(normalized)
+
+
+def get_holiday_calendar_key(polo: Optional[str]) -> Tuple[str, str]:
+    """
+    Identificação do calendário do polo: (subdivisão, polo com feriados municipais).
     
-    # Verificar feriados oficiais
-    br_holidays = get_brazilian_holidays(date_obj.year)
-    return date_obj in br_holidays
+    Polos da mesma UF sem feriados municipais próprios têm a mesma chave e
+    compartilham o mesmo índice de feriados.
+    """
+    normalized = normalize_polo(polo)
+    _, local = _regional_snapshot()
+    return get_polo_subdivision(normalized), normalized if normalized in local else ""
 
 
-def get_holiday_name(date_obj: date) -> str:
-    """Retorna o nome do feriado se a data for feriado"""
-    # Verificar feriados personalizados primeiro
-    custom_holidays = get_custom_holidays()
-    if date_obj in custom_holidays:
-        return f"{custom_holidays[date_obj]} (Personalizado)"
+def get_polo_regions() -> Dict[str, str]:
+    """Polos cadastrados e suas subdivisões ("" = UF deduzida pelo nome)"""
+    regions, local = _regional_snapshot()
+    polos = {polo: "" for polo in local}
+    polos.update(regions)
+    return dict(sorted(polos.items()))
+
+
+def get_polo_holidays(polo: Optional[str]) -> Dict[date, str]:
+    """Feriados municipais cadastrados para o polo"""
+    _, local = _regional_snapshot()
+    return dict(local.get(normalize_polo(polo), {}))
+
+
+class HolidayIndex:
+    """
+    Índice de feriados (oficiais, personalizados e municipais) para consultas individuais e em lote.
+    
+    Os feriados oficiais de cada ano são calculados uma única vez, quando o ano
+    é consultado pela primeira vez; as datas ficam também em um array ordenado
+    de ordinais (numpy) usado por mask() para validar muitas datas de uma vez.
+    Com subdiv, inclui os feriados estaduais/municipais de holidays.Brazil;
+    local_holidays são os feriados municipais cadastrados para o polo.
+    """
+    
+    def __init__(self, custom_holidays: Dict[date, str], subdiv: str = "",
+                 local_holidays: Optional[Dict[date, str]] = None):
+        self.subdiv = subdiv
+        self._custom = custom_holidays
+        self._local = local_holidays or {}
+        self._official: Dict[date, str] = {}
+        self._years: Set[int] = set()
+        extra_dates = set(custom_holidays) | set(self._local)
+        self._ordinals = np.array(sorted(d.toordinal() for d in extra_dates), dtype=np.int64)
+        self._lock = threading.Lock()
+    
+    def _ensure_years(self, years: Iterable[int]):
+        missing = set(years) - self._years
+        if not missing:
+            return
+        with self._lock:
+            missing = set(years) - self._years
+            for year in sorted(missing):
+                self._official.update(get_brazilian_holidays(year, self.subdiv).items())
+            self._years = self._years | missing
+            all_dates = set(self._official) | set(self._custom) | set(self._local)
+            self._ordinals = np.array(sorted(d.toordinal() for d in all_dates), dtype=np.int64)
     
-    # Verificar feriados oficiais
-    br_holidays = get_brazilian_holidays(date_obj.year)
-    return br_holidays.get(date_obj, "")
+    def is_holiday(self, date_obj: date) -> bool:
+        if date_obj in self._custom or date_obj in self._local:
+            return True
+        self._ensure_years((date_obj.year,))
+        return date_obj in self._official
+    
+    def name(self, date_obj: date) -> str:
+        """Nome do feriado ("" se não for feriado); municipais e personalizados têm precedência"""
+        if date_obj in self._local:
+            return f"{self._local[date_obj]} (Municipal)"
+        if date_obj in self._custom:
+            return f"{self._custom[date_obj]} (Personalizado)"
+        self._ensure_years((date_obj.year,))
+        return self._official.get(date_obj, "")
+    
+    def mask(self, ordinals: Sequence[int]) -> np.ndarray:
+        """Vetor booleano: quais ordinais (date.toordinal()) são feriados"""
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        if ordinals.size == 0:
+            return np.zeros(0, dtype=bool)
+        first_year = date.fromordinal(int(ordinals.min())).year
+        last_year = date.fromordinal(int(ordinals.max())).year
+        self._ensure_years(range(first_year, last_year + 1))
+        return np.isin(ordinals, self._ordinals)
+    
+    def between(self, start_date: date, end_date: date) -> Set[date]:
+        """Feriados entre start_date e end_date (inclusivo)"""
+        self._ensure_years(range(start_date.year, end_date.year + 1))
+        lo = np.searchsorted(self._ordinals, start_date.toordinal(), side="left")
+        hi = np.searchsorted(self._ordinals, end_date.toordinal(), side="right")
+        return {date.fromordinal(int(o)) for o in self._ordinals[lo:hi]}
+
+
+# chave do calendário -> (versão do banco, índice); LRU limitado a INDEX_CACHE_SIZE
+_holiday_indexes: "OrderedDict[Tuple[str, str], Tuple[int, HolidayIndex]]" = OrderedDict()
+_holiday_indexes_lock = threading.Lock()
+
+
+def get_holiday_index(polo: Optional[str] = None) -> HolidayIndex:
+    """Índice de feriados do polo (ou só nacionais), validado pelo contador de versão do banco"""
+    version = get_store().get_version()
+    key = get_holiday_calendar_key(polo)
+    with _holiday_indexes_lock:
+        cached = _holiday_indexes.get(key)
+        if cached is not None and cached[0] == version:
+            _holiday_indexes.move_to_end(key)
+            return cached[1]
+    subdiv, local_polo = key
+    index = HolidayIndex(_custom_holidays_snapshot(), subdiv,
+                         get_polo_holidays(local_polo) if local_polo else None)
+    with _holiday_indexes_lock:
+        _holiday_indexes[key] = (version, index)
+        _holiday_indexes.move_to_end(key)
+        while len(_holiday_indexes) > INDEX_CACHE_SIZE:
+            _holiday_indexes.popitem(last=False)
+    return index
+
+
+def is_brazilian_holiday(date_obj: date, polo: Optional[str] = None) -> bool:
+    """Verifica se uma data é feriado brasileiro (oficial, regional do polo ou personalizado)"""
+    return get_holiday_index(polo).is_holiday(date_obj)
+
+
+def get_holiday_name(date_obj: date, polo: Optional[str] = None) -> str:
+    """Retorna o nome do feriado se a data for feriado"""
+    return get_holiday_index(polo).name(date_obj)
+
+
+def get_holidays_between(start_date: date, end_date: date, polo: Optional[str] = None) -> Set[date]:
+    """Feriados (oficiais, regionais do polo e personalizados) entre start_date e end_date (inclusivo)"""
+    return get_holiday_index(polo).between(start_date, end_date)
 
 
 def generate_date_range(start_date: date, end_date: date) -> List[date]:
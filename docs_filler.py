@@ -3,11 +3,18 @@ Sistema de preenchimento automático de documentos de estágio em PDF.
 """
 import fitz  # PyMuPDF
 import os
+import time
 from dataclasses import asdict
-from typing import Dict, Tuple, List
+from typing import Any, Dict, Tuple, List
 from abc import ABC, abstractmethod
 
 from models import UserData, InternshipData, ShiftData, DocumentData
+from instrumentation import span
+from reproducible import save_pdf
+from mid_pdf_templates import file_digest
+from metrics import (
+    DOCUMENTS_GENERATED, BUNDLES_GENERATED, BUNDLE_SECONDS, MERGE_BYTES, record_template_cache,
+)
 
 
 class PDFConfig:
@@ -16,10 +23,26 @@ class PDFConfig:
     OUTPUT_PATH = "./filled_docs/"
     DEFAULT_FONT_SIZE = 12
     
+    # Conteúdo dos templates em memória: caminho -> (mtime, bytes)
+    _template_cache: Dict[str, Tuple[int, bytes]] = {}
+    
     @classmethod
     def get_template_file(cls, filename: str) -> str:
         return os.path.join(cls.TEMPLATE_PATH, filename)
     
+    @classmethod
+    def open_template(cls, filename: str) -> Tuple[fitz.Document, bool]:
+        """Abre o template a partir do cache em memória. Retorna (documento, cache_hit)"""
+        path = cls.get_template_file(filename)
+        mtime = os.stat(path).st_mtime_ns
+        cached = cls._template_cache.get(path)
+        cache_hit = cached is not None and cached[0] == mtime
+        if not cache_hit:
+            with open(path, 'rb') as f:
+                cached = (mtime, f.read())
+            cls._template_cache[path] = cached
+        return fitz.open(stream=cached[1], filetype="pdf"), cache_hit
+    
     @classmethod
     def get_output_file(cls, filename: str) -> str:
         os.makedirs(cls.OUTPUT_PATH, exist_ok=True)
@@ -47,18 +70,38 @@ class BasePDFFiller(ABC):
         """Preenche a página do PDF com os dados"""
         pass
     
+    @abstractmethod
+    def get_field_values(self) -> Dict[str, Any]:
+        """Valores que fill_page escreve no PDF (entradas do documento no build_graph)"""
+        pass
+    
+    def get_inputs(self) -> Dict[str, Any]:
+        """Entradas que determinam o PDF gerado: template, tamanho da fonte e valores escritos"""
+        return {
+            "template": file_digest(PDFConfig.get_template_file(self.get_template_name())),
+            "font_size": self.font_size,
+            **self.get_field_values(),
+        }
+    
     def fill(self) -> str:
         """Preenche o PDF e retorna o caminho do arquivo gerado"""
-        template_file = PDFConfig.get_template_file(self.get_template_name())
         output_file = PDFConfig.get_output_file(self.get_output_name(self._get_identifier()))
         
-        doc = fitz.open(template_file)
-        
-        print(f"Preenchendo {self.__class__.__name__}...")
-        self.fill_page(doc[0], doc)
-        
-        doc.save(output_file)
-        doc.close()
+        with span("pdf.fill", document=self.__class__.__name__, ra=self._get_identifier()):
+            with span("pdf.template_open", template=self.get_template_name()) as open_span:
+                doc, cache_hit = PDFConfig.open_template(self.get_template_name())
+                open_span.set(cache_hit=cache_hit)
+            record_template_cache("pdf", cache_hit)
+            
+            print(f"Preenchendo {self.__class__.__name__}...")
+            with span("pdf.fill_page"):
+                self.fill_page(doc[0], doc)
+            
+            with span("pdf.save") as save_span:
+                save_pdf(doc, output_file)
+                doc.close()
+                save_span.record_file(output_file)
+        DOCUMENTS_GENERATED.inc(document=self.__class__.__name__)
         
         print(f"PDF salvo em: {output_file}")
         return output_file
@@ -97,6 +140,10 @@ class ChecklistPDFFiller(BasePDFFiller):
     def _get_identifier(self) -> str:
         return self.user_data.ra
     
+    def get_field_values(self) -> Dict[str, Any]:
+        user_dict = asdict(self.user_data)
+        return {name: user_dict[name] for name in self.FIELD_COORDS if name in user_dict}
+    
     def fill_page(self, page, doc) -> None:
         """Preenche a página do checklist"""
         user_dict = asdict(self.user_data)
@@ -134,6 +181,9 @@ class FrequencySheetPDFFiller(BasePDFFiller):
     def _get_identifier(self) -> str:
         return self.user_data.ra
     
+    def get_field_values(self) -> Dict[str, Any]:
+        return {"nome": self.user_data.nome, "ra": self.user_data.ra}
+    
     def fill_page(self, page, doc) -> None:
         """Preenche a folha de frequência"""
         print(f"  Preenchendo frequência {self.sheet_number - 1}")
@@ -171,6 +221,9 @@ class InternshipDeclarationPDFFiller(BasePDFFiller):
     def _get_identifier(self) -> str:
         return self.user_data.ra
     
+    def get_field_values(self) -> Dict[str, Any]:
+        return {"nome": self.user_data.nome, "ra": self.user_data.ra}
+    
     def fill_page(self, page, doc) -> None:
         """Preenche a declaração de realização de estágio"""
         print(f"  Preenchendo declaração de realização de estágio")
@@ -208,6 +261,9 @@ class MandatoryActivityPDFFiller(BasePDFFiller):
     def _get_identifier(self) -> str:
         return self.user_data.ra
     
+    def get_field_values(self) -> Dict[str, Any]:
+        return {"nome": self.user_data.nome, "ra": self.user_data.ra}
+    
     def fill_page(self, page, doc) -> None:
         """Preenche a declaração de atividade obrigatória"""
         print(f"  Preenchendo declaração de atividade obrigatória")
@@ -238,9 +294,9 @@ class DocFiller:
         filler = ChecklistPDFFiller(self.data.user)
         return filler.fill()
     
-    def fill_frequency_sheets(self) -> List[str]:
-        """Preenche todas as folhas de frequência necessárias (máximo 3)"""
-        output_files = []
+    def get_frequency_sheet_fillers(self) -> List[FrequencySheetPDFFiller]:
+        """Fillers das folhas de frequência necessárias (máximo 3)"""
+        fillers = []
         # Divide os turnos em grupos (assumindo ~10 turnos por folha)
         shifts_per_sheet = 6
         num_sheets = (len(self.data.shifts) + shifts_per_sheet - 1) // shifts_per_sheet
@@ -253,15 +309,18 @@ class DocFiller:
             end_idx = min(start_idx + shifts_per_sheet, len(self.data.shifts))
             shifts_subset = self.data.shifts[start_idx:end_idx]
             
-            filler = FrequencySheetPDFFiller(
+            fillers.append(FrequencySheetPDFFiller(
                 self.data.user,
                 self.data.internship,
                 shifts_subset,
                 sheet_number=i + 2  # freq1 é template 2_freq1.pdf
-            )
-            output_files.append(filler.fill())
+            ))
         
-        return output_files
+        return fillers
+    
+    def fill_frequency_sheets(self) -> List[str]:
+        """Preenche todas as folhas de frequência necessárias (máximo 3)"""
+        return [filler.fill() for filler in self.get_frequency_sheet_fillers()]
     
     def fill_internship_declaration(self) -> str:
         """Preenche a declaração de realização de estágio"""
@@ -273,18 +332,31 @@ class DocFiller:
         filler = MandatoryActivityPDFFiller(self.data.user, self.data.internship)
         return filler.fill()
     
+    def get_fillers(self) -> Dict[str, List[BasePDFFiller]]:
+        """Fillers de cada categoria, na ordem do PDF mesclado"""
+        return {
+            "checklist": [ChecklistPDFFiller(self.data.user)],
+            "frequency_sheets": self.get_frequency_sheet_fillers(),
+            "internship_declaration": [InternshipDeclarationPDFFiller(self.data.user, self.data.internship)],
+            "mandatory_activity": [MandatoryActivityPDFFiller(self.data.user, self.data.internship)],
+        }
+    
     def fill_all_documents(self) -> Dict[str, List[str]]:
         """Preenche todos os documentos necessários"""
         print("\n" + "="*60)
         print("INICIANDO PREENCHIMENTO DE TODOS OS DOCUMENTOS")
         print("="*60 + "\n")
         
-        results = {
-            "checklist": [self.fill_checklist()],
-            "frequency_sheets": self.fill_frequency_sheets(),
-            "internship_declaration": [self.fill_internship_declaration()],
-            "mandatory_activity": [self.fill_mandatory_activity()]
-        }
+        started = time.perf_counter()
+        with span("bundle.fill_all", ra=self.data.user.ra):
+            results = {
+                "checklist": [self.fill_checklist()],
+                "frequency_sheets": self.fill_frequency_sheets(),
+                "internship_declaration": [self.fill_internship_declaration()],
+                "mandatory_activity": [self.fill_mandatory_activity()]
+            }
+        BUNDLE_SECONDS.observe(time.perf_counter() - started, kind="final")
+        BUNDLES_GENERATED.inc(kind="final")
         
         print("\n" + "="*60)
         print("TODOS OS DOCUMENTOS FORAM PREENCHIDOS COM SUCESSO!")
@@ -293,6 +365,41 @@ class DocFiller:
         return results
 
 
+# Ordem dos documentos no PDF mesclado
+MERGE_ORDER = ["checklist", "frequency_sheets", "internship_declaration", "mandatory_activity"]
+
+
+def get_merged_pdf_path(ra: str) -> str:
+    return PDFConfig.get_output_file(f"documentos_estagio_{ra}.pdf")
+
+
+def merge_pdfs_to_single_file(files: Dict[str, List[str]], ra: str) -> str:
+    """Mescla todos os PDFs gerados em um único arquivo"""
+    output_path = get_merged_pdf_path(ra)
+    
+    with span("pdf.merge", ra=ra) as merge_span:
+        # Criar documento PDF final
+        merged_pdf = fitz.open()
+        
+        for category in MERGE_ORDER:
+            if category in files:
+                for file_path in files[category]:
+                    if os.path.exists(file_path):
+                        # Abrir e adicionar cada PDF
+                        pdf_document = fitz.open(file_path)
+                        merged_pdf.insert_pdf(pdf_document)
+                        pdf_document.close()
+        
+        # Salvar PDF mesclado
+        merge_span.set(pages=merged_pdf.page_count)
+        save_pdf(merged_pdf, output_path)
+        merged_pdf.close()
+        merge_span.record_file(output_path)
+    MERGE_BYTES.observe(os.path.getsize(output_path))
+    
+    return output_path
+
+
 # Exemplo de uso
 if __name__ == "__main__":
     # Dados do usuário
@@ -0,0 +1,645 @@
+"""
+Serviço HTTP/JSON local para geração de documentos por outros sistemas.
+
+Os corpos seguem os esquemas de required_data.py:
+    {
+      "user": {"nome": ..., "ra": ..., ...},            required_user_data
+      "internship": {"disciplina_estagio": ..., ...},   internship_data
+      "shifts": [{"horario_inicio": "08:00", ...}],     shift_data
+      "activity_descriptions": {"DD/MM/YYYY": "..."}    opcional
+    }
+
+Endpoints:
+    POST /v1/bundles/final        PDF mesclado (application/pdf), síncrono
+    POST /v1/bundles/mid          ZIP dos relatórios intermediários, síncrono
+    POST /v1/jobs/final|mid       202 {"job_id": ...}: geração em segundo plano
+    (?priority=interactive|batch  classe do pedido; padrão interativo para
+                                  /v1/bundles e lote para /v1/jobs)
+    GET  /v1/jobs/<id>            situação do trabalho
+    GET  /v1/jobs/<id>/result     arquivo gerado (quando concluído)
+    GET  /health                  workers, fila, trabalhos e aquecimento
+                                  ("status": "warming" até os workers ficarem prontos)
+
+A geração roda em um pool limitado de processos (PyMuPDF não é thread-safe)
+com build_graph.py, de modo que pedidos repetidos reaproveitam os documentos
+que não mudaram. Pedidos idênticos em andamento compartilham o mesmo trabalho.
+Os trabalhos só chegam ao pool quando o escalonador (scheduler.py) concede uma
+vaga: pedidos interativos passam à frente dos de lote, uma vaga fica reservada
+para eles e os lotes são divididos entre tenants (cabeçalho X-Tenant ou o
+supervisor do estágio). Com MAX_PENDING pedidos interativos (ou
+ESTAGIO_SCHED_BATCH_QUEUE de lote) aguardando, novos pedidos da classe recebem
+503 com Retry-After.
+As conexões são HTTP/1.1 keep-alive, com tempo ocioso máximo, limite de
+conexões simultâneas e de tamanho do corpo. O serviço escuta apenas em
+127.0.0.1 por padrão; com ESTAGIO_SERVICE_TOKEN, os pedidos devem enviar
+"Authorization: Bearer <token>".
+
+    python generation_service.py --port 8765 --workers 2
+    python service_client.py load --requests 50 --concurrency 8   # teste de carga
+"""
+import argparse
+import hmac
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from models import ActivityStorage, DocumentData, InternshipData, ShiftData, UserData
+from required_data import internship_data, required_user_data, shift_data
+from build_graph import build_final_documents, build_mid_internship_documents, fingerprint
+from docs_filler import PDFConfig
+from metrics import REGISTRY, QUEUE_DEPTH, start_metrics_server
+from output_retention import get_retention_manager
+from scheduler import (BATCH, BATCH_QUEUE, INTERACTIVE, PRIORITIES, ClassLimits,
+                       GenerationScheduler, SchedulerBusy, Ticket)
+from warmup import WarmupReport, warm_process, warm_soffice
+
+
+DEFAULT_SERVICE_PORT = int(os.environ.get("ESTAGIO_SERVICE_PORT", 8765))
+DEFAULT_WORKERS = int(os.environ.get("ESTAGIO_SERVICE_WORKERS", 2))
+# Pedidos interativos aguardando vaga (os de lote seguem ESTAGIO_SCHED_BATCH_QUEUE)
+MAX_PENDING = int(os.environ.get("ESTAGIO_SERVICE_MAX_PENDING", 32))
+MAX_BODY_BYTES = int(os.environ.get("ESTAGIO_SERVICE_MAX_BODY", 1024 * 1024))
+MAX_CONNECTIONS = int(os.environ.get("ESTAGIO_SERVICE_MAX_CONNECTIONS", 64))
+# Segundos que uma conexão keep-alive pode ficar ociosa
+KEEPALIVE_TIMEOUT = float(os.environ.get("ESTAGIO_SERVICE_KEEPALIVE", 15))
+# Espera máxima de um pedido síncrono (o trabalho continua e pode ser consultado)
+SYNC_TIMEOUT = float(os.environ.get("ESTAGIO_SERVICE_TIMEOUT", 300))
+# Trabalhos concluídos ficam consultáveis por este tempo (segundos)
+JOB_TTL = int(os.environ.get("ESTAGIO_SERVICE_JOB_TTL", 3600))
+SERVICE_TOKEN = os.environ.get("ESTAGIO_SERVICE_TOKEN", "")
+
+MAX_SHIFTS = 500
+# O RA compõe os nomes dos arquivos gerados (e o sufixo usado pela retenção)
+RA_PATTERN = re.compile(r"^[0-9A-Za-z-]{1,32}$")
+TIME_PATTERN = re.compile(r"^\d{1,2}:\d{2}$")
+
+BUNDLE_KINDS = {
+    "final": ("application/pdf", "documentos_estagio_{ra}.pdf"),
+    "mid": ("application/zip", "mid_documents_{ra}.zip"),
+}
+
+SERVICE_REQUESTS = REGISTRY.counter(
+    "estagio_service_requests_total",
+    "Pedidos ao serviço de geração", ["route", "status"])
+SERVICE_SECONDS = REGISTRY.histogram(
+    "estagio_service_seconds",
+    "Tempo de resposta do serviço de geração",
+    [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60], ["route"])
+
+
+# ----------------------------------------------------------------------
+# Validação
+# ----------------------------------------------------------------------
+class PayloadError(ValueError):
+    """Corpo do pedido fora dos esquemas de required_data.py"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _check_record(record: Any, schema: Dict[str, type], path: str, errors: List[str],
+                  optional_text: Tuple[str, ...] = ()):
+    if not isinstance(record, dict):
+        errors.append(f"{path}: esperado objeto")
+        return
+    for name, expected in schema.items():
+        if name not in record:
+            errors.append(f"{path}.{name}: campo obrigatório")
+        elif type(record[name]) is not expected:
+            errors.append(f"{path}.{name}: esperado {expected.__name__}")
+        elif expected is str and name not in optional_text and not record[name].strip():
+            errors.append(f"{path}.{name}: não pode ser vazio")
+    for name in sorted(record.keys() - schema.keys()):
+        errors.append(f"{path}.{name}: campo desconhecido")
+
+
+def _check_shift(shift: dict, path: str, errors: List[str]):
+    for name in ("horario_inicio", "horario_fim"):
+        if isinstance(shift.get(name), str) and not TIME_PATTERN.match(shift[name].strip()):
+            errors.append(f"{path}.{name}: horário inválido '{shift[name]}' (use HH:MM)")
+    if isinstance(shift.get("data"), str):
+        try:
+            datetime.strptime(shift["data"], "%d/%m/%Y")
+        except ValueError:
+            errors.append(f"{path}.data: data inválida '{shift['data']}' (use DD/MM/YYYY)")
+
+
+def parse_document_data(payload: Any) -> DocumentData:
+    """Valida o corpo (todos os erros de uma vez) e monta o DocumentData"""
+    if not isinstance(payload, dict):
+        raise PayloadError(["corpo: esperado objeto JSON"])
+    errors: List[str] = []
+    _check_record(payload.get("user"), required_user_data, "user", errors)
+    _check_record(payload.get("internship"), internship_data, "internship", errors)
+    if isinstance(payload.get("user"), dict) and isinstance(payload["user"].get("ra"), str) \
+            and not RA_PATTERN.match(payload["user"]["ra"]):
+        errors.append("user.ra: use apenas letras, números e hífen (até 32 caracteres)")
+
+    shifts = payload.get("shifts")
+    if not isinstance(shifts, list) or not shifts:
+        errors.append("shifts: esperado lista com pelo menos um turno")
+    elif len(shifts) > MAX_SHIFTS:
+        errors.append(f"shifts: no máximo {MAX_SHIFTS} turnos")
+    else:
+        for i, shift in enumerate(shifts):
+            _check_record(shift, shift_data, f"shifts[{i}]", errors, optional_text=("atividade_realizada",))
+            if isinstance(shift, dict):
+                _check_shift(shift, f"shifts[{i}]", errors)
+
+    descriptions = payload.get("activity_descriptions", {})
+    if not isinstance(descriptions, dict) or not all(
+            isinstance(k, str) and isinstance(v, str) for k, v in descriptions.items()):
+        errors.append("activity_descriptions: esperado objeto {\"DD/MM/YYYY\": \"descrição\"}")
+    for name in sorted(payload.keys() - {"user", "internship", "shifts", "activity_descriptions"}):
+        errors.append(f"{name}: campo desconhecido")
+    if errors:
+        raise PayloadError(errors)
+
+    try:
+        return DocumentData(
+            user=UserData(**payload["user"]),
+            internship=InternshipData(**payload["internship"]),
+            shifts=[ShiftData(**shift) for shift in shifts],
+            activity_descriptions=[
+                ActivityStorage(encounter_date=day, description=text)
+                for day, text in descriptions.items() if text.strip()
+            ],
+        )
+    except ValueError as e:
+        raise PayloadError([str(e)])
+
+
+def generate_bundle(kind: str, payload: dict) -> dict:
+    """Executado nos processos do pool: gera o conjunto e retorna o caminho e o resumo"""
+    document_data = parse_document_data(payload)
+    missing_pdf = False
+    if kind == "final":
+        _, path, report = build_final_documents(document_data)
+    else:
+        path, missing_pdf, report = build_mid_internship_documents(document_data)
+    return {
+        "path": os.path.abspath(path),
+        "missing_pdf": missing_pdf,
+        "rebuilt": report.rebuilt,
+        "reused": report.reused,
+    }
+
+
+# ----------------------------------------------------------------------
+# Trabalhos
+# ----------------------------------------------------------------------
+class ServiceBusy(RuntimeError):
+    """Fila cheia: o pedido deve ser repetido mais tarde"""
+
+
+@dataclass
+class Job:
+    """Geração aceita pelo serviço"""
+    id: str
+    kind: str
+    ra: str
+    key: str
+    created: float
+    priority: str
+    ticket: Ticket = field(repr=False)
+    future: Future = field(default_factory=Future, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+    finished: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished is None:
+            return "running" if self.ticket.granted else "queued"
+        return "failed" if self.error else "done"
+
+    def as_dict(self) -> dict:
+        data = {"job_id": self.id, "kind": self.kind, "ra": self.ra, "status": self.status,
+                "priority": self.priority, "created": self.created, "finished": self.finished}
+        if self.result is not None:
+            data.update(missing_pdf=self.result["missing_pdf"], rebuilt=self.result["rebuilt"],
+                        reused=self.result["reused"], result=f"/v1/jobs/{self.id}/result")
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class GenerationService:
+    """Pool de processos de geração com admissão por prioridade e tabela de trabalhos"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = MAX_PENDING,
+                 job_ttl: int = JOB_TTL):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        # Uma vaga por worker: um trabalho concedido nunca espera na fila do pool
+        self.scheduler = GenerationScheduler(workers, {
+            INTERACTIVE: ClassLimits(workers, max_pending),
+            BATCH: ClassLimits(max(1, workers - 1), BATCH_QUEUE),
+        }, name="service")
+        self._pool = self._new_pool()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._retention = get_retention_manager(PDFConfig.OUTPUT_PATH)
+        self.warmup: Optional[WarmupReport] = None
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: os workers não herdam as threads do servidor HTTP
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, kind: str, payload: dict, priority: str = INTERACTIVE, tenant: str = "") -> Job:
+        """
+        Aceita um pedido (PayloadError se inválido, ServiceBusy se a fila da classe
+        estiver cheia). O tenant padrão é o supervisor do estágio.
+        """
+        if kind not in BUNDLE_KINDS:
+            raise PayloadError([f"tipo desconhecido: {kind}"])
+        if priority not in PRIORITIES:
+            raise PayloadError([f"prioridade desconhecida: {priority}"])
+        document_data = parse_document_data(payload)
+        key = f"{kind}:{fingerprint(payload)}"
+        with self._lock:
+            self._prune()
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing
+            try:
+                ticket = self.scheduler.request(priority, tenant or document_data.internship.supervisor_estagio)
+            except SchedulerBusy as e:
+                raise ServiceBusy(str(e))
+            job = Job(uuid.uuid4().hex, kind, document_data.user.ra, key, time.time(), priority, ticket)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            QUEUE_DEPTH.inc(queue="service")
+        # Arquivos do RA protegidos da retenção até o fim da geração
+        guard = self._retention.in_flight(job.ra)
+        guard.__enter__()
+        job.future.add_done_callback(lambda f: self._finish(job, guard))
+        ticket.on_granted(lambda t: self._start(job, payload))
+        return job
+
+    def _start(self, job: Job, payload: dict):
+        """Envia o trabalho ao pool quando o escalonador concede a vaga"""
+        job.future.set_running_or_notify_cancel()
+        try:
+            with self._lock:
+                try:
+                    future = self._pool.submit(generate_bundle, job.kind, payload)
+                except BrokenProcessPool:
+                    # Um worker morreu (ex: falta de memória): recria o pool
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._new_pool()
+                    future = self._pool.submit(generate_bundle, job.kind, payload)
+        except Exception as e:
+            job.ticket.release()
+            job.future.set_exception(e)
+            return
+        future.add_done_callback(lambda f: self._complete(job, f))
+
+    @staticmethod
+    def _complete(job: Job, future: Future):
+        # A vaga é devolvida antes de publicar o resultado: o próximo trabalho já pode começar
+        job.ticket.release()
+        try:
+            job.future.set_result(future.result())
+        except BaseException as e:
+            job.future.set_exception(e)
+
+    def _finish(self, job: Job, guard):
+        guard.__exit__(None, None, None)
+        try:
+            job.result = job.future.result()
+            self._retention.record_write(job.result["path"])
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+        with self._lock:
+            job.finished = time.time()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            QUEUE_DEPTH.dec(queue="service")
+        job.done.set()
+
+    def _prune(self):
+        """Remove trabalhos concluídos há mais de job_ttl (chamado com o lock)"""
+        limit = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < limit]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def wait(job: Job, timeout: float = SYNC_TIMEOUT) -> bool:
+        """Espera o trabalho terminar; False se o tempo acabar antes"""
+        return job.done.wait(timeout)
+
+    def start_warm_up(self) -> WarmupReport:
+        """Inicia os workers do pool e aquece cada um em segundo plano (ver warmup.py)"""
+        self.warmup = WarmupReport()
+        threading.Thread(target=self._warm_up, args=(self.warmup,), name="service-warmup", daemon=True).start()
+        return self.warmup
+
+    def _warm_up(self, report: WarmupReport):
+        report.run("workers", self._warm_workers)
+        report.run("soffice", warm_soffice)
+        report.finish()
+        print(report.format())
+
+    def _warm_workers(self) -> str:
+        # Sem worker ocioso, cada envio inicia um novo processo: um pedido por worker
+        with self._lock:
+            futures = [self._pool.submit(warm_process) for _ in range(self.workers)]
+        results = [future.result() for future in futures]
+        failed = sorted({step["name"] for result in results for step in result["steps"] if not step["ok"]})
+        if failed:
+            raise RuntimeError(f"etapas com falha nos workers: {', '.join(failed)}")
+        return f"{len({result['pid'] for result in results})} worker(s) aquecido(s)"
+
+    def record_access(self, path: str) -> bool:
+        """Registra a entrega de um arquivo gerado na retenção (False se já foi removido)"""
+        return self._retention.record_access(path)
+
+    def health(self) -> dict:
+        warming = self.warmup is not None and not self.warmup.ready
+        with self._lock:
+            active = list(self._active.values())
+            return {
+                "status": "warming" if warming else "ok",
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queued": sum(job.status == "queued" for job in active),
+                "running": sum(job.status == "running" for job in active),
+                "jobs": len(self._jobs),
+                "scheduler": self.scheduler.stats(),
+                "warmup": self.warmup.as_dict() if self.warmup is not None else None,
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+class _RequestError(Exception):
+    def __init__(self, status: int, message: str, details: Optional[List[str]] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details or []
+        self.headers = headers or {}
+
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "EstagioGeneration/1.0"
+    # Tempo ocioso máximo de uma conexão keep-alive
+    timeout = KEEPALIVE_TIMEOUT
+    service: GenerationService = None
+    max_body = MAX_BODY_BYTES
+    token = SERVICE_TOKEN
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        started = time.perf_counter()
+        path = self.path.split("?", 1)[0].rstrip("/")
+        route = "other"
+        status = 500
+        self._body_read = False
+        try:
+            self._check_token()
+            parts = path.strip("/").split("/")
+            if method == "GET" and path == "/health":
+                route = "health"
+                status = self._send_json(200, self.service.health())
+            elif method == "POST" and len(parts) == 3 and parts[:2] == ["v1", "bundles"]:
+                route = "bundle"
+                status = self._bundle(parts[2])
+            elif method == "POST" and len(parts) == 3 and parts[:2] == ["v1", "jobs"]:
+                route = "job_submit"
+                status = self._submit(parts[2])
+            elif method == "GET" and len(parts) in (3, 4) and parts[:2] == ["v1", "jobs"] \
+                    and (len(parts) == 3 or parts[3] == "result"):
+                route = "job_result" if len(parts) == 4 else "job_status"
+                status = self._job(parts[2], result=len(parts) == 4)
+            else:
+                raise _RequestError(404, "Rota não encontrada")
+        except _RequestError as e:
+            if method == "POST" and not self._body_read:
+                self._discard_body()
+            status = self._send_json(e.status, {"error": e.message, "details": e.details}, e.headers)
+        except Exception as e:
+            print(f"Erro no serviço de geração ({self.path}): {e}")
+            status = self._send_json(500, {"error": "Erro interno", "details": [str(e)]})
+        SERVICE_REQUESTS.inc(route=route, status=str(status))
+        SERVICE_SECONDS.observe(time.perf_counter() - started, route=route)
+
+    # -- pedidos --------------------------------------------------------
+    def _check_token(self):
+        if not self.token:
+            return
+        supplied = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {self.token}".encode()):
+            raise _RequestError(401, "Token ausente ou inválido")
+
+    def _discard_body(self):
+        """Descarta o corpo não lido (ou encerra a conexão se ele for grande demais)"""
+        length = self.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) <= self.max_body:
+            self.rfile.read(int(length))
+            self._body_read = True
+        elif length or self.headers.get("Transfer-Encoding"):
+            self.close_connection = True
+
+    def _read_json(self) -> Any:
+        if self.headers.get("Transfer-Encoding"):
+            self.close_connection = True
+            raise _RequestError(411, "Envie o corpo com Content-Length")
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            raise _RequestError(411, "Content-Length obrigatório")
+        if int(length) > self.max_body:
+            self.close_connection = True
+            raise _RequestError(413, f"Corpo maior que {self.max_body} bytes")
+        body = self.rfile.read(int(length))
+        self._body_read = True
+        try:
+            return json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise _RequestError(400, f"JSON inválido: {e}")
+
+    def _accept(self, kind: str, default_priority: str) -> Job:
+        payload = self._read_json()
+        if kind not in BUNDLE_KINDS:
+            raise _RequestError(404, f"Tipo de documento desconhecido: {kind}")
+        query = parse_qs(self.path.split("?", 1)[1]) if "?" in self.path else {}
+        priority = query.get("priority", [default_priority])[0]
+        if priority not in PRIORITIES:
+            raise _RequestError(400, f"Prioridade desconhecida: {priority}", list(PRIORITIES))
+        tenant = self.headers.get("X-Tenant", "")
+        try:
+            return self.service.submit(kind, payload, priority, tenant)
+        except PayloadError as e:
+            raise _RequestError(422, "Dados inválidos", e.errors)
+        except ServiceBusy as e:
+            raise _RequestError(503, f"Serviço ocupado: {e}", headers={"Retry-After": "5"})
+
+    def _bundle(self, kind: str) -> int:
+        job = self._accept(kind, INTERACTIVE)
+        if not self.service.wait(job):
+            raise _RequestError(504, "Geração ainda em andamento", [f"/v1/jobs/{job.id}"],
+                                headers={"Location": f"/v1/jobs/{job.id}"})
+        return self._send_result(job)
+
+    def _submit(self, kind: str) -> int:
+        job = self._accept(kind, BATCH)
+        return self._send_json(202, job.as_dict(), {"Location": f"/v1/jobs/{job.id}"})
+
+    def _job(self, job_id: str, result: bool) -> int:
+        job = self.service.get(job_id)
+        if job is None:
+            raise _RequestError(404, "Trabalho não encontrado")
+        if not result:
+            return self._send_json(200, job.as_dict())
+        if job.finished is None:
+            raise _RequestError(409, "Geração ainda em andamento", headers={"Retry-After": "1"})
+        return self._send_result(job)
+
+    # -- respostas ------------------------------------------------------
+    def _send_result(self, job: Job) -> int:
+        if job.error:
+            raise _RequestError(500, "Falha na geração", [job.error])
+        self.service.record_access(job.result["path"])
+        try:
+            with open(job.result["path"], "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            raise _RequestError(410, "Arquivo removido pela retenção; envie o pedido novamente")
+        content_type, filename = BUNDLE_KINDS[job.kind]
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename.format(ra=job.ra)}"',
+            "X-Job-Id": job.id,
+            "X-Documents-Rebuilt": str(len(job.result["rebuilt"])),
+            "X-Documents-Reused": str(len(job.result["reused"])),
+        }
+        if job.kind == "mid":
+            headers["X-Missing-PDF"] = "1" if job.result["missing_pdf"] else "0"
+        return self._send(200, body, content_type, headers)
+
+    def _send_json(self, status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> int:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        return self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def _send(self, status: int, body: bytes, content_type: str,
+              headers: Optional[Dict[str, str]] = None) -> int:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GenerationHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer com limite de conexões simultâneas (as excedentes recebem 503)"""
+    daemon_threads = True
+
+    def __init__(self, address, handler, max_connections: int = MAX_CONNECTIONS):
+        super().__init__(address, handler)
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n"
+                                b"Retry-After: 1\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def create_server(service: GenerationService, host: str = "127.0.0.1", port: int = DEFAULT_SERVICE_PORT,
+                  max_connections: int = MAX_CONNECTIONS, max_body: int = MAX_BODY_BYTES,
+                  token: str = SERVICE_TOKEN) -> GenerationHTTPServer:
+    handler = type("Handler", (GenerationRequestHandler,),
+                   {"service": service, "max_body": max_body, "token": token})
+    return GenerationHTTPServer((host, port), handler, max_connections)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON de geração de documentos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument("--max-body", type=int, default=MAX_BODY_BYTES, help="Tamanho máximo do corpo (bytes)")
+    parser.add_argument("--no-metrics", action="store_true", help="Não inicia o servidor /metrics")
+    parser.add_argument("--no-warmup", action="store_true", help="Não aquece os workers na partida")
+    args = parser.parse_args(argv)
+
+    service = GenerationService(args.workers, args.max_pending)
+    try:
+        server = create_server(service, args.host, args.port, args.max_connections, args.max_body)
+    except OSError as e:
+        print(f"Erro: não foi possível escutar em {args.host}:{args.port}: {e}")
+        service.close()
+        return 1
+    if not args.no_metrics:
+        start_metrics_server()
+    get_retention_manager(PDFConfig.OUTPUT_PATH).start_background_sweep()
+    if not args.no_warmup:
+        service.start_warm_up()
+    print(f"Serviço de geração em http://{args.host}:{args.port} ({args.workers} worker(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
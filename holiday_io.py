@@ -0,0 +1,225 @@
+"""
+Importação em lote de feriados municipais e pontos facultativos.
+
+Formatos aceitos: CSV, XLSX (via openpyxl) e ICS. Planilhas usam as colunas
+    data (DD/MM/YYYY ou YYYY-MM-DD), nome
+No ICS, cada VEVENT é um feriado: DTSTART (dia inteiro), SUMMARY (nome) e,
+para eventos de vários dias, DTEND (exclusivo, como no RFC 5545).
+
+Todas as linhas são validadas de uma vez: formato da data, nome, datas
+repetidas no arquivo, conflitos com os feriados oficiais (holidays.Brazil) e
+com feriados personalizados já cadastrados. A gravação é feita em uma única
+transação, de modo que o índice de feriados é reconstruído uma única vez.
+
+Com um polo, os feriados são gravados como feriados municipais daquele polo e
+os conflitos consideram também os feriados estaduais da UF do polo e os
+feriados personalizados de todos os polos (que já valem para o polo e não são
+gravados de novo).
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config_store import get_store
+from date_utils import (
+    get_brazilian_holidays, get_custom_holidays, get_polo_holidays,
+    get_polo_subdivision, merge_polo_holidays,
+)
+from tabular_io import (
+    ImportIssue, TabularFormatError, ics_unescape, normalize_columns,
+    read_csv, read_ics_events, read_xlsx,
+)
+
+
+COLUMNS = ["data", "nome"]
+COLUMN_ALIASES = {
+    "data": ["date", "dia", "data do feriado"],
+    "nome": ["name", "feriado", "nome do feriado", "descricao", "summary", "titulo"],
+}
+
+# Eventos ICS mais longos que isso são rejeitados (provavelmente não são feriados)
+MAX_EVENT_DAYS = 31
+# date(1970, 1, 1).toordinal(): converte datetime64 em ordinais de date
+_EPOCH_ORDINAL = 719163
+
+
+@dataclass
+class HolidayConflict:
+    """Data importada que já é feriado (oficial ou personalizado)"""
+    date: date
+    name: str
+    existing: str
+    official: bool
+    general: bool = False
+
+    def __str__(self) -> str:
+        day = self.date.strftime("%d/%m/%Y")
+        if self.official:
+            return f"{day} '{self.name}': já é feriado oficial ({self.existing})"
+        if self.general:
+            return f"{day} '{self.name}': já é feriado de todos os polos ({self.existing})"
+        return f"{day} '{self.name}': substitui o feriado personalizado '{self.existing}'"
+
+
+@dataclass
+class HolidayImport:
+    """Resultado da importação: feriados válidos, problemas e conflitos"""
+    holidays: Dict[date, str] = field(default_factory=dict)
+    errors: List[ImportIssue] = field(default_factory=list)
+    warnings: List[ImportIssue] = field(default_factory=list)
+    official_conflicts: List[HolidayConflict] = field(default_factory=list)
+    general_conflicts: List[HolidayConflict] = field(default_factory=list)
+    replaced: List[HolidayConflict] = field(default_factory=list)
+    unchanged: int = 0
+
+    def to_apply(self, include_official: bool = False) -> Dict[str, str]:
+        """{data ISO: nome} a gravar; datas que já são feriados oficiais ficam de fora por padrão"""
+        official = set() if include_official else {c.date for c in self.official_conflicts}
+        return {d.isoformat(): name for d, name in sorted(self.holidays.items()) if d not in official}
+
+
+def read_holiday_ics(data: bytes) -> pd.DataFrame:
+    """Um registro por dia de cada VEVENT (eventos de vários dias são expandidos)"""
+    records = []
+    for number, event in enumerate(read_ics_events(data), start=1):
+        name = ics_unescape(event.get("SUMMARY", "")).strip()
+        start = re.match(r"^(\d{4})(\d{2})(\d{2})", event.get("DTSTART", ""))
+        end = re.match(r"^(\d{4})(\d{2})(\d{2})", event.get("DTEND", ""))
+        if not start:
+            records.append({"data": event.get("DTSTART", ""), "nome": name, "linha": number})
+            continue
+        first = date(*map(int, start.groups()))
+        # DTEND é exclusivo; sem DTEND (ou igual ao início) o evento ocupa um dia
+        last = date(*map(int, end.groups())) - timedelta(days=1) if end else first
+        days = max(1, (last - first).days + 1)
+        if days > MAX_EVENT_DAYS:
+            records.append({"data": "", "nome": name, "linha": number,
+                            "erro": f"Evento de {days} dias (máximo {MAX_EVENT_DAYS})"})
+            continue
+        for offset in range(days):
+            records.append({"data": (first + timedelta(days=offset)).isoformat(), "nome": name, "linha": number})
+    return pd.DataFrame(records, columns=[*COLUMNS, "linha", "erro"])
+
+
+def read_holiday_table(data: bytes, filename: str) -> pd.DataFrame:
+    """Lê CSV, XLSX ou ICS (pela extensão) com as colunas data, nome e linha"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in (".ics", ".ical"):
+        return read_holiday_ics(data)
+    if extension == ".csv":
+        df = read_csv(data)
+    elif extension in (".xlsx", ".xlsm"):
+        df = read_xlsx(data)
+    else:
+        raise TabularFormatError(f"Formato não suportado: {extension or filename}")
+    df = normalize_columns(df, COLUMN_ALIASES)
+    # Número da linha na planilha (cabeçalho = linha 1)
+    return df.assign(linha=np.arange(len(df)) + 2)
+
+
+def validate_holiday_table(df: pd.DataFrame,
+                           existing: Optional[Dict[date, str]] = None,
+                           subdiv: str = "",
+                           general: Optional[Dict[date, str]] = None) -> HolidayImport:
+    """Valida todas as linhas de uma vez e classifica os conflitos (oficiais da subdivisão)
+
+    general: feriados personalizados de todos os polos, numa importação para um
+    polo; essas datas são relatadas como já cadastradas e não são gravadas.
+    """
+    result = HolidayImport()
+    missing = [col for col in COLUMNS if col not in df.columns]
+    if missing:
+        result.errors.append(ImportIssue(1, f"Colunas obrigatórias ausentes: {', '.join(missing)}"))
+        return result
+    if df.empty:
+        return result
+
+    df = df.reset_index(drop=True)
+    text = df.reindex(columns=[*COLUMNS, "erro"], fill_value="").fillna("").astype(str)
+    text = text.apply(lambda col: col.str.strip())
+    rows = df["linha"].to_numpy()
+
+    dates = pd.to_datetime(text["data"], format="%d/%m/%Y", errors="coerce")
+    dates = dates.fillna(pd.to_datetime(text["data"], format="%Y-%m-%d", errors="coerce"))
+    event_error = (text["erro"] != "").to_numpy()
+    bad_date = dates.isna().to_numpy() & ~event_error
+    bad_name = (text["nome"] == "").to_numpy() & ~bad_date & ~event_error
+    valid = ~(event_error | bad_date | bad_name)
+
+    ordinals = np.where(valid, dates.to_numpy().astype("datetime64[D]").astype(np.int64) + _EPOCH_ORDINAL, 0)
+    duplicate = valid & pd.Series(ordinals).where(valid).duplicated(keep="first").to_numpy()
+
+    for i in np.flatnonzero(~valid):
+        if event_error[i]:
+            result.errors.append(ImportIssue(int(rows[i]), text.at[i, "erro"]))
+        elif bad_date[i]:
+            result.errors.append(ImportIssue(int(rows[i]), f"Data inválida '{text.at[i, 'data']}' (use DD/MM/YYYY)"))
+        else:
+            result.errors.append(ImportIssue(int(rows[i]), "Nome do feriado não informado"))
+    for i in np.flatnonzero(duplicate):
+        day = date.fromordinal(int(ordinals[i]))
+        result.warnings.append(ImportIssue(
+            int(rows[i]), f"{day.strftime('%d/%m/%Y')} repetida no arquivo (mantida a primeira ocorrência)"))
+
+    accepted = np.flatnonzero(valid & ~duplicate)
+    if accepted.size == 0:
+        return result
+
+    # Feriados oficiais dos anos presentes no arquivo (uma consulta por ano)
+    accepted_ordinals = ordinals[accepted]
+    first_year = date.fromordinal(int(accepted_ordinals.min())).year
+    last_year = date.fromordinal(int(accepted_ordinals.max())).year
+    official: Dict[date, str] = {}
+    for year in range(first_year, last_year + 1):
+        official.update(get_brazilian_holidays(year, subdiv).items())
+    official_ordinals = np.array(sorted(d.toordinal() for d in official), dtype=np.int64)
+    is_official = np.isin(accepted_ordinals, official_ordinals)
+
+    existing = get_custom_holidays() if existing is None else existing
+    general = general or {}
+    names = text["nome"].to_numpy(dtype=object)
+    for i, ordinal, official_hit in zip(accepted, accepted_ordinals, is_official):
+        day = date.fromordinal(int(ordinal))
+        name = names[i]
+        if day in general:
+            result.general_conflicts.append(HolidayConflict(day, name, general[day], official=False, general=True))
+            continue
+        if official_hit:
+            result.official_conflicts.append(HolidayConflict(day, name, official[day], official=True))
+        current = existing.get(day)
+        if current == name:
+            result.unchanged += 1
+            continue
+        if current is not None:
+            result.replaced.append(HolidayConflict(day, name, current, official=False))
+        result.holidays[day] = name
+    return result
+
+
+def import_holidays(data: bytes, filename: str, polo: Optional[str] = None) -> HolidayImport:
+    """Lê e valida um arquivo de feriados (CSV, XLSX ou ICS), gerais ou municipais do polo"""
+    try:
+        df = read_holiday_table(data, filename)
+    except TabularFormatError as e:
+        return HolidayImport(errors=[ImportIssue(0, str(e))])
+    if polo:
+        return validate_holiday_table(df, get_polo_holidays(polo), get_polo_subdivision(polo),
+                                      get_custom_holidays())
+    return validate_holiday_table(df)
+
+
+def apply_holiday_import(result: HolidayImport, include_official: bool = False,
+                         polo: Optional[str] = None) -> int:
+    """Grava os feriados importados em uma transação e retorna quantos foram gravados"""
+    holidays_dict = result.to_apply(include_official)
+    if holidays_dict:
+        if polo:
+            merge_polo_holidays(polo, holidays_dict)
+        else:
+            get_store().merge_custom_holidays(holidays_dict)
+    return len(holidays_dict)
@@ -0,0 +1,219 @@
+"""
+Tabela pré-calculada de feriados oficiais (nacionais e por subdivisão).
+
+Montar um calendário holidays.Brazil é caro. Esta tabela guarda os feriados de
+um intervalo de anos, para todas as subdivisões, em arrays numpy compactos
+lidos com mmap na inicialização:
+    holiday_data/
+        index.json    subdivisões, intervalo de anos e tabela de nomes
+        ordinals.npy  int32: datas (date.toordinal()) ordenadas, por subdivisão
+        names.npy     uint16: índice do nome de cada data na tabela de nomes
+        offsets.npy   int64: início de cada subdivisão em ordinals/names
+
+As consultas são buscas binárias no trecho da subdivisão; o pacote holidays
+só é necessário para gerar a tabela e para anos fora do intervalo.
+
+Gerar/atualizar a tabela:
+    python holiday_table.py build --first-year 2020 --last-year 2040
+    python holiday_table.py info
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config_store import BASE_DIR
+
+
+TABLE_DIR = os.environ.get("ESTAGIO_HOLIDAY_TABLE", os.path.join(BASE_DIR, "holiday_data"))
+DEFAULT_FIRST_YEAR = 2020
+DEFAULT_LAST_YEAR = 2040
+TABLE_FORMAT = 1
+
+# Subdivisão "" = apenas feriados nacionais
+NATIONAL = ""
+
+
+class HolidayTable:
+    """Feriados oficiais pré-calculados: um trecho ordenado de ordinais por subdivisão"""
+
+    def __init__(self, subdivisions: Sequence[str], first_year: int, last_year: int,
+                 names: Sequence[str], ordinals: np.ndarray, name_ids: np.ndarray,
+                 offsets: np.ndarray, source_version: str = ""):
+        self.subdivisions: Tuple[str, ...] = tuple(subdivisions)
+        self.first_year = first_year
+        self.last_year = last_year
+        self.names: Tuple[str, ...] = tuple(names)
+        self.ordinals = ordinals
+        self.name_ids = name_ids
+        self.offsets = offsets
+        self.source_version = source_version
+        self._positions = {subdiv: i for i, subdiv in enumerate(self.subdivisions)}
+
+    def __len__(self) -> int:
+        return int(self.ordinals.shape[0])
+
+    def covers(self, subdiv: str, year: int) -> bool:
+        return subdiv in self._positions and self.first_year <= year <= self.last_year
+
+    def _segment(self, subdiv: str, start_ordinal: int, end_ordinal: int) -> Tuple[int, int]:
+        """Posições [lo, hi) das datas da subdivisão entre os dois ordinais (inclusivo)"""
+        position = self._positions[subdiv]
+        begin, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        segment = self.ordinals[begin:end]
+        lo = int(np.searchsorted(segment, start_ordinal, side="left"))
+        hi = int(np.searchsorted(segment, end_ordinal, side="right"))
+        return begin + lo, begin + hi
+
+    def ordinals_between(self, subdiv: str, start_date: date, end_date: date) -> np.ndarray:
+        lo, hi = self._segment(subdiv, start_date.toordinal(), end_date.toordinal())
+        return self.ordinals[lo:hi]
+
+    def holidays(self, subdiv: str, year: int) -> Dict[date, str]:
+        """{data: nome} dos feriados da subdivisão no ano"""
+        lo, hi = self._segment(subdiv, date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal())
+        return {
+            date.fromordinal(int(ordinal)): self.names[int(name_id)]
+            for ordinal, name_id in zip(self.ordinals[lo:hi], self.name_ids[lo:hi])
+        }
+
+    def is_holiday(self, subdiv: str, date_obj: date) -> bool:
+        lo, hi = self._segment(subdiv, date_obj.toordinal(), date_obj.toordinal())
+        return hi > lo
+
+    # ------------------------------------------------------------------
+    # Arquivo
+    # ------------------------------------------------------------------
+    def save(self, path: str = TABLE_DIR):
+        os.makedirs(path, exist_ok=True)
+        for filename, array in (("ordinals.npy", self.ordinals), ("names.npy", self.name_ids),
+                                ("offsets.npy", self.offsets)):
+            np.save(os.path.join(path, filename), array)
+        # index.json por último: só é gravado quando os arrays já estão completos
+        with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": TABLE_FORMAT,
+                "first_year": self.first_year,
+                "last_year": self.last_year,
+                "subdivisions": list(self.subdivisions),
+                "names": list(self.names),
+                "holidays_version": self.source_version,
+            }, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str = TABLE_DIR) -> "HolidayTable":
+        """Carrega a tabela com os arrays mapeados em memória (mmap)"""
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format") != TABLE_FORMAT:
+            raise ValueError(f"Formato de tabela de feriados não suportado: {index.get('format')}")
+        arrays = [np.load(os.path.join(path, filename), mmap_mode="r")
+                  for filename in ("ordinals.npy", "names.npy", "offsets.npy")]
+        table = cls(index["subdivisions"], index["first_year"], index["last_year"],
+                    index["names"], *arrays, source_version=index.get("holidays_version", ""))
+        if table.offsets.shape[0] != len(table.subdivisions) + 1 or table.offsets[-1] != len(table):
+            raise ValueError("Tabela de feriados inconsistente")
+        return table
+
+
+def build_table(first_year: int = DEFAULT_FIRST_YEAR, last_year: int = DEFAULT_LAST_YEAR,
+                subdivisions: Optional[Iterable[str]] = None) -> HolidayTable:
+    """Calcula a tabela a partir do pacote holidays (todas as subdivisões por padrão)"""
+    import holidays
+
+    if first_year > last_year:
+        raise ValueError("Ano inicial deve ser anterior ao ano final")
+    if subdivisions is None:
+        subdivisions = holidays.Brazil.subdivisions
+    subdivisions = [NATIONAL, *(s for s in subdivisions if s != NATIONAL)]
+
+    names: List[str] = []
+    name_positions: Dict[str, int] = {}
+    ordinals: List[int] = []
+    name_ids: List[int] = []
+    offsets = [0]
+    years = list(range(first_year, last_year + 1))
+    for subdiv in subdivisions:
+        calendar = holidays.Brazil(years=years, subdiv=subdiv or None)
+        for holiday_date, name in sorted(calendar.items()):
+            if name not in name_positions:
+                name_positions[name] = len(names)
+                names.append(name)
+            ordinals.append(holiday_date.toordinal())
+            name_ids.append(name_positions[name])
+        offsets.append(len(ordinals))
+
+    return HolidayTable(
+        subdivisions, first_year, last_year, names,
+        np.array(ordinals, dtype=np.int32),
+        np.array(name_ids, dtype=np.uint16),
+        np.array(offsets, dtype=np.int64),
+        source_version=getattr(holidays, "__version__", ""),
+    )
+
+
+_table: Optional[HolidayTable] = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def get_holiday_table() -> Optional[HolidayTable]:
+    """Tabela compartilhada pelo processo (None se não houver tabela gerada)"""
+    global _table, _table_loaded
+    if _table_loaded:
+        return _table
+    with _table_lock:
+        if not _table_loaded:
+            try:
+                _table = HolidayTable.load(TABLE_DIR)
+            except FileNotFoundError:
+                _table = None
+            except (ValueError, KeyError, OSError) as e:
+                print(f"Tabela de feriados ignorada ({TABLE_DIR}): {e}")
+                _table = None
+            _table_loaded = True
+    return _table
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tabela pré-calculada de feriados oficiais")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Gera a tabela (requer o pacote holidays)")
+    build.add_argument("--first-year", type=int, default=DEFAULT_FIRST_YEAR)
+    build.add_argument("--last-year", type=int, default=DEFAULT_LAST_YEAR)
+    build.add_argument("--subdiv", action="append", help="Subdivisão a incluir (padrão: todas)")
+    build.add_argument("--output", default=TABLE_DIR)
+    info = subparsers.add_parser("info", help="Mostra o conteúdo da tabela")
+    info.add_argument("--path", default=TABLE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        try:
+            table = build_table(args.first_year, args.last_year, args.subdiv)
+        except (ValueError, NotImplementedError) as e:
+            print(f"Erro: {e}")
+            return 1
+        table.save(args.output)
+        print(f"{len(table)} feriados de {len(table.subdivisions)} calendários "
+              f"({table.first_year}-{table.last_year}) gravados em {args.output}")
+        return 0
+
+    try:
+        table = HolidayTable.load(args.path)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+    print(f"Anos: {table.first_year}-{table.last_year}")
+    print(f"Calendários: {len(table.subdivisions)} ({', '.join(s or 'nacional' for s in table.subdivisions)})")
+    print(f"Feriados: {len(table)} | Nomes distintos: {len(table.names)}")
+    print(f"Gerada com holidays {table.source_version or '?'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
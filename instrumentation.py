@@ -0,0 +1,184 @@
+"""
+Instrumentação leve do pipeline de geração de documentos.
+
+Spans (context managers) medem cada etapa — abertura de template, preenchimento,
+gravação, mesclagem, preenchimento de DOCX, conversão soffice e assinatura — e
+emitem eventos estruturados em JSON Lines com duração, tamanho em bytes e
+indicadores de cache. Os campos seguem os nomes do modelo de span do
+OpenTelemetry (trace_id, span_id, parent_span_id, start_time_unix_nano).
+
+A instrumentação fica desativada por padrão e, nesse caso, span() devolve um
+objeto nulo compartilhado, sem medir nada. Para ativar:
+    ESTAGIO_TRACE_FILE=./trace.jsonl streamlit run app.py
+ou, no código, configure_tracing("./trace.jsonl").
+
+Resumo de um arquivo de trace:
+    python instrumentation.py trace.jsonl
+"""
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Protocol
+
+
+class SpanExporter(Protocol):
+    def export(self, event: dict) -> None: ...
+
+
+class JsonLinesExporter:
+    """Grava um evento JSON por linha em um arquivo (append)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+_exporter: Optional[SpanExporter] = None
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Span nulo devolvido quando a instrumentação está desativada"""
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def record_file(self, path: str, key: str = "bytes") -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Etapa medida do pipeline"""
+    __slots__ = ("name", "attrs", "trace_id", "span_id", "parent_id",
+                 "_start_wall", "_start", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, object]):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = secrets.token_hex(8)
+        parent = _current_span.get()
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            # Herda o RA do span pai para facilitar a análise por estudante
+            if "ra" in parent.attrs and "ra" not in attrs:
+                attrs["ra"] = parent.attrs["ra"]
+        else:
+            self.trace_id = secrets.token_hex(16)
+            self.parent_id = None
+
+    def set(self, **attrs) -> None:
+        """Adiciona atributos ao span (ex: cache_hit=True)"""
+        self.attrs.update(attrs)
+
+    def record_file(self, path: str, key: str = "bytes") -> None:
+        """Registra o tamanho em bytes de um arquivo gerado"""
+        try:
+            self.attrs[key] = os.path.getsize(path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self._start_wall = time.time_ns()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter_ns() - self._start
+        _current_span.reset(self._token)
+        event = {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self._start_wall,
+            "duration_ms": duration / 1e6,
+            "status": "error" if exc_type else "ok",
+            "attributes": self.attrs,
+        }
+        if exc_type is not None:
+            event["error"] = f"{exc_type.__name__}: {exc}"
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(event)
+
+
+def span(name: str, **attrs):
+    """Abre um span; sem custo de medição quando a instrumentação está desativada"""
+    if _exporter is None:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def configure_tracing(path: Optional[str] = None, exporter: Optional[SpanExporter] = None):
+    """Ativa a instrumentação com um exportador JSON Lines (path) ou personalizado"""
+    global _exporter
+    if exporter is None and path is not None:
+        exporter = JsonLinesExporter(path)
+    _exporter = exporter
+
+
+def disable_tracing():
+    global _exporter
+    _exporter = None
+
+
+if os.environ.get("ESTAGIO_TRACE_FILE"):
+    configure_tracing(os.environ["ESTAGIO_TRACE_FILE"])
+
+
+def summarize(path: str):
+    """Imprime o tempo total/médio por etapa e o tempo total por estudante"""
+    by_name: Dict[str, list] = {}
+    by_ra: Dict[str, float] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            event = json.loads(line)
+            stats = by_name.setdefault(event["name"], [0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += event["duration_ms"]
+            stats[2] += 1 if event["attributes"].get("cache_hit") else 0
+            if event["parent_span_id"] is None and "ra" in event["attributes"]:
+                ra = str(event["attributes"]["ra"])
+                by_ra[ra] = by_ra.get(ra, 0.0) + event["duration_ms"]
+
+    print(f"{'etapa':<28}{'n':>7}{'total (ms)':>13}{'média (ms)':>13}{'cache hits':>12}")
+    for name, (count, total, hits) in sorted(by_name.items(), key=lambda kv: -kv[1][1]):
+        print(f"{name:<28}{count:>7}{total:>13.1f}{total / count:>13.2f}{hits:>12}")
+
+    if by_ra:
+        print(f"\n{'RA':<20}{'total (ms)':>13}")
+        for ra, total in sorted(by_ra.items(), key=lambda kv: -kv[1]):
+            print(f"{ra:<20}{total:>13.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python instrumentation.py <trace.jsonl>")
+        sys.exit(1)
+    summarize(sys.argv[1])
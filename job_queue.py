@@ -0,0 +1,613 @@
+"""
+Fila de geração em disco para workers em vários processos ou hosts.
+
+No fim do semestre um único host não dá conta dos pedidos. Neste modo, os
+pedidos de geração são gravados em uma fila durável (SQLite) em um diretório
+compartilhado e qualquer número de workers, no mesmo host ou em hosts que
+montam o mesmo sistema de arquivos, retiram trabalhos dela:
+
+    python job_queue.py worker --processes 4          # em cada host (aquece os caches antes)
+    python job_queue.py submit aluno.json --kind final --priority batch
+    python job_queue.py status
+
+    queue = JobQueue()
+    job = queue.submit("final", payload, priority=BATCH, tenant=supervisor)
+    job = queue.wait(job.id)          # job.result["path"]: arquivo no repositório de resultados
+
+Garantias:
+    - retirada atômica: claim() seleciona e marca o trabalho em uma única
+      transação BEGIN IMMEDIATE, de modo que dois workers nunca pegam o mesmo;
+    - ordem: interativo antes de lote e, dentro da classe, o tenant (supervisor)
+      com menos trabalhos em execução, como em scheduler.py;
+    - heartbeat: o worker renova o heartbeat do trabalho a cada
+      HEARTBEAT_INTERVAL; trabalhos sem heartbeat há LEASE_TIMEOUT (worker
+      morto, host desligado) voltam para a fila, até MAX_ATTEMPTS tentativas;
+    - só o dono atual conclui: um worker que perdeu o trabalho para outro não
+      sobrescreve o resultado;
+    - resultados: o PDF mesclado ou o ZIP é copiado (temporário + os.replace)
+      para <fila>/results/<id>/, legível por qualquer host.
+
+O modo WAL (padrão) exige que todos os processos estejam no mesmo host. Com
+workers em hosts diferentes sobre NFS/SMB, use ESTAGIO_QUEUE_JOURNAL=DELETE
+(o SQLite passa a usar as travas do sistema de arquivos) e mantenha os relógios
+sincronizados: LEASE_TIMEOUT deve ser bem maior que a diferença entre eles.
+
+Para medir a escalabilidade com a coorte sintética do benchmark.py (o tempo
+conta a partir do momento em que todos os workers estão aquecidos):
+    python job_queue.py harness --students 40 --processes 1 2 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Sequence
+
+from config_store import BASE_DIR
+from build_graph import fingerprint
+from docs_filler import PDFConfig
+from generation_service import BUNDLE_KINDS, PayloadError, generate_bundle, parse_document_data
+from metrics import REGISTRY
+from scheduler import BATCH, INTERACTIVE
+from warmup import IN_PROCESS_STEPS, warm_up
+import mid_internship_fillers
+
+
+QUEUE_DIR = os.environ.get("ESTAGIO_QUEUE_DIR", os.path.join(BASE_DIR, "queue"))
+JOURNAL_MODE = os.environ.get("ESTAGIO_QUEUE_JOURNAL", "WAL").upper()
+# Intervalo de renovação do heartbeat e tempo sem heartbeat até a retomada (segundos)
+HEARTBEAT_INTERVAL = float(os.environ.get("ESTAGIO_QUEUE_HEARTBEAT", 10))
+LEASE_TIMEOUT = float(os.environ.get("ESTAGIO_QUEUE_LEASE", 60))
+MAX_ATTEMPTS = int(os.environ.get("ESTAGIO_QUEUE_MAX_ATTEMPTS", 3))
+# Espera de um worker ocioso entre consultas à fila (segundos)
+POLL_INTERVAL = float(os.environ.get("ESTAGIO_QUEUE_POLL", 1.0))
+# Atraso antes de uma nova tentativa, multiplicado pelo número de tentativas
+RETRY_BACKOFF = 5.0
+# Espera máxima pela prontidão (aquecimento) dos workers do harness (segundos)
+READY_TIMEOUT = 300.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Classes de scheduler.py na ordem de atendimento
+PRIORITY_ORDER = {INTERACTIVE: 0, BATCH: 1}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    ra TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    tenant TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    created REAL NOT NULL,
+    worker TEXT,
+    claimed REAL,
+    heartbeat REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority, tenant, created);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key
+    ON jobs (job_key) WHERE status IN ('queued', 'running');
+"""
+
+QUEUE_JOBS = REGISTRY.counter(
+    "estagio_queue_jobs_total",
+    "Trabalhos da fila compartilhada por desfecho", ["outcome"])
+
+
+@dataclass
+class QueuedJob:
+    """Trabalho da fila (sem o corpo do pedido)"""
+    id: str
+    kind: str
+    ra: str
+    priority: str
+    tenant: str
+    status: str
+    attempts: int
+    created: float
+    worker: Optional[str] = None
+    heartbeat: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "QueuedJob":
+        priorities = {order: name for name, order in PRIORITY_ORDER.items()}
+        return cls(row["id"], row["kind"], row["ra"], priorities[row["priority"]], row["tenant"],
+                   row["status"], row["attempts"], row["created"], row["worker"], row["heartbeat"],
+                   row["finished"], json.loads(row["result"]) if row["result"] else None, row["error"])
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class JobQueue:
+    """Fila SQLite compartilhada (uma conexão por thread)"""
+
+    def __init__(self, queue_dir: str = QUEUE_DIR, journal_mode: str = JOURNAL_MODE,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, "jobs.db")
+        self.results_dir = os.path.join(queue_dir, "results")
+        self.journal_mode = journal_mode
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Conexão
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, operation):
+        """Executa operation(conn) em uma transação de escrita (BEGIN IMMEDIATE)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    # ------------------------------------------------------------------
+    # Produtores
+    # ------------------------------------------------------------------
+    def submit(self, kind: str, payload: dict, priority: str = BATCH, tenant: str = "") -> QueuedJob:
+        """
+        Enfileira um pedido (PayloadError se inválido). Um pedido idêntico ainda
+        na fila ou em execução é reaproveitado. O tenant padrão é o supervisor.
+        """
+        if kind not in BUNDLE_KINDS:
+            raise PayloadError([f"tipo desconhecido: {kind}"])
+        if priority not in PRIORITY_ORDER:
+            raise PayloadError([f"prioridade desconhecida: {priority}"])
+        document_data = parse_document_data(payload)
+        key = f"{kind}:{fingerprint(payload)}"
+        now = time.time()
+
+        def _submit(conn: sqlite3.Connection) -> str:
+            row = conn.execute("SELECT id FROM jobs WHERE job_key = ? AND status IN (?, ?)",
+                               (key, QUEUED, RUNNING)).fetchone()
+            if row is not None:
+                return row["id"]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, ra, job_key, priority, tenant, payload, status, "
+                "available_at, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, document_data.user.ra, key, PRIORITY_ORDER[priority],
+                 tenant or document_data.internship.supervisor_estagio,
+                 json.dumps(payload, ensure_ascii=False), QUEUED, now, now))
+            QUEUE_JOBS.inc(outcome="submitted")
+            return job_id
+
+        return self.get(self._write(_submit))
+
+    def get(self, job_id: str) -> Optional[QueuedJob]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return QueuedJob.from_row(row) if row else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None,
+             poll_interval: float = POLL_INTERVAL) -> QueuedJob:
+        """Espera o trabalho terminar (TimeoutError se o tempo acabar)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job.status in (DONE, FAILED):
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Trabalho {job_id} não terminou em {timeout}s")
+            time.sleep(poll_interval)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def claim(self, worker: str) -> Optional[tuple]:
+        """Retira o próximo trabalho para o worker: (QueuedJob, payload) ou None"""
+        now = time.time()
+
+        def _claim(conn: sqlite3.Connection) -> Optional[str]:
+            ready = conn.execute(
+                "SELECT priority, tenant, MIN(created) AS oldest FROM jobs "
+                "WHERE status = ? AND available_at <= ? GROUP BY priority, tenant",
+                (QUEUED, now)).fetchall()
+            if not ready:
+                return None
+            running = dict(conn.execute(
+                "SELECT tenant, COUNT(*) FROM jobs WHERE status = ? GROUP BY tenant", (RUNNING,)).fetchall())
+            # Maior prioridade; na classe, o tenant com menos execuções e, então, o mais antigo
+            best = min(ready, key=lambda r: (r["priority"], running.get(r["tenant"], 0), r["oldest"]))
+            job_id = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND priority = ? AND tenant = ? AND available_at <= ? "
+                "ORDER BY created LIMIT 1", (QUEUED, best["priority"], best["tenant"], now)).fetchone()["id"]
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, claimed = ?, heartbeat = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (RUNNING, worker, now, now, job_id))
+            return job_id
+
+        job_id = self._write(_claim)
+        if job_id is None:
+            return None
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return QueuedJob.from_row(row), json.loads(row["payload"])
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Renova o heartbeat; False se o trabalho não pertence mais ao worker"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = ?",
+            (time.time(), job_id, worker, RUNNING))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: dict) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, finished = ?, result = ?, error = NULL "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            (DONE, time.time(), json.dumps(result, ensure_ascii=False), job_id, worker, RUNNING))
+        if cursor.rowcount == 1:
+            QUEUE_JOBS.inc(outcome="done")
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        """Registra a falha; com retry, o trabalho volta para a fila até max_attempts tentativas"""
+        now = time.time()
+
+        def _fail(conn: sqlite3.Connection) -> bool:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND status = ?",
+                               (job_id, worker, RUNNING)).fetchone()
+            if row is None:
+                return False
+            self._requeue_or_fail(conn, job_id, row["attempts"], error, retry, now)
+            return True
+
+        return self._write(_fail)
+
+    def _requeue_or_fail(self, conn: sqlite3.Connection, job_id: str, attempts: int, error: str,
+                         retry: bool, now: float):
+        if retry and attempts < self.max_attempts:
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, available_at = ?, error = ? WHERE id = ?",
+                (QUEUED, now + RETRY_BACKOFF * attempts, error, job_id))
+            QUEUE_JOBS.inc(outcome="retried")
+        else:
+            conn.execute("UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ?",
+                         (FAILED, now, error, job_id))
+            QUEUE_JOBS.inc(outcome="failed")
+
+    def reclaim_stalled(self, lease_timeout: float = LEASE_TIMEOUT) -> int:
+        """Devolve à fila os trabalhos cujo worker parou de enviar heartbeat"""
+        now = time.time()
+
+        def _reclaim(conn: sqlite3.Connection) -> int:
+            stalled = conn.execute("SELECT id, attempts, worker FROM jobs WHERE status = ? AND heartbeat < ?",
+                                   (RUNNING, now - lease_timeout)).fetchall()
+            for row in stalled:
+                self._requeue_or_fail(conn, row["id"], row["attempts"],
+                                      f"worker {row['worker']} sem heartbeat", True, now)
+            return len(stalled)
+
+        # Leitura barata antes de abrir uma transação de escrita
+        if not self._connect().execute("SELECT 1 FROM jobs WHERE status = ? AND heartbeat < ? LIMIT 1",
+                                       (RUNNING, now - lease_timeout)).fetchone():
+            return 0
+        reclaimed = self._write(_reclaim)
+        if reclaimed:
+            QUEUE_JOBS.inc(reclaimed, outcome="reclaimed")
+        return reclaimed
+
+    # ------------------------------------------------------------------
+    # Resultados e manutenção
+    # ------------------------------------------------------------------
+    def store_result(self, job: QueuedJob, source_path: str) -> str:
+        """Copia o arquivo gerado para <fila>/results/<id>/ (visível quando completo)"""
+        directory = os.path.join(self.results_dir, job.id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, BUNDLE_KINDS[job.kind][1].format(ra=job.ra))
+        fd, tmp_path = tempfile.mkstemp(prefix=".result.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f, open(source_path, "rb") as source:
+                shutil.copyfileobj(source, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def pending(self) -> int:
+        """Trabalhos na fila ou em execução"""
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)",
+                                       (QUEUED, RUNNING)).fetchone()[0]
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        return {
+            "status": dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()),
+            "workers": dict(conn.execute("SELECT worker, COUNT(*) FROM jobs WHERE status = ? GROUP BY worker",
+                                         (RUNNING,)).fetchall()),
+            "tenants_queued": dict(conn.execute("SELECT tenant, COUNT(*) FROM jobs WHERE status = ? GROUP BY tenant",
+                                                (QUEUED,)).fetchall()),
+        }
+
+    def purge(self, older_than: float) -> int:
+        """Remove trabalhos concluídos há mais de older_than segundos e os seus resultados"""
+        limit = time.time() - older_than
+
+        def _purge(conn: sqlite3.Connection) -> List[str]:
+            ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, limit))]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+            return ids
+
+        ids = self._write(_purge)
+        for job_id in ids:
+            shutil.rmtree(os.path.join(self.results_dir, job_id), ignore_errors=True)
+        return len(ids)
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+class QueueWorker:
+    """Retira trabalhos da fila e gera os documentos, um por vez (PyMuPDF não é thread-safe)"""
+
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL, poll_interval: float = POLL_INTERVAL,
+                 lease_timeout: float = LEASE_TIMEOUT):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.stop_event = threading.Event()
+
+    def run(self, max_jobs: Optional[int] = None, exit_when_idle: bool = False) -> int:
+        """Processa trabalhos até stop_event, max_jobs ou, com exit_when_idle, a fila esvaziar"""
+        processed = 0
+        while not self.stop_event.is_set() and (max_jobs is None or processed < max_jobs):
+            self.queue.reclaim_stalled(self.lease_timeout)
+            claimed = self.queue.claim(self.worker_id)
+            if claimed is None:
+                if exit_when_idle and self.queue.pending() == 0:
+                    break
+                self.stop_event.wait(self.poll_interval)
+                continue
+            self.process(*claimed)
+            processed += 1
+        return processed
+
+    def _keep_alive(self, job: QueuedJob, done: threading.Event):
+        while not done.wait(self.heartbeat_interval):
+            if not self.queue.heartbeat(job.id, self.worker_id):
+                print(f"Trabalho {job.id} retomado por outro worker; o resultado deste será descartado")
+                return
+
+    def process(self, job: QueuedJob, payload: dict):
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._keep_alive, args=(job, done), daemon=True)
+        heartbeat.start()
+        started = time.perf_counter()
+        try:
+            result = generate_bundle(job.kind, payload)
+            result["path"] = self.queue.store_result(job, result["path"])
+            result["worker"] = self.worker_id
+            result["seconds"] = round(time.perf_counter() - started, 3)
+        except PayloadError as e:
+            self.queue.fail(job.id, self.worker_id, str(e), retry=False)
+            return
+        except KeyboardInterrupt:
+            self.queue.fail(job.id, self.worker_id, "worker interrompido")
+            raise
+        except Exception as e:
+            print(f"Falha no trabalho {job.id} ({job.kind}, RA {job.ra}): {e}")
+            self.queue.fail(job.id, self.worker_id, str(e) or e.__class__.__name__)
+            return
+        finally:
+            done.set()
+            heartbeat.join()
+        if not self.queue.complete(job.id, self.worker_id, result):
+            print(f"Trabalho {job.id} concluído após perder o heartbeat; resultado ignorado")
+
+
+def run_worker(queue_dir: str = QUEUE_DIR, output_dir: Optional[str] = None,
+               max_jobs: Optional[int] = None, exit_when_idle: bool = False, warm: bool = True,
+               ready=None) -> int:
+    """
+    Ponto de entrada de um processo worker; retorna o número de trabalhos processados.
+    Com ready (multiprocessing.Barrier), espera os demais workers e o harness
+    depois do aquecimento, antes de retirar o primeiro trabalho.
+    """
+    if output_dir:
+        # Diretório de trabalho local do worker (manifestos e arquivos intermediários)
+        PDFConfig.OUTPUT_PATH = output_dir
+        mid_internship_fillers.OUTPUT_DIR = output_dir
+    if warm:
+        # Caches do processo prontos antes do primeiro trabalho retirado da fila
+        report = warm_up(IN_PROCESS_STEPS)
+        print(f"Worker {os.getpid()} pronto em {report.as_dict()['seconds']:.2f}s"
+              + ("" if report.ok else f"\n{report.format()}"))
+    if ready is not None:
+        try:
+            ready.wait(READY_TIMEOUT)
+        except threading.BrokenBarrierError:
+            print(f"Worker {os.getpid()}: espera pelos demais workers interrompida; seguindo")
+    worker = QueueWorker(JobQueue(queue_dir))
+    try:
+        return worker.run(max_jobs, exit_when_idle)
+    except KeyboardInterrupt:
+        return 0
+
+
+def start_workers(processes: int, queue_dir: str = QUEUE_DIR, output_dir: Optional[str] = None,
+                  max_jobs: Optional[int] = None, exit_when_idle: bool = False, warm: bool = True,
+                  ready=None) -> List[multiprocessing.Process]:
+    """Inicia processos worker independentes (spawn: não herdam threads nem conexões)"""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker,
+                               args=(queue_dir, output_dir, max_jobs, exit_when_idle, warm, ready),
+                               name=f"queue-worker-{i}")
+               for i in range(processes)]
+    for process in workers:
+        process.start()
+    return workers
+
+
+# ----------------------------------------------------------------------
+# Teste de escalabilidade local
+# ----------------------------------------------------------------------
+def run_harness(students: int, process_counts: Sequence[int], kind: str = "final") -> List[dict]:
+    """
+    Para cada número de processos, enfileira a coorte sintética em uma fila nova
+    e mede quanto tempo os workers levam para esvaziá-la. A partida dos processos
+    e o aquecimento ficam fora da medida (startup_seconds): o relógio começa
+    quando todos os workers passam pela barreira de prontidão.
+    """
+    from benchmark import BenchmarkEnvironment, make_cohort
+    from service_client import document_to_payload
+
+    payloads = [document_to_payload(document_data) for document_data in make_cohort(students)]
+    rows = []
+    for processes in process_counts:
+        with BenchmarkEnvironment() as env:
+            queue = JobQueue(os.path.join(env.root, "queue"))
+            job_ids = [queue.submit(kind, payload).id for payload in payloads]
+            ready = multiprocessing.get_context("spawn").Barrier(processes + 1)
+            spawned = time.perf_counter()
+            workers = start_workers(processes, queue.queue_dir, env.output_dir, exit_when_idle=True, ready=ready)
+            try:
+                ready.wait(READY_TIMEOUT)
+            except threading.BrokenBarrierError:
+                print("Aviso: nem todos os workers ficaram prontos; a medida inclui a partida")
+            started = time.perf_counter()
+            for process in workers:
+                process.join()
+            elapsed = time.perf_counter() - started
+            startup = started - spawned
+            stats = queue.stats()
+            used = {job.result["worker"] for job in map(queue.get, job_ids) if job.result}
+        rows.append({
+            "processes": processes,
+            "startup_seconds": round(startup, 2),
+            "seconds": round(elapsed, 2),
+            "jobs_per_second": round(students / elapsed, 2),
+            "done": stats["status"].get(DONE, 0),
+            "failed": stats["status"].get(FAILED, 0),
+            "workers_used": len(used),
+        })
+        print(f"{processes} processo(s): {students} trabalhos em {elapsed:.2f}s "
+              f"({students / elapsed:.2f}/s, {len(used)} worker(s) usados; partida {startup:.2f}s)")
+    baseline = rows[0]["jobs_per_second"] if rows else 0
+    for row in rows:
+        row["speedup"] = round(row["jobs_per_second"] / baseline, 2) if baseline else 0
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fila de geração compartilhada entre workers")
+    parser.add_argument("--queue-dir", default=QUEUE_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker = subparsers.add_parser("worker", help="Processa trabalhos da fila")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--output-dir", help="Diretório de trabalho local (padrão: filled_docs)")
+    worker.add_argument("--max-jobs", type=int, help="Encerra após este número de trabalhos (por processo)")
+    worker.add_argument("--exit-when-idle", action="store_true", help="Encerra quando a fila esvaziar")
+    worker.add_argument("--no-warmup", action="store_true", help="Não aquece caches e LibreOffice antes de começar")
+
+    submit = subparsers.add_parser("submit", help="Enfileira um pedido (JSON no formato do serviço)")
+    submit.add_argument("payload", help="Arquivo JSON com user, internship, shifts e activity_descriptions")
+    submit.add_argument("--kind", choices=sorted(BUNDLE_KINDS), default="final")
+    submit.add_argument("--priority", choices=sorted(PRIORITY_ORDER), default=BATCH)
+    submit.add_argument("--tenant", default="")
+    submit.add_argument("--wait", action="store_true", help="Espera o trabalho terminar")
+
+    subparsers.add_parser("status", help="Trabalhos por situação, worker e tenant")
+    subparsers.add_parser("reclaim", help="Devolve à fila os trabalhos sem heartbeat")
+    purge = subparsers.add_parser("purge", help="Remove trabalhos concluídos e os seus resultados")
+    purge.add_argument("--older-than-hours", type=float, default=24)
+
+    harness = subparsers.add_parser("harness", help="Mede a vazão com 1..N processos locais")
+    harness.add_argument("--students", type=int, default=40)
+    harness.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    harness.add_argument("--kind", choices=sorted(BUNDLE_KINDS), default="final")
+    harness.add_argument("--output", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "harness":
+        rows = run_harness(args.students, args.processes, args.kind)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+        return 0 if all(row["failed"] == 0 for row in rows) else 1
+
+    queue = JobQueue(args.queue_dir)
+    if args.command == "worker":
+        warm = not args.no_warmup
+        if warm:
+            # O perfil padrão do LibreOffice é do host: aquecido uma vez, antes dos workers
+            print(warm_up(("soffice",)).format())
+        if args.processes == 1:
+            processed = run_worker(args.queue_dir, args.output_dir, args.max_jobs, args.exit_when_idle, warm)
+            print(f"Worker encerrado: {processed} trabalho(s)")
+            return 0
+        workers = start_workers(args.processes, args.queue_dir, args.output_dir, args.max_jobs,
+                                args.exit_when_idle, warm)
+        print(f"{args.processes} workers na fila {args.queue_dir}")
+        for process in workers:
+            process.join()
+        return 0
+    if args.command == "submit":
+        try:
+            with open(args.payload, encoding="utf-8") as f:
+                job = queue.submit(args.kind, json.load(f), args.priority, args.tenant)
+            if args.wait:
+                job = queue.wait(job.id)
+        except (OSError, ValueError) as e:
+            print(f"Erro: {e}")
+            return 1
+        print(json.dumps(job.as_dict(), indent=2, ensure_ascii=False))
+        return 0 if job.status != FAILED else 1
+    if args.command == "reclaim":
+        print(f"{queue.reclaim_stalled()} trabalho(s) devolvido(s) à fila")
+    elif args.command == "purge":
+        print(f"{queue.purge(args.older_than_hours * 3600)} trabalho(s) removido(s)")
+    else:
+        print(json.dumps(queue.stats(), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
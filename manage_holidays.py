@@ -1,12 +1,138 @@
 """
 Aplicação para gerenciamento de feriados personalizados (para uso do responsável pelo estágio).
+
+Feriados podem valer para todos os polos ou apenas para um polo (feriados
+municipais); cada polo pode ser associado a uma UF para incluir os feriados
+estaduais.
 """
 import streamlit as st
 from datetime import date
 from date_utils import (
-    add_custom_holiday, remove_custom_holiday, get_custom_holidays, 
-    clear_custom_holidays, get_brazilian_holidays
+    SUBDIVISIONS, add_custom_holiday, remove_custom_holiday, get_custom_holidays, 
+    clear_custom_holidays, get_brazilian_holidays, get_polo_holidays, get_polo_regions,
+    get_polo_subdivision, merge_polo_holidays, normalize_polo, remove_polo_holiday,
+    remove_polo_subdivision, set_polo_subdivision
 )
+from holiday_io import apply_holiday_import, import_holidays
+from tabular_io import import_formats
+
+
+# Problemas de importação listados na tela
+MAX_IMPORT_ISSUES = 30
+
+ALL_POLOS = "Todos os polos"
+
+
+def select_scope(key: str) -> str:
+    """Escolhe onde aplicar os feriados: "" (todos os polos) ou o nome de um polo"""
+    options = [ALL_POLOS, *get_polo_regions()]
+    choice = st.selectbox("Aplicar a", options, key=key,
+                          help="Cadastre novos polos na aba 🏙️ Polos")
+    return "" if choice == ALL_POLOS else choice
+
+
+def render_polos():
+    """Associa polos a UFs e lista os feriados municipais de cada polo"""
+    st.write("Associe cada polo à sua UF para incluir os feriados estaduais. "
+             "Polos sem cadastro usam a UF indicada no nome (ex: \"Polo Centro - DF\") ou, "
+             "se for uma capital, a UF da capital.")
+    
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        polo_name = st.text_input("Polo", placeholder="Ex: Polo Central", key="polo_region_name")
+    with col2:
+        subdiv = st.selectbox("UF / Município", SUBDIVISIONS, key="polo_region_subdiv")
+    with col3:
+        st.write("")  # Espaçamento
+        st.write("")  # Espaçamento
+        if st.button("💾 Salvar Polo", use_container_width=True):
+            if normalize_polo(polo_name):
+                set_polo_subdivision(polo_name, subdiv)
+                st.success(f"✅ {normalize_polo(polo_name)} → {subdiv}")
+                st.rerun()
+            else:
+                st.error("❌ Por favor, informe o nome do polo")
+    
+    polos = get_polo_regions()
+    if not polos:
+        st.info("ℹ️ Nenhum polo cadastrado ainda.")
+        return
+    
+    for polo, polo_subdiv in polos.items():
+        polo_holidays = get_polo_holidays(polo)
+        label = polo_subdiv or get_polo_subdivision(polo) or "apenas feriados nacionais"
+        with st.expander(f"🏙️ {polo} ({label}) - {len(polo_holidays)} feriado(s) municipal(is)"):
+            if polo_subdiv and st.button("Remover UF do polo", key=f"remove_polo_{polo}"):
+                remove_polo_subdivision(polo)
+                st.rerun()
+            for holiday_date, holiday_name in sorted(polo_holidays.items()):
+                col1, col2, col3 = st.columns([2, 3, 1])
+                with col1:
+                    st.write(f"**{holiday_date.strftime('%d/%m/%Y')}**")
+                with col2:
+                    st.write(holiday_name)
+                with col3:
+                    if st.button("🗑️ Remover", key=f"remove_polo_holiday_{polo}_{holiday_date}",
+                                 use_container_width=True):
+                        remove_polo_holiday(polo, holiday_date)
+                        st.rerun()
+
+
+def render_bulk_import():
+    """Importa feriados municipais e pontos facultativos de um arquivo CSV, XLSX ou ICS"""
+    st.header("📥 Importar Feriados em Lote")
+    st.caption("CSV/XLSX com as colunas **data** (DD/MM/YYYY) e **nome**, ou calendário ICS "
+               "(eventos de dia inteiro; eventos de vários dias geram um feriado por dia).")
+    
+    polo = select_scope("holiday_import_scope")
+    uploaded = st.file_uploader("Arquivo de feriados", type=import_formats(), key="holiday_import_file")
+    if uploaded is None:
+        return
+    
+    result = import_holidays(uploaded.getvalue(), uploaded.name, polo=polo)
+    
+    if result.errors:
+        with st.expander(f"❌ {len(result.errors)} linha(s) com erro (serão ignoradas)", expanded=True):
+            for issue in result.errors[:MAX_IMPORT_ISSUES]:
+                st.write(f"- {issue}")
+            if len(result.errors) > MAX_IMPORT_ISSUES:
+                st.caption(f"... e mais {len(result.errors) - MAX_IMPORT_ISSUES} erro(s)")
+    for issue in result.warnings[:MAX_IMPORT_ISSUES]:
+        st.warning(f"⚠️ {issue}")
+    
+    if result.official_conflicts:
+        with st.expander(f"🇧🇷 {len(result.official_conflicts)} data(s) já são feriados oficiais", expanded=True):
+            for conflict in result.official_conflicts:
+                st.write(f"- {conflict}")
+    if result.general_conflicts:
+        with st.expander(f"🌐 {len(result.general_conflicts)} data(s) já são feriados de todos os polos (não serão cadastradas)",
+                         expanded=True):
+            for conflict in result.general_conflicts:
+                st.write(f"- {conflict}")
+    if result.replaced:
+        with st.expander(f"✏️ {len(result.replaced)} feriado(s) personalizado(s) serão renomeados", expanded=True):
+            for conflict in result.replaced:
+                st.write(f"- {conflict}")
+    if result.unchanged:
+        st.info(f"ℹ️ {result.unchanged} feriado(s) já cadastrado(s) com o mesmo nome.")
+    
+    include_official = False
+    if result.official_conflicts:
+        include_official = st.checkbox(
+            "Cadastrar também as datas que já são feriados oficiais",
+            value=False,
+            key="holiday_import_official"
+        )
+    
+    to_apply = result.to_apply(include_official)
+    if to_apply:
+        if st.button(f"📥 Importar {len(to_apply)} feriado(s)", type="primary", use_container_width=True):
+            # Uma única transação para todos os feriados
+            count = apply_holiday_import(result, include_official, polo=polo)
+            st.success(f"✅ {count} feriado(s) importado(s)!")
+            st.rerun()
+    elif not result.errors:
+        st.info("ℹ️ Nenhum feriado novo para importar.")
 
 
 def main():
@@ -25,6 +151,8 @@ def main():
     # Seção de adicionar feriado
     st.header("➕ Adicionar Novo Feriado")
     
+    polo = select_scope("custom_holiday_scope")
+    
     col1, col2, col3 = st.columns([2, 2, 1])
     
     with col1:
@@ -47,7 +175,10 @@ def main():
         st.write("")  # Espaçamento
         if st.button("➕ Adicionar", use_container_width=True, type="primary"):
             if custom_holiday_name.strip():
-                add_custom_holiday(custom_holiday_date, custom_holiday_name.strip())
+                if polo:
+                    merge_polo_holidays(polo, {custom_holiday_date.isoformat(): custom_holiday_name.strip()})
+                else:
+                    add_custom_holiday(custom_holiday_date, custom_holiday_name.strip())
                 st.success(f"✅ Feriado '{custom_holiday_name}' adicionado em {custom_holiday_date.strftime('%d/%m/%Y')}")
                 st.rerun()
             else:
@@ -55,11 +186,15 @@ def main():
     
     st.markdown("---")
     
+    render_bulk_import()
+    
+    st.markdown("---")
+    
     # Mostrar feriados cadastrados
     st.header("📋 Feriados Cadastrados")
     
     # Tabs para separar oficiais e personalizados
-    tab1, tab2 = st.tabs(["🎉 Feriados Personalizados", "🇧🇷 Feriados Oficiais (Referência)"])
+    tab1, tab2, tab3 = st.tabs(["🎉 Feriados Personalizados", "🇧🇷 Feriados Oficiais (Referência)", "🏙️ Polos"])
     
     with tab1:
         custom_holidays = get_custom_holidays()
@@ -112,12 +247,16 @@ def main():
     with tab2:
         st.info("ℹ️ Feriados nacionais brasileiros (automáticos - não precisam ser cadastrados)")
         
+        official_subdiv = st.selectbox("Incluir feriados estaduais de", ["", *SUBDIVISIONS],
+                                       format_func=lambda s: s or "Somente nacionais",
+                                       key="official_subdiv")
+        
         # Mostrar feriados oficiais do ano atual e próximo
         current_year = date.today().year
         
         for year in [current_year, current_year + 1]:
             with st.expander(f"📅 Feriados Oficiais {year}", expanded=year == current_year):
-                br_holidays = get_brazilian_holidays(year)
+                br_holidays = get_brazilian_holidays(year, official_subdiv)
                 
                 if br_holidays:
                     sorted_official = sorted(br_holidays.items())
@@ -131,6 +270,9 @@ def main():
                 else:
                     st.write("Nenhum feriado oficial encontrado para este ano.")
     
+    with tab3:
+        render_polos()
+    
     st.markdown("---")
     st.caption("💡 **Dica:** Os feriados personalizados cadastrados aqui serão aplicados automaticamente ao gerar turnos por período na aplicação principal.")
 
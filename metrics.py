@@ -0,0 +1,269 @@
+"""
+Métricas no formato de exposição do Prometheus para a geração de documentos.
+
+Contadores, gauges e histogramas simples (sem dependências externas), servidos
+por um pequeno servidor HTTP local em /metrics. O app.py inicia o servidor uma
+vez por processo na porta ESTAGIO_METRICS_PORT (padrão: 9464).
+
+    curl http://localhost:9464/metrics
+"""
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_METRICS_PORT = int(os.environ.get("ESTAGIO_METRICS_PORT", 9464))
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera os labels {self.labelnames}, recebeu {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Métricas sem labels são expostas desde o início (valor 0)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Valor que pode subir e descer (ex: profundidade de fila)"""
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Métricas sem labels são expostas desde o início (valor 0)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma com buckets cumulativos"""
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> (contagem por bucket, soma, contagem total)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas renderizado em /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica já registrada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float],
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ----------------------------------------------------------------------
+# Métricas do pipeline de geração
+# ----------------------------------------------------------------------
+DOCUMENTS_GENERATED = REGISTRY.counter(
+    "estagio_documents_generated_total",
+    "Documentos gerados por tipo", ["document"])
+BUNDLES_GENERATED = REGISTRY.counter(
+    "estagio_bundles_generated_total",
+    "Conjuntos de documentos gerados (final = PDFs do estágio, mid = relatórios intermediários)", ["kind"])
+BUNDLE_SECONDS = REGISTRY.histogram(
+    "estagio_bundle_seconds",
+    "Tempo de geração de um conjunto de documentos",
+    [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120], ["kind"])
+CONVERSION_SECONDS = REGISTRY.histogram(
+    "estagio_conversion_seconds",
+    "Tempo de conversão DOCX -> PDF com LibreOffice",
+    [0.5, 1, 2, 5, 10, 20, 30, 60, 120], ["mode"])
+PDF_STAMP_SECONDS = REGISTRY.histogram(
+    "estagio_pdf_stamp_seconds",
+    "Tempo de preenchimento de um PDF pré-renderizado (sem LibreOffice)",
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1])
+CONVERSION_FAILURES = REGISTRY.counter(
+    "estagio_conversion_failures_total",
+    "Falhas de conversão DOCX -> PDF", ["reason"])
+SIGNATURE_FAILURES = REGISTRY.counter(
+    "estagio_signature_failures_total",
+    "Falhas ao aplicar a assinatura nos PDFs")
+MERGE_BYTES = REGISTRY.histogram(
+    "estagio_merge_bytes",
+    "Tamanho do PDF mesclado em bytes",
+    [50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6])
+TEMPLATE_CACHE = REGISTRY.counter(
+    "estagio_template_cache_total",
+    "Acessos ao cache de templates", ["kind", "result"])
+BUILD_TARGETS = REGISTRY.counter(
+    "estagio_build_targets_total",
+    "Documentos da geração incremental (rebuilt = regenerado, reused = reaproveitado)", ["outcome"])
+QUEUE_DEPTH = REGISTRY.gauge(
+    "estagio_queue_depth",
+    "Trabalhos aguardando execução", ["queue"])
+
+
+def record_template_cache(kind: str, cache_hit: bool):
+    TEMPLATE_CACHE.inc(kind=kind, result="hit" if cache_hit else "miss")
+
+
+# ----------------------------------------------------------------------
+# Servidor HTTP
+# ----------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = DEFAULT_METRICS_PORT, addr: str = "127.0.0.1",
+                         registry: MetricsRegistry = REGISTRY) -> Optional[ThreadingHTTPServer]:
+    """Inicia o servidor /metrics em uma thread daemon. Retorna None se a porta estiver em uso"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    try:
+        server = ThreadingHTTPServer((addr, port), handler)
+    except OSError as e:
+        print(f"Servidor de métricas não iniciado em {addr}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
@@ -1,20 +1,34 @@
 """
 Module to fill mid-internship DOCX templates by replacing placeholders with actual data.
+
+When a pre-rendered PDF of the template exists (see mid_pdf_templates.py), the
+values are stamped straight onto it; otherwise the DOCX is filled and converted
+with LibreOffice.
 """
+import io
 import os
-import json
 import shutil
+import signal
 import subprocess
+import tempfile
+import time
+import zipfile
 import fitz
-import random
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 from docx import Document
 
 from models import DocumentData
+from instrumentation import span
+from template_repository import get_template_repository
+from metrics import (
+    DOCUMENTS_GENERATED, BUNDLES_GENERATED, BUNDLE_SECONDS, CONVERSION_SECONDS,
+    CONVERSION_FAILURES, PDF_STAMP_SECONDS, SIGNATURE_FAILURES, record_template_cache,
+)
+from mid_pdf_templates import PLACEHOLDER_PATTERN, file_digest, load_prerendered, stamp_template
+from reproducible import save_pdf, signature_jitter, zip_write
 
-import os
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TEMPLATE_CONFIG_FILE = os.path.join(BASE_DIR, "internship_template.json")
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates", "mid-internship-docs")
 OUTPUT_DIR = os.path.join(BASE_DIR, "filled_docs")
 # Signature path (absolute)
@@ -22,6 +36,104 @@ SIGNATURE_PATH = os.path.join(BASE_DIR, "templates", "assinatura_breno.png")
 SIG_WIDTH_PTS = 300  # signature width in PDF points (increased for visibility)
 JITTER_X = 5        # max horizontal jitter in points
 JITTER_Y = 3        # max vertical jitter in points
+# Max seconds a single LibreOffice conversion may take before being killed
+CONVERSION_TIMEOUT = int(os.environ.get("ESTAGIO_SOFFICE_TIMEOUT", 120))
+# Date printed on the mid-internship reports
+MID_INTERNSHIP_DOCUMENT_DATE = '03 de Abril de 2026'
+
+# DOCX template bytes kept in memory: path -> (mtime, bytes)
+_docx_template_cache: dict[str, Tuple[int, bytes]] = {}
+# Signature as a one-page PDF: (mtime, pdf bytes, image width, image height)
+_signature_cache: Optional[Tuple[int, bytes, int, int]] = None
+# Placeholders used by each DOCX template: path -> (mtime, keys)
+_placeholder_cache: dict[str, Tuple[int, FrozenSet[str]]] = {}
+
+
+def load_docx_template(template_path: str) -> Tuple[Document, bool]:
+    """Opens a DOCX template from the in-memory cache. Returns (document, cache_hit)"""
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _docx_template_cache.get(template_path)
+    cache_hit = cached is not None and cached[0] == mtime
+    if not cache_hit:
+        with open(template_path, 'rb') as f:
+            cached = (mtime, f.read())
+        _docx_template_cache[template_path] = cached
+    return Document(io.BytesIO(cached[1])), cache_hit
+
+
+def template_placeholders(template_path: str) -> FrozenSet[str]:
+    """Returns the placeholder keys ({{key}}) found in the paragraphs and tables of a DOCX template"""
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _placeholder_cache.get(template_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    doc, _ = load_docx_template(template_path)
+    texts = [para.text for para in doc.paragraphs]
+    texts += [cell.text for table in doc.tables for row in table.rows for cell in row.cells]
+    keys = frozenset(key for text in texts for key in PLACEHOLDER_PATTERN.findall(text))
+    _placeholder_cache[template_path] = (mtime, keys)
+    return keys
+
+
+def load_signature() -> Tuple[bytes, int, int]:
+    """Returns the signature image wrapped in a one-page PDF and its size in pixels.
+
+    The PNG is decoded and compressed only once; each document then copies the
+    page with show_pdf_page instead of embedding the image again.
+    """
+    global _signature_cache
+    mtime = os.stat(SIGNATURE_PATH).st_mtime_ns
+    cached = _signature_cache
+    if cached is None or cached[0] != mtime:
+        pix = fitz.Pixmap(SIGNATURE_PATH)
+        doc = fitz.open()
+        page = doc.new_page(width=pix.width, height=pix.height)
+        page.insert_image(page.rect, filename=SIGNATURE_PATH)
+        cached = (mtime, doc.tobytes(deflate=True), pix.width, pix.height)
+        doc.close()
+        _signature_cache = cached
+    return cached[1], cached[2], cached[3]
+
+
+def get_pdf_path(docx_path: str) -> str:
+    """Returns the path LibreOffice writes the converted PDF to"""
+    base = os.path.splitext(os.path.basename(docx_path))[0]
+    return os.path.join(OUTPUT_DIR, f"{base}.pdf")
+
+
+def build_soffice_command(docx_path: str, profile_dir: Optional[str] = None,
+                          outdir: Optional[str] = None) -> List[str]:
+    """Builds the LibreOffice headless conversion command.
+
+    Concurrent soffice processes must not share a user profile, so callers running
+    several conversions at once pass a distinct profile_dir for each one.
+    """
+    cmd = ['soffice', '--headless']
+    if profile_dir:
+        cmd.append(f"-env:UserInstallation=file://{os.path.abspath(profile_dir)}")
+    cmd += ['--convert-to', 'pdf', '--outdir', outdir or OUTPUT_DIR, docx_path]
+    return cmd
+
+
+def run_soffice(cmd: List[str], timeout: float = CONVERSION_TIMEOUT):
+    """Runs a soffice command, killing the whole process group on timeout.
+
+    soffice is a wrapper script that spawns soffice.bin, so killing only the
+    wrapper would leave the converter running.
+    """
+    proc = subprocess.Popen(cmd, start_new_session=True)
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
 
 def _format_date(iso_date: str) -> str:
     """Converts ISO date YYYY-MM-DD to DD/MM/YYYY"""
@@ -35,9 +147,8 @@ class BaseDocxFiller:
     """Base class for DOCX template fillers"""
     def __init__(self, document_data: DocumentData):
         self.data = document_data
-        # Load internship template config for dates
-        with open(TEMPLATE_CONFIG_FILE, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
+        # Load the internship template for the student's discipline/turma/semester
+        self.template_key, self.config = get_template_repository().resolve_for(document_data)
         # Label to search for signature placement in PDF
         self.signature_label = getattr(self, 'SIGNATURE_LABEL', None)
 
@@ -85,108 +196,248 @@ class BaseDocxFiller:
         doc.save(output_path)
         return output_path
 
+    def get_output_name(self) -> str:
+        """Returns the DOCX output filename for this student"""
+        return f"{self.OUTPUT_PREFIX}_{self.data.user.ra}.docx"
+
+    def get_mapping(self) -> dict[str, str]:
+        """Placeholder values for the mid-internship reports"""
+        mapping = self._get_common_mapping()
+        # Override document date for mid-internship
+        mapping['data_documento'] = MID_INTERNSHIP_DOCUMENT_DATE
+        return mapping
+
+    def get_renderer(self) -> str:
+        """How fill() will produce the report: 'stamp', 'soffice' or 'docx' (no converter)"""
+        if load_prerendered(self.TEMPLATE_NAME, os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME)) is not None:
+            return "stamp"
+        return "soffice" if shutil.which('soffice') else "docx"
+
+    def get_inputs(self) -> Dict[str, Any]:
+        """Inputs that determine the generated report (see build_graph.py).
+
+        Only the placeholders present in the template are inputs, so editing a
+        field the template does not print does not regenerate the report.
+        """
+        template_path = os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME)
+        mapping = self.get_mapping()
+        inputs: Dict[str, Any] = {
+            key: mapping.get(key) for key in sorted(template_placeholders(template_path))
+        }
+        inputs["template"] = file_digest(template_path)
+        inputs["renderer"] = self.get_renderer()
+        if self.signature_label:
+            inputs["signature"] = file_digest(SIGNATURE_PATH)
+        return inputs
+
+    def render_pdf(self) -> Optional[str]:
+        """Stamps the values onto the pre-rendered PDF template.
+
+        Returns the PDF path, or None when the template has not been pre-rendered
+        (or the DOCX changed since), in which case callers fall back to LibreOffice.
+        """
+        template = load_prerendered(self.TEMPLATE_NAME, os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME))
+        if template is None:
+            return None
+        started = time.perf_counter()
+        pdf_path = get_pdf_path(self.get_output_name())
+        with span("pdf.stamp", document=self.__class__.__name__, ra=self.data.user.ra) as stamp_span:
+            doc = stamp_template(template, self.get_mapping())
+            try:
+                self._add_signature_to_pdf(pdf_path, doc)
+                self._ensure_output_dir()
+                save_pdf(doc, pdf_path, garbage=1)
+            finally:
+                doc.close()
+            stamp_span.record_file(pdf_path)
+        PDF_STAMP_SECONDS.observe(time.perf_counter() - started)
+        return pdf_path
+
+    def fill_docx(self) -> str:
+        """Fills the DOCX template and returns the saved DOCX path (no conversion)"""
+        template_path = os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME)
+        with span("docx.fill", document=self.__class__.__name__, ra=self.data.user.ra):
+            with span("docx.template_open") as open_span:
+                doc, cache_hit = load_docx_template(template_path)
+                open_span.set(cache_hit=cache_hit)
+            record_template_cache("docx", cache_hit)
+            mapping = self.get_mapping()
+            with span("docx.replace_placeholders"):
+                self._replace_placeholders(doc, mapping)
+            with span("docx.save") as save_span:
+                docx_path = self.save_doc(doc, self.get_output_name())
+                save_span.record_file(docx_path)
+        return docx_path
+
     def _convert_to_pdf(self, docx_path: str) -> str:
         """Attempts to convert a DOCX file to PDF using LibreOffice."""
-        base = os.path.splitext(os.path.basename(docx_path))[0]
-        pdf_path = os.path.join(OUTPUT_DIR, f"{base}.pdf")
+        pdf_path = get_pdf_path(docx_path)
         # Use LibreOffice if available
         if shutil.which('soffice'):
-            cmd = [
-                'soffice', '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', OUTPUT_DIR,
-                docx_path
-            ]
-            subprocess.run(cmd, check=True)
+            started = time.perf_counter()
+            with span("soffice.convert", document=self.__class__.__name__) as convert_span:
+                try:
+                    run_soffice(build_soffice_command(docx_path), timeout=CONVERSION_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    CONVERSION_FAILURES.inc(reason="timeout")
+                    raise
+                except (OSError, subprocess.CalledProcessError):
+                    CONVERSION_FAILURES.inc(reason="error")
+                    raise
+                convert_span.record_file(pdf_path)
+            CONVERSION_SECONDS.observe(time.perf_counter() - started, mode="sync")
             # After converting DOCX to PDF, overlay signature (and name/CRF)
             self._add_signature_to_pdf(pdf_path)
             return pdf_path
         # No converter available, return DOCX path
         return docx_path
     
-    def _add_signature_to_pdf(self, pdf_path: str):
-        """Overlays the signature image over the 'INSTITUIÇÃO DE ENSINO' text in the PDF."""
+    def signature_seed_key(self) -> Tuple[str, str, str]:
+        """Stable key for the signature jitter: RA, document type and template digest"""
+        template_path = os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME)
+        digest = file_digest(template_path) if os.path.exists(template_path) else ""
+        return self.data.user.ra, self.OUTPUT_PREFIX, digest
+
+    def _add_signature_to_pdf(self, pdf_path: str, doc: Optional[fitz.Document] = None):
+        """Overlays the signature image over the 'INSTITUIÇÃO DE ENSINO' text in the PDF.
+
+        With doc, the already open document is changed in place and the caller saves it.
+        """
         # Only overlay signature for company docs
         label = getattr(self, 'signature_label', None)
         if not label or not os.path.exists(SIGNATURE_PATH):
             return
         try:
-            doc = fitz.open(pdf_path)
-            # Find page containing label
-            target_page = None
-            for p in doc:
-                if p.search_for(label):
-                    target_page = p
-                    break
-            if target_page is None:
-                target_page = doc[-1]
-            # Load image and compute size
-            pix = fitz.Pixmap(SIGNATURE_PATH)
-            scale = SIG_WIDTH_PTS / pix.width
-            sig_h = pix.height * scale
-            # Determine placement
-            instances = target_page.search_for(label)
-            if instances:
-                rect = instances[0]
-                # Horizontally center signature on label
-                x = rect.x0 + (rect.x1 - rect.x0) / 2 - SIG_WIDTH_PTS / 2
-                # Vertically center over the label text area to overlap it
-                y = rect.y0 + ((rect.y1 - rect.y0) - sig_h) / 2
-            else:
-                page_rect = target_page.rect
-                x = (page_rect.width - SIG_WIDTH_PTS) / 2
-                y = page_rect.height - sig_h - 80
-            # Jitter
-            x += random.uniform(-JITTER_X, JITTER_X)
-            y += random.uniform(-JITTER_Y, JITTER_Y)
-            # Insert signature image
-            sig_rect = fitz.Rect(x, y, x + SIG_WIDTH_PTS, y + sig_h)
-            target_page.insert_image(sig_rect, filename=SIGNATURE_PATH, overlay=True)
-            # Add signer name and CRF under signature
-            text_y = y + sig_h + 4
-            target_page.insert_text((x, text_y), "Prof. Breno Silva de Abreu", fontsize=12)
-            target_page.insert_text((x, text_y + 14), "CRF-DF 2173", fontsize=12)
-            doc.save(pdf_path)
+            with span("pdf.signature_overlay", document=self.__class__.__name__):
+                if doc is None:
+                    self._overlay_signature(pdf_path, label)
+                else:
+                    self._place_signature(doc, label)
+        except Exception as e:
+            # The PDF is still usable without the signature; count and report the failure
+            SIGNATURE_FAILURES.inc()
+            print(f"Falha ao aplicar assinatura em {pdf_path}: {e}")
+
+    def _overlay_signature(self, pdf_path: str, label: str):
+        """Places the signature on the PDF file at pdf_path"""
+        doc = fitz.open(pdf_path)
+        self._place_signature(doc, label)
+        # PyMuPDF cannot fully rewrite the file it has open: save alongside and replace
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(pdf_path))
+        os.close(fd)
+        try:
+            save_pdf(doc, tmp_path)
             doc.close()
-        except Exception:
-            pass
+            os.replace(tmp_path, pdf_path)
+        finally:
+            if not doc.is_closed:
+                doc.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _place_signature(self, doc: fitz.Document, label: str):
+        """Places the signature image, signer name and CRF near the label"""
+        # Find page containing label
+        target_page = None
+        for p in doc:
+            if p.search_for(label):
+                target_page = p
+                break
+        if target_page is None:
+            target_page = doc[-1]
+        # Load image and compute size
+        signature_pdf, sig_width, sig_height = load_signature()
+        scale = SIG_WIDTH_PTS / sig_width
+        sig_h = sig_height * scale
+        # Determine placement
+        instances = target_page.search_for(label)
+        if instances:
+            rect = instances[0]
+            # Horizontally center signature on label
+            x = rect.x0 + (rect.x1 - rect.x0) / 2 - SIG_WIDTH_PTS / 2
+            # Vertically center over the label text area to overlap it
+            y = rect.y0 + ((rect.y1 - rect.y0) - sig_h) / 2
+        else:
+            page_rect = target_page.rect
+            x = (page_rect.width - SIG_WIDTH_PTS) / 2
+            y = page_rect.height - sig_h - 80
+        # Jitter, seeded per student, document type and template (reproducible output)
+        dx, dy = signature_jitter(JITTER_X, JITTER_Y, *self.signature_seed_key())
+        x += dx
+        y += dy
+        # Insert signature image
+        sig_rect = fitz.Rect(x, y, x + SIG_WIDTH_PTS, y + sig_h)
+        with fitz.open("pdf", signature_pdf) as signature_doc:
+            target_page.show_pdf_page(sig_rect, signature_doc, 0, overlay=True)
+        # Add signer name and CRF under signature
+        text_y = y + sig_h + 4
+        target_page.insert_text((x, text_y), "Prof. Breno Silva de Abreu", fontsize=12)
+        target_page.insert_text((x, text_y + 14), "CRF-DF 2173", fontsize=12)
 
 
 class CompanyActivitiesDocxFiller(BaseDocxFiller):
     """Fills the company activities mid-internship report"""
     TEMPLATE_NAME = 'obrigatorio_relatorio_de_atividades_empresa 2025-2_alimentos_EAD .docx'
+    OUTPUT_PREFIX = 'relatorio_atividades_empresa'
     # PDF signature should overlay next to this label
     SIGNATURE_LABEL = 'INSTITUIÇÃO DE ENSINO'
 
     def fill(self) -> str:
-        template_path = os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME)
-        doc = Document(template_path)
-        mapping = self._get_common_mapping()
-        # Override document date for mid-internship
-        mapping['data_documento'] = '03 de Abril de 2026'
-        self._replace_placeholders(doc, mapping)
-        # Save DOCX
-        docx_path = self.save_doc(doc, f"relatorio_atividades_empresa_{self.data.user.ra}.docx")
-        return self._convert_to_pdf(docx_path)
+        return self.render_pdf() or self._convert_to_pdf(self.fill_docx())
 
 
 class SupervisionReportDocxFiller(BaseDocxFiller):
     """Fills the student supervision mid-internship report"""
     TEMPLATE_NAME = 'obrigatorio_relatorio_de_supervisao_aluno 2025-2 Dra Dayana.docx'
+    OUTPUT_PREFIX = 'relatorio_supervisao_aluno'
     # No signature for supervision report
     SIGNATURE_LABEL = None
 
     def fill(self) -> str:
-        template_path = os.path.join(TEMPLATES_DIR, self.TEMPLATE_NAME)
-        doc = Document(template_path)
-        mapping = self._get_common_mapping()
-        # Override document date for mid-internship
-        mapping['data_documento'] = '03 de Abril de 2026'
-        self._replace_placeholders(doc, mapping)
-        # Save DOCX
-        docx_path = self.save_doc(doc, f"relatorio_supervisao_aluno_{self.data.user.ra}.docx")
+        pdf_path = self.render_pdf()
+        if pdf_path:
+            return pdf_path
+        docx_path = self.fill_docx()
         # Tentar converter para PDF, senão retornar DOCX
         try:
             return self._convert_to_pdf(docx_path)
         except RuntimeError:
-            return docx_path
\ No newline at end of file
+            return docx_path
+
+
+MID_INTERNSHIP_FILLERS = (
+    CompanyActivitiesDocxFiller,
+    SupervisionReportDocxFiller,
+)
+
+
+def get_mid_internship_zip_path(ra: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"mid_documents_{ra}.zip")
+
+
+def write_mid_internship_zip(generated_paths: List[str], ra: str) -> Tuple[str, bool]:
+    """Zips the generated reports and returns the ZIP path and whether PDF conversion was missing"""
+    mid_zip = get_mid_internship_zip_path(ra)
+    os.makedirs(os.path.dirname(mid_zip), exist_ok=True)
+    with zipfile.ZipFile(mid_zip, "w") as zf:
+        for path in generated_paths:
+            if path and os.path.exists(path):
+                zip_write(zf, path, os.path.basename(path))
+
+    missing_pdf = all(p.lower().endswith('.docx') for p in generated_paths if p)
+    return mid_zip, missing_pdf
+
+
+def generate_mid_internship_documents(document_data: DocumentData, ra: str) -> Tuple[str, bool]:
+    """Gera os documentos intermediários e retorna o caminho do ZIP e se faltou conversão para PDF"""
+    started = time.perf_counter()
+    with span("mid.generate", ra=ra):
+        generated_paths: list[str] = []
+        for filler_cls in MID_INTERNSHIP_FILLERS:
+            filler = filler_cls(document_data)
+            generated_paths.append(filler.fill())
+            DOCUMENTS_GENERATED.inc(document=filler_cls.__name__)
+        result = write_mid_internship_zip(generated_paths, ra)
+    BUNDLE_SECONDS.observe(time.perf_counter() - started, kind="mid")
+    BUNDLES_GENERATED.inc(kind="mid")
+    return result
@@ -0,0 +1,306 @@
+"""
+Renderização nativa (PyMuPDF) dos relatórios intermediários, sem LibreOffice.
+
+Cada template DOCX é convertido para PDF uma única vez, offline, com os
+placeholders ({{nome}}, {{ra}}, ...) ainda visíveis. A conversão grava, ao
+lado do PDF, um registro com a posição de cada placeholder (página, retângulo,
+linha de base, fonte e largura disponível até o próximo texto da linha):
+    templates/mid-internship-docs/pdf/<template>.pdf
+    templates/mid-internship-docs/pdf/<template>.anchors.json
+
+Na geração, os valores de cada estudante são carimbados diretamente no PDF
+pré-renderizado: o placeholder é removido com uma redação e o valor é escrito
+na mesma linha de base, sem subprocesso. Se o template DOCX mudar depois da
+pré-renderização (hash diferente), o registro é ignorado e a geração volta a
+usar o LibreOffice.
+
+Pré-renderizar os templates (requer LibreOffice):
+    python mid_pdf_templates.py build
+    python mid_pdf_templates.py info
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import fitz
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRERENDERED_DIR = os.environ.get(
+    "ESTAGIO_MID_PDF_DIR", os.path.join(BASE_DIR, "templates", "mid-internship-docs", "pdf"))
+REGISTRY_FORMAT = 1
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+# Margem direita usada quando não há texto à direita do placeholder
+RIGHT_MARGIN = 36
+# Valores longos são reduzidos até este tamanho de fonte para caber na linha
+MIN_FONT_SIZE = 6.0
+
+# Fontes base-14 usadas no preenchimento (normal e negrito)
+_FONTS: Dict[str, fitz.Font] = {}
+
+
+def _font(fontname: str) -> fitz.Font:
+    font = _FONTS.get(fontname)
+    if font is None:
+        font = _FONTS[fontname] = fitz.Font(fontname)
+    return font
+
+
+@dataclass(frozen=True)
+class Anchor:
+    """Posição de um placeholder no PDF pré-renderizado"""
+    key: str
+    page: int
+    rect: Tuple[float, float, float, float]
+    baseline: float
+    fontsize: float
+    bold: bool
+    # Coordenada x máxima disponível para o valor (próximo texto ou margem)
+    limit: float
+
+    @property
+    def fontname(self) -> str:
+        return "hebo" if self.bold else "helv"
+
+    def fit_fontsize(self, value: str) -> float:
+        """Tamanho da fonte para que o valor caiba até limit"""
+        width = _font(self.fontname).text_length(value, fontsize=self.fontsize)
+        available = self.limit - self.rect[0]
+        if width <= available or width <= 0:
+            return self.fontsize
+        return max(MIN_FONT_SIZE, self.fontsize * available / width)
+
+
+@dataclass(frozen=True)
+class PrerenderedTemplate:
+    """PDF pré-renderizado de um template e as posições dos seus placeholders"""
+    template_name: str
+    pdf_bytes: bytes
+    anchors: Tuple[Anchor, ...]
+    source_digest: str
+
+    @property
+    def keys(self) -> List[str]:
+        return sorted({anchor.key for anchor in self.anchors})
+
+
+def _paths(template_name: str, directory: Optional[str] = None) -> Tuple[str, str]:
+    directory = directory or PRERENDERED_DIR
+    base = os.path.splitext(template_name)[0].strip()
+    return os.path.join(directory, f"{base}.pdf"), os.path.join(directory, f"{base}.anchors.json")
+
+
+# path -> (mtime, sha256)
+_digest_cache: Dict[str, Tuple[int, str]] = {}
+
+
+def file_digest(path: str) -> str:
+    """sha256 do arquivo, recalculado apenas quando o mtime muda"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _digest_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _digest_cache[path] = (mtime, digest)
+    return digest
+
+
+# ----------------------------------------------------------------------
+# Pré-renderização (offline)
+# ----------------------------------------------------------------------
+def _page_chars(page: fitz.Page) -> List[dict]:
+    """Caracteres da página com bbox, origem e fonte, agrupados por linha"""
+    lines = []
+    for block in page.get_text("rawdict")["blocks"]:
+        for line in block.get("lines", []):
+            chars = []
+            for span_info in line["spans"]:
+                bold = bool(span_info["flags"] & fitz.TEXT_FONT_BOLD) or "bold" in span_info["font"].lower()
+                for char in span_info["chars"]:
+                    chars.append({"c": char["c"], "bbox": char["bbox"], "origin": char["origin"],
+                                  "size": span_info["size"], "bold": bold})
+            if chars:
+                lines.append(chars)
+    return lines
+
+
+def find_anchors(doc: fitz.Document) -> List[Anchor]:
+    """Localiza todos os {{placeholders}} do documento"""
+    anchors = []
+    for page in doc:
+        lines = _page_chars(page)
+        all_boxes = np.array([c["bbox"] for chars in lines for c in chars if not c["c"].isspace()],
+                             dtype=float).reshape(-1, 4)
+        for chars in lines:
+            text = "".join(c["c"] for c in chars)
+            for match in PLACEHOLDER_PATTERN.finditer(text):
+                boxes = [c["bbox"] for c in chars[match.start():match.end()]]
+                rect = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                        max(b[2] for b in boxes), max(b[3] for b in boxes))
+                # Próximo texto à direita, na mesma altura (mesma linha ou célula vizinha)
+                right = all_boxes[(all_boxes[:, 0] >= rect[2] - 0.5)
+                                  & (all_boxes[:, 1] < rect[3]) & (all_boxes[:, 3] > rect[1])]
+                limit = float(right[:, 0].min()) - 2 if right.size else page.rect.width - RIGHT_MARGIN
+                first = chars[match.start()]
+                anchors.append(Anchor(
+                    key=match.group(1), page=page.number, rect=tuple(round(v, 2) for v in rect),
+                    baseline=round(first["origin"][1], 2), fontsize=round(first["size"], 2),
+                    bold=first["bold"], limit=round(max(limit, rect[2]), 2),
+                ))
+    return anchors
+
+
+def save_prerendered(template: PrerenderedTemplate, directory: Optional[str] = None):
+    pdf_path, anchors_path = _paths(template.template_name, directory)
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    with open(pdf_path, "wb") as f:
+        f.write(template.pdf_bytes)
+    # Registro por último: só é gravado quando o PDF já está completo
+    with open(anchors_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "format": REGISTRY_FORMAT,
+            "template": template.template_name,
+            "source_sha256": template.source_digest,
+            "anchors": [asdict(anchor) for anchor in template.anchors],
+        }, f, ensure_ascii=False, indent=2)
+
+
+def prerender_template(docx_path: str, directory: Optional[str] = None) -> PrerenderedTemplate:
+    """Converte o template DOCX (com os placeholders) em PDF e registra as posições"""
+    from mid_internship_fillers import build_soffice_command, run_soffice
+
+    if not shutil.which("soffice"):
+        raise RuntimeError("LibreOffice (soffice) é necessário para pré-renderizar os templates")
+    with tempfile.TemporaryDirectory(prefix="mid_pdf_") as tmp_dir:
+        run_soffice(build_soffice_command(docx_path, os.path.join(tmp_dir, "profile"), outdir=tmp_dir))
+        converted = os.path.join(tmp_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        with open(converted, "rb") as f:
+            pdf_bytes = f.read()
+    with fitz.open("pdf", pdf_bytes) as doc:
+        anchors = tuple(find_anchors(doc))
+    template = PrerenderedTemplate(os.path.basename(docx_path), pdf_bytes, anchors, file_digest(docx_path))
+    save_prerendered(template, directory)
+    return template
+
+
+# ----------------------------------------------------------------------
+# Carregamento e preenchimento
+# ----------------------------------------------------------------------
+# caminho do registro -> ((mtime do PDF, mtime do registro), template)
+_prerendered_cache: Dict[str, Tuple[Tuple[int, int], PrerenderedTemplate]] = {}
+_prerendered_lock = threading.Lock()
+
+
+def _read_prerendered(template_name: str, directory: Optional[str] = None) -> Optional[PrerenderedTemplate]:
+    pdf_path, anchors_path = _paths(template_name, directory)
+    try:
+        state = (os.stat(pdf_path).st_mtime_ns, os.stat(anchors_path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    with _prerendered_lock:
+        cached = _prerendered_cache.get(anchors_path)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+    try:
+        with open(anchors_path, encoding="utf-8") as f:
+            registry = json.load(f)
+        if registry.get("format") != REGISTRY_FORMAT:
+            raise ValueError(f"formato {registry.get('format')} não suportado")
+        anchors = tuple(Anchor(**{**item, "rect": tuple(item["rect"])}) for item in registry["anchors"])
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"PDF pré-renderizado ignorado ({template_name}): {e}")
+        return None
+    template = PrerenderedTemplate(template_name, pdf_bytes, anchors, registry.get("source_sha256", ""))
+    with _prerendered_lock:
+        _prerendered_cache[anchors_path] = (state, template)
+    return template
+
+
+def load_prerendered(template_name: str, docx_path: Optional[str] = None,
+                     directory: Optional[str] = None) -> Optional[PrerenderedTemplate]:
+    """PDF pré-renderizado do template, ou None se não existir ou se o DOCX mudou desde então"""
+    template = _read_prerendered(template_name, directory)
+    if template is None:
+        return None
+    if docx_path and os.path.exists(docx_path) and file_digest(docx_path) != template.source_digest:
+        return None
+    return template
+
+
+def stamp_template(template: PrerenderedTemplate, mapping: Dict[str, str]) -> fitz.Document:
+    """Abre o PDF pré-renderizado e substitui os placeholders pelos valores (documento aberto)"""
+    doc = fitz.open("pdf", template.pdf_bytes)
+    by_page: Dict[int, List[Anchor]] = {}
+    for anchor in template.anchors:
+        # Placeholders sem valor permanecem, como no preenchimento do DOCX
+        if anchor.key in mapping:
+            by_page.setdefault(anchor.page, []).append(anchor)
+    for page_number, anchors in by_page.items():
+        page = doc[page_number]
+        for anchor in anchors:
+            page.add_redact_annot(fitz.Rect(anchor.rect), cross_out=False)
+        # Somente o texto é removido: linhas de tabela e imagens permanecem
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=fitz.PDF_REDACT_LINE_ART_NONE)
+        # Todos os valores da página em um único bloco de texto
+        writer = fitz.TextWriter(page.rect)
+        for anchor in anchors:
+            value = str(mapping[anchor.key] or "")
+            if value:
+                writer.append((anchor.rect[0], anchor.baseline), value,
+                              font=_font(anchor.fontname), fontsize=anchor.fit_fontsize(value))
+        writer.write_text(page)
+    return doc
+
+
+def _template_names() -> List[Tuple[str, str]]:
+    from mid_internship_fillers import MID_INTERNSHIP_FILLERS, TEMPLATES_DIR
+    return [(cls.TEMPLATE_NAME, os.path.join(TEMPLATES_DIR, cls.TEMPLATE_NAME)) for cls in MID_INTERNSHIP_FILLERS]
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PDFs pré-renderizados dos relatórios intermediários")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Pré-renderiza os templates (requer LibreOffice)")
+    build.add_argument("--output", default=None, help=f"Diretório (padrão: {PRERENDERED_DIR})")
+    info = subparsers.add_parser("info", help="Mostra os templates pré-renderizados")
+    info.add_argument("--path", default=None, help=f"Diretório (padrão: {PRERENDERED_DIR})")
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    status = 0
+    for template_name, docx_path in _template_names():
+        if args.command == "build":
+            try:
+                template = prerender_template(docx_path, args.output)
+            except Exception as e:
+                print(f"Erro ao pré-renderizar {template_name}: {e}")
+                status = 1
+                continue
+            print(f"{template_name}: {len(template.anchors)} placeholder(s) ({', '.join(template.keys)})")
+        else:
+            template = _read_prerendered(template_name, args.path)
+            if template is None:
+                print(f"{template_name}: não pré-renderizado")
+                status = 1
+            elif template.source_digest != file_digest(docx_path):
+                print(f"{template_name}: desatualizado (o DOCX mudou; execute build)")
+                status = 1
+            else:
+                print(f"{template_name}: {len(template.anchors)} placeholder(s) ({', '.join(template.keys)})")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
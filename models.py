@@ -1,8 +1,29 @@
 """
 Modelos de dados para o sistema de preenchimento de documentos de estágio.
 """
+from bisect import bisect_left, insort
 from dataclasses import dataclass, field
-from typing import List, Optional
+from datetime import date, datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Horas faltantes são completadas com até MANDATORY_ACTIVITY_MAX_HOURS de
+# atividade obrigatória e o restante com DOCUMENT_FILLING_TITLE
+MANDATORY_ACTIVITY_MAX_HOURS = 20
+DOCUMENT_FILLING_TITLE = "Preenchimento de Documentos"
+
+
+def parse_time_minutes(value: str) -> Optional[int]:
+    """Horário "HH:MM" (segundos e espaços ao redor tolerados) em minutos desde 00:00; None se inválido"""
+    try:
+        parts = value.split(':')
+        hours, minutes = int(parts[0]), int(parts[1])
+    except (AttributeError, IndexError, ValueError):
+        return None
+    if hours < 0 or minutes < 0:
+        return None
+    return hours * 60 + minutes
 
 
 @dataclass
@@ -39,17 +60,135 @@ class ShiftData:
     atividade_realizada: str
     
     def get_hours(self) -> float:
-        """Calcula as horas do turno"""
-        try:
-            h_inicio = int(self.horario_inicio.split(':')[0])
-            m_inicio = int(self.horario_inicio.split(':')[1])
-            h_fim = int(self.horario_fim.split(':')[0])
-            m_fim = int(self.horario_fim.split(':')[1])
-            
-            total_minutes = (h_fim * 60 + m_fim) - (h_inicio * 60 + m_inicio)
-            return total_minutes / 60.0
-        except:
+        """Calcula as horas do turno (0 se algum horário for inválido)"""
+        inicio = parse_time_minutes(self.horario_inicio)
+        fim = parse_time_minutes(self.horario_fim)
+        if inicio is None or fim is None:
             return 0.0
+        return (fim - inicio) / 60.0
+
+
+class ShiftIndex:
+    """
+    Lista de turnos com ids estáveis e índice ordenado por data.
+    
+    Mantém a ordem de adição (iteração, to_list) e um índice (data, id) atualizado
+    por inserção ordenada, de modo que a ordenação não é refeita a cada
+    renderização e uma página de turnos é obtida por fatiamento. Totais de horas
+    e de feriados são mantidos incrementalmente.
+    
+    Um índice congelado (freeze) pode ser compartilhado entre sessões: ele
+    recusa alterações, e quem precisa alterá-lo trabalha sobre copy().
+    """
+    # Ordem de exibição aceita por page()
+    ORDER_DATE = "date"
+    ORDER_DATE_DESC = "date_desc"
+    ORDER_ADDED = "added"
+    
+    def __init__(self, shifts: Iterable[ShiftData] = ()):
+        self._shifts: Dict[int, ShiftData] = {}
+        self._by_date: List[Tuple[int, int]] = []
+        self._next_id = 0
+        self._total_hours = 0.0
+        self._holiday_count = 0
+        self._frozen = False
+        self.extend(shifts)
+    
+    @staticmethod
+    def _date_ordinal(shift: ShiftData) -> int:
+        try:
+            return datetime.strptime(shift.data, "%d/%m/%Y").toordinal()
+        except ValueError:
+            return date.max.toordinal()
+    
+    def _check_mutable(self):
+        if self._frozen:
+            raise TypeError("ShiftIndex congelado é somente leitura; altere uma cópia (copy())")
+    
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+    
+    def freeze(self) -> "ShiftIndex":
+        """Torna o índice somente leitura (para compartilhá-lo entre sessões)"""
+        self._frozen = True
+        return self
+    
+    def copy(self) -> "ShiftIndex":
+        """Cópia alterável com os mesmos ids; os turnos (ShiftData) são compartilhados"""
+        clone = ShiftIndex()
+        clone._shifts = dict(self._shifts)
+        clone._by_date = list(self._by_date)
+        clone._next_id = self._next_id
+        clone._total_hours = self._total_hours
+        clone._holiday_count = self._holiday_count
+        return clone
+    
+    def append(self, shift: ShiftData) -> int:
+        """Adiciona um turno e retorna seu id"""
+        self._check_mutable()
+        shift_id = self._next_id
+        self._next_id += 1
+        self._shifts[shift_id] = shift
+        insort(self._by_date, (self._date_ordinal(shift), shift_id))
+        self._total_hours += shift.get_hours()
+        self._holiday_count += shift.atividade_realizada == "FERIADO"
+        return shift_id
+    
+    def extend(self, shifts: Iterable[ShiftData]):
+        for shift in shifts:
+            self.append(shift)
+    
+    def remove(self, shift_id: int):
+        """Remove o turno pelo id"""
+        self._check_mutable()
+        shift = self._shifts.pop(shift_id)
+        position = bisect_left(self._by_date, (self._date_ordinal(shift), shift_id))
+        del self._by_date[position]
+        self._total_hours -= shift.get_hours()
+        self._holiday_count -= shift.atividade_realizada == "FERIADO"
+    
+    def clear(self):
+        self._check_mutable()
+        self.__init__()
+    
+    def get(self, shift_id: int) -> ShiftData:
+        return self._shifts[shift_id]
+    
+    def __len__(self) -> int:
+        return len(self._shifts)
+    
+    def __iter__(self) -> Iterator[ShiftData]:
+        return iter(self._shifts.values())
+    
+    def to_list(self) -> List[ShiftData]:
+        """Turnos na ordem de adição"""
+        return list(self._shifts.values())
+    
+    @property
+    def total_hours(self) -> float:
+        return self._total_hours
+    
+    @property
+    def holiday_count(self) -> int:
+        return self._holiday_count
+    
+    def page_count(self, per_page: int) -> int:
+        return max(1, (len(self) + per_page - 1) // per_page)
+    
+    def page(self, page_number: int, per_page: int, order: str = ORDER_DATE) -> List[Tuple[int, ShiftData]]:
+        """Turnos (id, turno) da página page_number (a partir de 1)"""
+        start = (page_number - 1) * per_page
+        end = start + per_page
+        if order == self.ORDER_DATE:
+            ids = [shift_id for _, shift_id in self._by_date[start:end]]
+        elif order == self.ORDER_DATE_DESC:
+            total = len(self._by_date)
+            window = self._by_date[max(0, total - end):max(0, total - start)]
+            ids = [shift_id for _, shift_id in reversed(window)]
+        else:
+            ids = list(islice(self._shifts, start, end))
+        return [(shift_id, self._shifts[shift_id]) for shift_id in ids]
 
 
 @dataclass
@@ -108,41 +247,27 @@ class DocumentData:
         """Retorna o total de horas (turnos + complementares)"""
         return self.get_total_shift_hours() + self.get_total_complementary_hours()
     
+    def get_hours_summary(self):
+        """Plano de carga horária (planning.HoursSummary) calculado pelo motor de planejamento"""
+        # Import local: planning depende de models
+        from planning import plan_for_hours
+        return plan_for_hours(self.get_total_shift_hours(), self.internship.carga_horaria)
+    
     def get_missing_hours(self) -> float:
         """Retorna as horas faltantes para completar a carga horária"""
-        missing = self.internship.carga_horaria - self.get_total_shift_hours()
-        return max(0, missing)
+        return self.get_hours_summary().missing_hours
     
     def _calculate_complementary_activities(self):
         """Calcula e adiciona atividades complementares automaticamente"""
-        # Limpar atividades complementares existentes
-        self.complementary_activities = []
-        
-        missing_hours = self.get_missing_hours()
-        
-        if missing_hours <= 0:
-            # Carga horária já completa
-            return
-        
-        # Adicionar até 20 horas de "Atividade Obrigatória"
-        atividade_obrigatoria_hours = min(20, missing_hours)
-        if atividade_obrigatoria_hours > 0:
-            self.complementary_activities.append(
-                ComplementaryActivity(
-                    titulo=self.internship.titulo_atividade_obrigatoria,
-                    horas=atividade_obrigatoria_hours
-                )
-            )
-            missing_hours -= atividade_obrigatoria_hours
-        
-        # Se ainda faltam horas, adicionar "Preenchimento de Documentos"
-        if missing_hours > 0:
-            self.complementary_activities.append(
-                ComplementaryActivity(
-                    titulo="Preenchimento de Documentos",
-                    horas=missing_hours
-                )
-            )
+        summary = self.get_hours_summary()
+        # Até MANDATORY_ACTIVITY_MAX_HOURS de "Atividade Obrigatória" e o restante
+        # de "Preenchimento de Documentos" (divisão feita em planning.plan_hours)
+        self.complementary_activities = [
+            ComplementaryActivity(titulo=titulo, horas=horas)
+            for titulo, horas in ((self.internship.titulo_atividade_obrigatoria, summary.mandatory_hours),
+                                  (DOCUMENT_FILLING_TITLE, summary.document_hours))
+            if horas > 0
+        ]
     
     def get_activity_description(self, date_str: str) -> Optional[str]:
         """Retorna a descrição da atividade para uma data específica"""
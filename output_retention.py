@@ -0,0 +1,259 @@
+"""
+Gerenciamento de retenção dos documentos gerados em filled_docs.
+
+Os PDFs, DOCX, ZIPs e PDFs mesclados de cada RA são mantidos dentro de um
+orçamento de tamanho e de idade. Quando o orçamento é excedido, os arquivos
+menos acessados recentemente (LRU) são removidos, exceto os que pertencem a
+gerações ainda em andamento.
+
+Uso pela linha de comando (varredura sob demanda):
+    python output_retention.py [--max-mb 500] [--max-age-hours 168] [--dry-run]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterator, List, Optional
+
+
+DEFAULT_OUTPUT_DIR = "./filled_docs/"
+DEFAULT_MAX_BYTES = int(os.environ.get("ESTAGIO_RETENTION_MAX_BYTES", 500 * 1024 * 1024))
+DEFAULT_MAX_AGE_SECONDS = int(os.environ.get("ESTAGIO_RETENTION_MAX_AGE", 7 * 24 * 3600))
+DEFAULT_SWEEP_INTERVAL = int(os.environ.get("ESTAGIO_RETENTION_INTERVAL", 15 * 60))
+
+
+def get_file_identifier(filename: str) -> str:
+    """Retorna o identificador (RA) de um arquivo gerado, ex: 'checklist_123.pdf' -> '123'"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem.rsplit('_', 1)[-1]
+
+
+@dataclass
+class RetentionStats:
+    """Estatísticas do diretório de saída"""
+    total_bytes: int = 0
+    total_files: int = 0
+    hits: int = 0
+    misses: int = 0
+    evicted_files: int = 0
+    evicted_bytes: int = 0
+    sweeps: int = 0
+    last_sweep: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class SweepResult:
+    """Resultado de uma varredura de retenção"""
+    expired: List[str] = field(default_factory=list)
+    evicted: List[str] = field(default_factory=list)
+    freed_bytes: int = 0
+    skipped_in_flight: int = 0
+
+    @property
+    def removed(self) -> List[str]:
+        return self.expired + self.evicted
+
+
+class OutputRetentionManager:
+    """Aplica orçamento de tamanho/idade ao diretório de documentos gerados"""
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        self.output_dir = output_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.stats = RetentionStats()
+        self._last_access: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Registro de acessos e proteção de gerações em andamento
+    # ------------------------------------------------------------------
+    def record_access(self, path: str) -> bool:
+        """Registra o acesso a um arquivo gerado e retorna se ele já existia (hit)"""
+        name = os.path.basename(path)
+        hit = os.path.exists(path)
+        with self._lock:
+            self._last_access[name] = time.time()
+            if hit:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+        return hit
+
+    def record_write(self, path: str):
+        """Registra a escrita de um arquivo (conta como acesso, sem alterar hits)"""
+        with self._lock:
+            self._last_access[os.path.basename(path)] = time.time()
+
+    @contextmanager
+    def in_flight(self, identifier: str) -> Iterator[None]:
+        """Protege os arquivos de um RA contra remoção enquanto a geração está em andamento"""
+        with self._lock:
+            self._in_flight[identifier] = self._in_flight.get(identifier, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                remaining = self._in_flight.get(identifier, 0) - 1
+                if remaining > 0:
+                    self._in_flight[identifier] = remaining
+                else:
+                    self._in_flight.pop(identifier, None)
+
+    def is_in_flight(self, filename: str) -> bool:
+        with self._lock:
+            return get_file_identifier(filename) in self._in_flight
+
+    # ------------------------------------------------------------------
+    # Varredura
+    # ------------------------------------------------------------------
+    def _last_used(self, entry: os.DirEntry, st: os.stat_result) -> float:
+        """Último uso conhecido: acesso registrado em memória ou atime/mtime do arquivo"""
+        recorded = self._last_access.get(entry.name, 0.0)
+        return max(recorded, st.st_atime, st.st_mtime)
+
+    def _scan(self) -> List[tuple]:
+        """Retorna (último uso, tamanho, caminho, nome) de cada arquivo do diretório"""
+        entries = []
+        if not os.path.isdir(self.output_dir):
+            return entries
+        with os.scandir(self.output_dir) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append((self._last_used(entry, st), st.st_size, entry.path, entry.name))
+        return entries
+
+    def _remove(self, path: str, name: str) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        self._last_access.pop(name, None)
+        return True
+
+    def sweep(self, dry_run: bool = False) -> SweepResult:
+        """Remove arquivos expirados e, se necessário, os menos usados até caber no orçamento"""
+        result = SweepResult()
+        now = time.time()
+        with self._lock:
+            entries = self._scan()
+            total_bytes = sum(size for _, size, _, _ in entries)
+            candidates = []
+
+            for last_used, size, path, name in entries:
+                if get_file_identifier(name) in self._in_flight:
+                    result.skipped_in_flight += 1
+                    continue
+                if now - last_used > self.max_age_seconds:
+                    if dry_run or self._remove(path, name):
+                        result.expired.append(path)
+                        result.freed_bytes += size
+                        total_bytes -= size
+                    continue
+                candidates.append((last_used, size, path, name))
+
+            # LRU: remover primeiro os arquivos usados há mais tempo
+            candidates.sort()
+            for last_used, size, path, name in candidates:
+                if total_bytes <= self.max_bytes:
+                    break
+                if dry_run or self._remove(path, name):
+                    result.evicted.append(path)
+                    result.freed_bytes += size
+                    total_bytes -= size
+
+            if not dry_run:
+                self.stats.evicted_files += len(result.removed)
+                self.stats.evicted_bytes += result.freed_bytes
+                self.stats.sweeps += 1
+                self.stats.last_sweep = now
+        return result
+
+    def get_stats(self) -> RetentionStats:
+        """Retorna as estatísticas atualizadas com o conteúdo atual do diretório"""
+        with self._lock:
+            entries = self._scan()
+            self.stats.total_bytes = sum(size for _, size, _, _ in entries)
+            self.stats.total_files = len(entries)
+            return RetentionStats(**self.stats.as_dict())
+
+    # ------------------------------------------------------------------
+    # Varredura em segundo plano
+    # ------------------------------------------------------------------
+    def start_background_sweep(self, interval: float = DEFAULT_SWEEP_INTERVAL):
+        """Inicia uma thread daemon que executa sweep() periodicamente"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def _run():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.sweep()
+                except OSError as e:
+                    print(f"Falha na varredura de retenção: {e}")
+
+        self._thread = threading.Thread(target=_run, name="output-retention", daemon=True)
+        self._thread.start()
+
+    def stop_background_sweep(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_manager: Optional[OutputRetentionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_retention_manager(output_dir: str = DEFAULT_OUTPUT_DIR) -> OutputRetentionManager:
+    """Retorna o gerenciador de retenção compartilhado pelo processo"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = OutputRetentionManager(output_dir)
+        return _manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica a política de retenção em filled_docs")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument("--max-age-hours", type=float, default=DEFAULT_MAX_AGE_SECONDS / 3600)
+    parser.add_argument("--dry-run", action="store_true", help="Apenas lista o que seria removido")
+    args = parser.parse_args()
+
+    manager = OutputRetentionManager(
+        args.output_dir,
+        max_bytes=int(args.max_mb * 1024 * 1024),
+        max_age_seconds=int(args.max_age_hours * 3600),
+    )
+    result = manager.sweep(dry_run=args.dry_run)
+    for path in result.removed:
+        print(f"{'Removeria' if args.dry_run else 'Removido'}: {path}")
+    print(json.dumps({
+        "freed_bytes": result.freed_bytes,
+        "removed_files": len(result.removed),
+        "stats": manager.get_stats().as_dict(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Planejamento da carga horária: totais, horas faltantes e atividades complementares.
+
+As horas que faltam para a carga horária são completadas com até
+MANDATORY_ACTIVITY_MAX_HOURS de atividade obrigatória e o restante com
+"Preenchimento de Documentos". A regra vive só aqui (DocumentData usa
+plan_for_hours) e é aplicada sobre arrays numpy, de modo que uma única chamada
+calcula o plano de uma turma inteira (ou de vários cenários):
+
+    plan = plan_students([doc.shifts for doc in documents],
+                         [doc.internship.carga_horaria for doc in documents])
+    plan.missing, plan.mandatory, plan.documents
+
+Cenários "e se": period_shift_scenarios() desloca o período do template por
+vários deslocamentos (ex: -7, 0, +7 dias) e calcula, para cada estudante e
+cada deslocamento, quantos encontros sobram (descontando os feriados do polo
+de cada estudante) e quem deixa de cumprir a carga horária com os turnos.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from date_utils import get_holiday_calendar_key, get_holiday_index
+from models import MANDATORY_ACTIVITY_MAX_HOURS, ShiftData, parse_time_minutes
+
+
+def parse_minutes(times: Sequence[str]) -> np.ndarray:
+    """Horários em minutos desde 00:00 (-1 para horários inválidos), com o parser de ShiftData"""
+    values = np.asarray(times, dtype=str)
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    # Poucos horários distintos numa turma: cada um é interpretado uma única vez
+    unique, inverse = np.unique(values, return_inverse=True)
+    parsed = [parse_time_minutes(str(value)) for value in unique]
+    minutes = np.array([-1 if value is None else value for value in parsed], dtype=np.int64)
+    return minutes[inverse].reshape(values.shape)
+
+
+def shift_minutes(shifts: Iterable[ShiftData]) -> np.ndarray:
+    """Duração de cada turno em minutos (0 para horários inválidos, como ShiftData.get_hours)"""
+    shifts = list(shifts)
+    start = parse_minutes([s.horario_inicio for s in shifts])
+    end = parse_minutes([s.horario_fim for s in shifts])
+    return np.where((start >= 0) & (end >= 0), end - start, 0)
+
+
+@dataclass(frozen=True)
+class HoursSummary:
+    """Plano de carga horária de um estudante"""
+    carga_horaria: float
+    shift_hours: float
+    missing_hours: float
+    mandatory_hours: float
+    document_hours: float
+
+    @property
+    def complementary_hours(self) -> float:
+        return self.mandatory_hours + self.document_hours
+
+    @property
+    def is_complete(self) -> bool:
+        return self.missing_hours <= 0
+
+
+@dataclass(frozen=True)
+class HoursPlan:
+    """Planos de carga horária em arrays (um elemento por estudante/cenário)"""
+    carga_horaria: np.ndarray
+    shift_hours: np.ndarray
+    missing: np.ndarray
+    mandatory: np.ndarray
+    documents: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.missing)
+
+    @property
+    def complementary(self) -> np.ndarray:
+        return self.mandatory + self.documents
+
+    @property
+    def short(self) -> np.ndarray:
+        """Quem não cumpre a carga horária só com os turnos"""
+        return self.missing > 0
+
+    def summary(self, index=0) -> HoursSummary:
+        return HoursSummary(*(float(np.asarray(a)[index]) for a in (
+            self.carga_horaria, self.shift_hours, self.missing, self.mandatory, self.documents)))
+
+
+def plan_hours(shift_hours, carga_horaria) -> HoursPlan:
+    """Horas faltantes e divisão das complementares (arrays de qualquer forma, com broadcast)"""
+    shift_hours = np.asarray(shift_hours, dtype=float)
+    carga_horaria = np.broadcast_to(np.asarray(carga_horaria, dtype=float), shift_hours.shape)
+    missing = np.maximum(carga_horaria - shift_hours, 0.0)
+    mandatory = np.minimum(missing, MANDATORY_ACTIVITY_MAX_HOURS)
+    return HoursPlan(carga_horaria, shift_hours, missing, mandatory, missing - mandatory)
+
+
+def plan_students(shift_lists: Sequence[Iterable[ShiftData]], carga_horaria) -> HoursPlan:
+    """Plano de vários estudantes de uma vez (uma lista de turnos por estudante)"""
+    shift_lists = [list(shifts) for shifts in shift_lists]
+    counts = np.array([len(shifts) for shifts in shift_lists], dtype=np.int64)
+    minutes = shift_minutes([s for shifts in shift_lists for s in shifts])
+    owners = np.repeat(np.arange(len(shift_lists)), counts)
+    totals = np.bincount(owners, weights=minutes, minlength=len(shift_lists)) / 60.0
+    return plan_hours(totals, carga_horaria)
+
+
+def plan_for_hours(shift_hours: float, carga_horaria: float) -> HoursSummary:
+    """Plano de um único estudante a partir do total de horas dos turnos"""
+    return plan_hours([shift_hours], [carga_horaria]).summary(0)
+
+
+def plan_for_shifts(shifts: Iterable[ShiftData], carga_horaria: float) -> HoursSummary:
+    """Plano de um único estudante"""
+    return plan_students([shifts], [carga_horaria]).summary(0)
+
+
+# ----------------------------------------------------------------------
+# Cenários "e se"
+# ----------------------------------------------------------------------
+@dataclass(frozen=True)
+class ScenarioResult:
+    """Resultado de period_shift_scenarios: linhas = estudantes, colunas = deslocamentos"""
+    offsets: np.ndarray
+    meetings: np.ndarray
+    plan: HoursPlan
+
+    def falls_short(self, offset: int) -> np.ndarray:
+        """Índices dos estudantes que não cumprem a carga horária com o deslocamento informado"""
+        column = int(np.flatnonzero(self.offsets == offset)[0])
+        return np.flatnonzero(self.plan.short[:, column])
+
+    def newly_short(self, offset: int, baseline: int = 0) -> np.ndarray:
+        """Estudantes que cumpriam a carga no cenário base e deixam de cumprir com o deslocamento"""
+        short = self.plan.short
+        new = int(np.flatnonzero(self.offsets == offset)[0])
+        base = int(np.flatnonzero(self.offsets == baseline)[0])
+        return np.flatnonzero(short[:, new] & ~short[:, base])
+
+
+def meeting_counts(start_date: date, end_date: date, weekdays: Iterable[int],
+                   offsets: Sequence[int], polo: Optional[str] = None) -> np.ndarray:
+    """Número de encontros (dias da semana fora de feriados) do período deslocado por cada offset"""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    first = start_date.toordinal() + int(offsets.min())
+    last = end_date.toordinal() + int(offsets.max())
+    if last < first:
+        return np.zeros(len(offsets), dtype=np.int64)
+    days = np.arange(first, last + 1, dtype=np.int64)
+    # date.fromordinal(1) é uma segunda-feira (weekday 0)
+    meeting = np.isin((days - 1) % 7, list(weekdays)) & ~get_holiday_index(polo).mask(days)
+    cumulative = np.concatenate(([0], np.cumsum(meeting)))
+    lo = start_date.toordinal() + offsets - first
+    hi = end_date.toordinal() + offsets - first + 1
+    return cumulative[hi] - cumulative[lo]
+
+
+def period_shift_scenarios(template_config: dict, polos: Sequence[str], carga_horaria,
+                           offsets: Sequence[int] = (-7, 0, 7)) -> ScenarioResult:
+    """
+    Desloca o período do template por cada offset (em dias) e calcula o plano de
+    cada estudante da turma. Estudantes cujo polo usa o mesmo calendário de
+    feriados compartilham o cálculo.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    start_date = date.fromisoformat(template_config['start_date'])
+    end_date = date.fromisoformat(template_config['end_date'])
+    weekdays = template_config['weekdays']
+    minutes = shift_minutes([ShiftData(template_config['start_time'], template_config['end_time'], "", "")])[0]
+
+    by_calendar: Dict[Tuple[str, str], List[int]] = {}
+    for i, polo in enumerate(polos):
+        by_calendar.setdefault(get_holiday_calendar_key(polo), []).append(i)
+
+    meetings = np.zeros((len(polos), len(offsets)), dtype=np.int64)
+    for rows in by_calendar.values():
+        meetings[rows] = meeting_counts(start_date, end_date, weekdays, offsets, polos[rows[0]])
+
+    carga = np.asarray(carga_horaria, dtype=float).reshape(-1, 1) if np.ndim(carga_horaria) else carga_horaria
+    plan = plan_hours(meetings * minutes / 60.0, carga)
+    return ScenarioResult(offsets, meetings, plan)
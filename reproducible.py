@@ -0,0 +1,65 @@
+"""
+Saídas reprodutíveis: jitter de assinatura determinístico e PDFs/ZIPs sem
+metadados variáveis.
+
+O deslocamento aleatório da assinatura (jitter) é sorteado por um gerador
+semeado com uma chave estável (RA + tipo de documento + hash do template), de
+modo que entradas iguais produzem a mesma posição em qualquer execução.
+    ESTAGIO_SIGNATURE_JITTER=seeded   (padrão) semente estável
+    ESTAGIO_SIGNATURE_JITTER=random   sorteio a cada geração (comportamento antigo)
+
+Com ESTAGIO_REPRODUCIBLE=1, os PDFs são gravados sem datas de criação/modificação,
+sem metadados XMP e sem gerar um novo /ID, e as entradas dos ZIPs recebem uma
+data fixa: entradas iguais produzem arquivos idênticos byte a byte, que podem
+ser comparados, deduplicados ou reaproveitados por um cache.
+"""
+import hashlib
+import os
+import random
+import zipfile
+from typing import Tuple
+
+import fitz
+
+
+REPRODUCIBLE = os.environ.get("ESTAGIO_REPRODUCIBLE", "0").lower() in ("1", "true", "yes")
+JITTER_MODE = os.environ.get("ESTAGIO_SIGNATURE_JITTER", "seeded")
+
+# Data das entradas dos ZIPs reprodutíveis (a menor aceita pelo formato ZIP)
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def stable_seed(*key_parts: str) -> int:
+    """Semente de 64 bits derivada das partes da chave (independente de PYTHONHASHSEED)"""
+    digest = hashlib.sha256("\x1f".join(str(part) for part in key_parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def signature_jitter(max_x: float, max_y: float, *key_parts: str) -> Tuple[float, float]:
+    """Deslocamento (dx, dy) da assinatura; determinístico exceto no modo "random" sem REPRODUCIBLE"""
+    if JITTER_MODE == "random" and not REPRODUCIBLE:
+        rng = random
+    else:
+        rng = random.Random(stable_seed(*key_parts))
+    return rng.uniform(-max_x, max_x), rng.uniform(-max_y, max_y)
+
+
+def save_pdf(doc: fitz.Document, path: str, **options):
+    """doc.save() que, em modo reprodutível, remove metadados variáveis e mantém o /ID"""
+    if REPRODUCIBLE:
+        doc.set_metadata({})
+        doc.del_xml_metadata()
+        options.setdefault("no_new_id", True)
+    doc.save(path, **options)
+
+
+def zip_write(zf: zipfile.ZipFile, path: str, arcname: str):
+    """zf.write() com data fixa nas entradas em modo reprodutível"""
+    if not REPRODUCIBLE:
+        zf.write(path, arcname)
+        return
+    info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+    info.compress_type = zf.compression
+    info.external_attr = 0o644 << 16
+    with open(path, "rb") as f:
+        zf.writestr(info, f.read())
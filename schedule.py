@@ -0,0 +1,269 @@
+"""
+Modelo incremental do cronograma de encontros do estágio.
+
+Um cronograma é definido pelo período (início/fim), pelos dias da semana e pelo
+conjunto de feriados do período. Quando o supervisor altera qualquer um deles,
+Schedule.update() calcula apenas as datas adicionadas e removidas, percorrendo
+somente as datas afetadas pela alteração (trechos novos do período, dias da
+semana incluídos e feriados que deixaram de existir), em vez de regenerar e
+refiltrar todo o período.
+
+As descrições de atividades continuam indexadas pela data do encontro
+(DD/MM/YYYY): datas que permanecem no cronograma mantêm suas descrições.
+
+TemplateSchedule é o cronograma de uma versão do template já convertido em
+turnos, somente leitura e compartilhado por todas as sessões do processo
+(get_schedule_cache()): as sessões guardam apenas a referência e copiam os
+turnos ou as descrições só quando um estudante os altera.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from types import MappingProxyType
+from typing import Callable, FrozenSet, Hashable, Iterable, Iterator, Mapping, Optional, Tuple
+
+from date_utils import get_holiday_calendar_key, get_holidays_between
+from metrics import record_template_cache
+from models import ShiftData, ShiftIndex
+
+
+DATE_FORMAT = "%d/%m/%Y"
+
+# Versões de cronograma mantidas em memória (template x revisão x calendário do polo)
+SCHEDULE_CACHE_SIZE = int(os.environ.get("ESTAGIO_SCHEDULE_CACHE_SIZE", 64))
+
+
+@dataclass(frozen=True)
+class ScheduleSpec:
+    """Parâmetros que definem o cronograma"""
+    start_date: date
+    end_date: date
+    weekdays: FrozenSet[int]
+
+    @classmethod
+    def from_template(cls, template_config: dict) -> "ScheduleSpec":
+        return cls(
+            date.fromisoformat(template_config['start_date']),
+            date.fromisoformat(template_config['end_date']),
+            frozenset(template_config['weekdays']),
+        )
+
+    @property
+    def is_valid(self) -> bool:
+        return bool(self.weekdays) and self.start_date <= self.end_date
+
+    def contains(self, d: date) -> bool:
+        return self.start_date <= d <= self.end_date and d.weekday() in self.weekdays
+
+
+@dataclass(frozen=True)
+class ScheduleDiff:
+    """Datas de encontro adicionadas e removidas por uma alteração"""
+    added: Tuple[date, ...] = ()
+    removed: Tuple[date, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+    @property
+    def added_keys(self) -> Tuple[str, ...]:
+        return tuple(d.strftime(DATE_FORMAT) for d in self.added)
+
+    @property
+    def removed_keys(self) -> Tuple[str, ...]:
+        return tuple(d.strftime(DATE_FORMAT) for d in self.removed)
+
+
+def _weekday_dates(start: date, end: date, weekdays: Iterable[int]) -> Iterator[date]:
+    """Datas entre start e end (inclusivo) nos dias da semana informados, de 7 em 7 dias"""
+    week = timedelta(days=7)
+    for weekday in weekdays:
+        current = start + timedelta(days=(weekday - start.weekday()) % 7)
+        while current <= end:
+            yield current
+            current += week
+
+
+class Schedule:
+    """Cronograma imutável: especificação, feriados do período e datas dos encontros"""
+    __slots__ = ("spec", "holidays", "dates", "_date_set")
+
+    def __init__(self, spec: ScheduleSpec, holidays: FrozenSet[date], dates: Iterable[date]):
+        self.spec = spec
+        self.holidays = holidays
+        self.dates: Tuple[date, ...] = tuple(sorted(dates))
+        self._date_set = frozenset(self.dates)
+
+    @classmethod
+    def empty(cls) -> "Schedule":
+        return cls(ScheduleSpec(date.min, date.min, frozenset()), frozenset(), ())
+
+    @classmethod
+    def build(cls, spec: ScheduleSpec, holidays: Optional[FrozenSet[date]] = None) -> "Schedule":
+        """Gera o cronograma completo (usado apenas na primeira carga)"""
+        return cls.empty().update(spec, holidays)[0]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __contains__(self, d: date) -> bool:
+        return d in self._date_set
+
+    @property
+    def date_keys(self) -> Tuple[str, ...]:
+        """Datas no formato DD/MM/YYYY, chave das descrições de atividades"""
+        return tuple(d.strftime(DATE_FORMAT) for d in self.dates)
+
+    def diff(self, other: "Schedule") -> ScheduleDiff:
+        """Diferença entre este cronograma e outro (ex: o template salvo e o editado)"""
+        return ScheduleDiff(
+            added=tuple(sorted(other._date_set - self._date_set)),
+            removed=tuple(sorted(self._date_set - other._date_set)),
+        )
+
+    def update(self, spec: ScheduleSpec,
+               holidays: Optional[FrozenSet[date]] = None) -> Tuple["Schedule", ScheduleDiff]:
+        """Aplica uma nova especificação, percorrendo somente as datas afetadas"""
+        if not spec.is_valid:
+            return Schedule(spec, frozenset(), ()), ScheduleDiff(removed=self.dates)
+        if holidays is None:
+            holidays = frozenset(get_holidays_between(spec.start_date, spec.end_date))
+        if spec == self.spec and holidays == self.holidays:
+            return self, ScheduleDiff()
+
+        old = self.spec
+        removed = [d for d in self.dates if not spec.contains(d) or d in holidays]
+
+        # Candidatas a novas datas: somente o que a alteração pode ter liberado
+        candidates = set()
+        if old.is_valid:
+            overlap_start = max(spec.start_date, old.start_date)
+            overlap_end = min(spec.end_date, old.end_date)
+            # Trechos do novo período fora do período anterior
+            if overlap_start > overlap_end:
+                candidates.update(_weekday_dates(spec.start_date, spec.end_date, spec.weekdays))
+            else:
+                if spec.start_date < overlap_start:
+                    candidates.update(_weekday_dates(
+                        spec.start_date, overlap_start - timedelta(days=1), spec.weekdays))
+                if overlap_end < spec.end_date:
+                    candidates.update(_weekday_dates(
+                        overlap_end + timedelta(days=1), spec.end_date, spec.weekdays))
+                # Dias da semana incluídos, dentro do período comum
+                candidates.update(_weekday_dates(
+                    overlap_start, overlap_end, spec.weekdays - old.weekdays))
+                # Feriados anteriores que deixaram de ser feriado
+                candidates.update(d for d in self.holidays - holidays if spec.contains(d))
+        else:
+            candidates.update(_weekday_dates(spec.start_date, spec.end_date, spec.weekdays))
+
+        added = sorted(d for d in candidates if d not in self._date_set and d not in holidays)
+        removed_set = set(removed)
+        dates = [d for d in self.dates if d not in removed_set] + added
+        return Schedule(spec, holidays, dates), ScheduleDiff(tuple(added), tuple(removed))
+
+
+class TemplateSchedule:
+    """Turnos e descrições de uma versão do template, somente leitura"""
+    __slots__ = ("version", "schedule", "shifts", "descriptions")
+
+    def __init__(self, version: Hashable, schedule: Schedule, shifts: ShiftIndex,
+                 descriptions: Mapping[str, str]):
+        self.version = version
+        self.schedule = schedule
+        self.shifts = shifts.freeze()
+        self.descriptions: Mapping[str, str] = MappingProxyType(dict(descriptions))
+
+    @classmethod
+    def from_template(cls, template_config: dict, version: Hashable = None,
+                      holidays: Optional[FrozenSet[date]] = None) -> "TemplateSchedule":
+        """Um turno por encontro, com a descrição do template (ou a atividade padrão)"""
+        spec = ScheduleSpec.from_template(template_config)
+        schedule = Schedule.build(spec, holidays)
+        descriptions = template_config.get('activity_descriptions', {})
+        default_activity = template_config.get('default_activity', 'Atividade de estágio')
+        shifts = ShiftIndex(
+            ShiftData(
+                horario_inicio=template_config['start_time'],
+                horario_fim=template_config['end_time'],
+                data=date_str,
+                atividade_realizada=descriptions.get(date_str, default_activity),
+            )
+            for date_str in schedule.date_keys
+        )
+        return cls(version, schedule, shifts,
+                   {date_str: descriptions[date_str] for date_str in schedule.date_keys if date_str in descriptions})
+
+
+def period_holidays(template_config: dict, polo: str = "") -> Optional[FrozenSet[date]]:
+    """Feriados (nacionais, personalizados e regionais do polo) no período do template"""
+    spec = ScheduleSpec.from_template(template_config)
+    return frozenset(get_holidays_between(spec.start_date, spec.end_date, polo)) if spec.is_valid else None
+
+
+def template_schedule_version(template_key: Hashable, revision: int, template_config: dict,
+                              polo: str = "") -> tuple:
+    """
+    Versão do cronograma: template, revisão, calendário do polo e os feriados do período.
+
+    A chave do calendário não muda quando um feriado é cadastrado; os feriados do
+    período, sim, e uma alteração neles gera uma nova versão do cronograma.
+    """
+    return template_key, revision, get_holiday_calendar_key(polo), period_holidays(template_config, polo)
+
+
+def build_template_schedule(template_config: dict, polo: str = "",
+                            version: Hashable = None) -> TemplateSchedule:
+    """Turnos do template para o calendário de feriados do polo"""
+    # Feriados (nacionais e regionais do polo) já são excluídos pelo cronograma
+    return TemplateSchedule.from_template(template_config, version, period_holidays(template_config, polo))
+
+
+class TemplateScheduleCache:
+    """Cronogramas por versão, construídos uma vez e compartilhados pelo processo (LRU)"""
+
+    def __init__(self, max_entries: int = SCHEDULE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, TemplateSchedule]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: Hashable, build: Callable[[], TemplateSchedule]) -> TemplateSchedule:
+        """Cronograma da versão; build() é chamado só se ela ainda não estiver em cache"""
+        with self._lock:
+            cached = self._entries.get(version)
+            if cached is not None:
+                self._entries.move_to_end(version)
+        record_template_cache("schedule", cached is not None)
+        if cached is not None:
+            return cached
+
+        # Construído fora do lock; se outra sessão construiu antes, usa-se o dela
+        built = build()
+        with self._lock:
+            cached = self._entries.setdefault(version, built)
+            self._entries.move_to_end(version)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_schedule_cache: Optional[TemplateScheduleCache] = None
+_schedule_cache_lock = threading.Lock()
+
+
+def get_schedule_cache() -> TemplateScheduleCache:
+    """Retorna o cache de cronogramas compartilhado pelo processo"""
+    global _schedule_cache
+    with _schedule_cache_lock:
+        if _schedule_cache is None:
+            _schedule_cache = TemplateScheduleCache()
+        return _schedule_cache
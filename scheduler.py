@@ -0,0 +1,320 @@
+"""
+Escalonador de gerações com classes de prioridade.
+
+Um lote de 500 estudantes e um estudante clicando em "Gerar Todos os
+Documentos" disputam a mesma capacidade (soffice, PyMuPDF, workers). O
+escalonador concede vagas de execução (tickets) segundo estas regras:
+
+    - interativo > lote: quando uma vaga libera, pedidos interativos na fila
+      são atendidos primeiro;
+    - limite por classe: o lote nunca ocupa mais que BATCH_CONCURRENCY vagas
+      (por padrão capacidade - 1), de modo que sempre sobra vaga para um
+      pedido interativo mesmo durante uma avalanche de lotes;
+    - admissão com contrapressão: com max_queue pedidos da classe aguardando,
+      novos pedidos são recusados (SchedulerBusy, com Retry-After sugerido);
+    - divisão justa entre lotes: pedidos de lote são agrupados por tenant
+      (o supervisor) e a vaga vai para o tenant com menos execuções em
+      andamento; no empate, para o atendido há mais tempo (um tenant que
+      nunca foi atendido vence), de modo que um lote grande não atrasa o de
+      outro supervisor.
+
+Uso:
+    with get_scheduler().slot(INTERACTIVE, tenant=ra, timeout=30):
+        build_final_documents(document_data)
+
+    async with scheduler.async_slot(BATCH, tenant=supervisor):
+        ...
+
+Cada ticket é um concurrent.futures.Future concluído quando a vaga é
+concedida, o que permite esperar de threads, de corrotinas (asyncio) ou
+registrar um callback (serviço de geração).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from metrics import REGISTRY, QUEUE_DEPTH
+
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Ordem de atendimento das classes
+PRIORITIES = (INTERACTIVE, BATCH)
+
+DEFAULT_CAPACITY = int(os.environ.get("ESTAGIO_SCHED_CAPACITY", 4))
+BATCH_CONCURRENCY = int(os.environ.get("ESTAGIO_SCHED_BATCH_CONCURRENCY", max(1, DEFAULT_CAPACITY - 1)))
+INTERACTIVE_QUEUE = int(os.environ.get("ESTAGIO_SCHED_INTERACTIVE_QUEUE", 64))
+BATCH_QUEUE = int(os.environ.get("ESTAGIO_SCHED_BATCH_QUEUE", 5000))
+# Espera máxima de um pedido interativo por uma vaga (segundos)
+INTERACTIVE_TIMEOUT = float(os.environ.get("ESTAGIO_SCHED_INTERACTIVE_TIMEOUT", 60))
+
+SCHEDULER_WAIT_SECONDS = REGISTRY.histogram(
+    "estagio_scheduler_wait_seconds",
+    "Espera por uma vaga de geração",
+    [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300], ["priority"])
+SCHEDULER_REJECTED = REGISTRY.counter(
+    "estagio_scheduler_rejected_total",
+    "Pedidos recusados por fila cheia", ["priority"])
+
+
+class SchedulerBusy(RuntimeError):
+    """Fila da classe cheia: o pedido deve ser repetido mais tarde"""
+
+    def __init__(self, message: str, retry_after: float = 5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class ClassLimits:
+    """Execuções simultâneas e pedidos em espera permitidos para uma classe"""
+    concurrency: int
+    max_queue: int
+
+
+class Ticket:
+    """Pedido de vaga; concedido quando future termina, devolvido com release()"""
+
+    def __init__(self, scheduler: "GenerationScheduler", priority: str, tenant: str):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tenant = tenant
+        self.created = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.future: Future = Future()
+        self._released = False
+        # Conta em stats()["queued"] até ser concedido ou cancelado
+        self._queued = False
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a vaga; se o tempo acabar, desiste do pedido e retorna False"""
+        try:
+            self.future.result(timeout)
+            return True
+        except TimeoutError:
+            self.cancel()
+            # A vaga pode ter sido concedida entre o timeout e o cancelamento
+            return self.granted and not self._released
+
+    async def wait_async(self):
+        """Espera a vaga em uma corrotina (cancelar a tarefa desiste do pedido)"""
+        try:
+            await asyncio.wrap_future(self.future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def on_granted(self, callback: Callable[["Ticket"], None]):
+        """Registra um callback chamado (em outra thread) quando a vaga é concedida"""
+        self.future.add_done_callback(lambda f: None if f.cancelled() else callback(self))
+
+    def cancel(self):
+        """Desiste do pedido; se a vaga já foi concedida, devolve-a"""
+        if self.future.cancel():
+            self.scheduler._cancelled(self)
+        else:
+            self.release()
+
+    def release(self):
+        if self.granted and not self._released:
+            self._released = True
+            self.scheduler._release(self)
+
+
+class GenerationScheduler:
+    """Concede vagas de execução por prioridade, limite de classe e tenant"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 limits: Optional[Dict[str, ClassLimits]] = None, name: str = "generation"):
+        self.capacity = capacity
+        self.limits = limits or {
+            INTERACTIVE: ClassLimits(capacity, INTERACTIVE_QUEUE),
+            BATCH: ClassLimits(min(BATCH_CONCURRENCY, max(1, capacity - 1)), BATCH_QUEUE),
+        }
+        self.name = name
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._interactive: Deque[Ticket] = deque()
+        # Fila de lote por tenant e sequência da última concessão de cada um (rodízio)
+        self._batch: Dict[str, Deque[Ticket]] = {}
+        self._tenant_running: Dict[str, int] = {}
+        self._last_granted: Dict[str, int] = {}
+        self._grant_seq = 0
+        self._queued = {priority: 0 for priority in PRIORITIES}
+
+    # ------------------------------------------------------------------
+    # Pedidos
+    # ------------------------------------------------------------------
+    def request(self, priority: str = INTERACTIVE, tenant: str = "") -> Ticket:
+        """Enfileira um pedido de vaga (SchedulerBusy se a fila da classe estiver cheia)"""
+        if priority not in self.limits:
+            raise ValueError(f"Prioridade desconhecida: {priority}")
+        ticket = Ticket(self, priority, tenant)
+        with self._lock:
+            if self._queued[priority] >= self.limits[priority].max_queue:
+                self._purge_cancelled()
+            if self._queued[priority] >= self.limits[priority].max_queue:
+                SCHEDULER_REJECTED.inc(priority=priority)
+                raise SchedulerBusy(f"{self._queued[priority]} pedidos '{priority}' aguardando")
+            if priority == INTERACTIVE:
+                self._interactive.append(ticket)
+            else:
+                self._batch.setdefault(tenant, deque()).append(ticket)
+            ticket._queued = True
+            self._queued[priority] += 1
+            QUEUE_DEPTH.inc(queue=f"{self.name}_{priority}")
+            granted = self._dispatch()
+        self._notify(granted)
+        return ticket
+
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE, tenant: str = "",
+             timeout: Optional[float] = None) -> Iterator[Ticket]:
+        """Executa o bloco com uma vaga (TimeoutError se ela não vier a tempo)"""
+        ticket = self.request(priority, tenant)
+        if not ticket.wait(timeout):
+            raise TimeoutError(f"Sem vaga de geração em {timeout}s")
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    @asynccontextmanager
+    async def async_slot(self, priority: str = BATCH, tenant: str = ""):
+        ticket = self.request(priority, tenant)
+        await ticket.wait_async()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    # ------------------------------------------------------------------
+    # Concessão
+    # ------------------------------------------------------------------
+    def _release(self, ticket: Ticket):
+        with self._lock:
+            self._running[ticket.priority] -= 1
+            if ticket.priority == BATCH:
+                remaining = self._tenant_running.get(ticket.tenant, 0) - 1
+                if remaining > 0:
+                    self._tenant_running[ticket.tenant] = remaining
+                else:
+                    self._tenant_running.pop(ticket.tenant, None)
+                    if ticket.tenant not in self._batch:
+                        self._last_granted.pop(ticket.tenant, None)
+            granted = self._dispatch()
+        self._notify(granted)
+
+    def _purge_cancelled(self):
+        """Remove da contagem de espera os pedidos cancelados (chamado com o lock)"""
+        queues = [self._interactive, *self._batch.values()]
+        for queue in queues:
+            cancelled = [ticket for ticket in queue if ticket.future.cancelled()]
+            for ticket in cancelled:
+                queue.remove(ticket)
+                self._dequeued(ticket)
+        for tenant in [tenant for tenant, queue in self._batch.items() if not queue]:
+            del self._batch[tenant]
+
+    def _cancelled(self, ticket: Ticket):
+        """Pedido cancelado na fila: sai da contagem já (o ticket é descartado depois)"""
+        with self._lock:
+            self._dequeued(ticket)
+
+    def _dequeued(self, ticket: Ticket):
+        if not ticket._queued:
+            return
+        ticket._queued = False
+        self._queued[ticket.priority] -= 1
+        QUEUE_DEPTH.dec(queue=f"{self.name}_{ticket.priority}")
+
+    def _next_batch(self) -> Optional[Ticket]:
+        """Próximo pedido de lote: menos execuções e, no empate, atendido há mais tempo (chamado com o lock)"""
+        best, best_key = None, None
+        for tenant, queue in self._batch.items():
+            while queue and queue[0].future.cancelled():
+                self._dequeued(queue.popleft())
+            if not queue:
+                continue
+            key = (self._tenant_running.get(tenant, 0), self._last_granted.get(tenant, 0))
+            if best_key is None or key < best_key:
+                best, best_key = tenant, key
+        for tenant in [tenant for tenant, queue in self._batch.items() if not queue]:
+            del self._batch[tenant]
+            if tenant not in self._tenant_running:
+                self._last_granted.pop(tenant, None)
+        if best is None:
+            return None
+        return self._batch[best].popleft()
+
+    def _next(self) -> Optional[Ticket]:
+        if self._running[INTERACTIVE] < self.limits[INTERACTIVE].concurrency:
+            while self._interactive:
+                ticket = self._interactive.popleft()
+                if not ticket.future.cancelled():
+                    return ticket
+                self._dequeued(ticket)
+        if self._running[BATCH] < self.limits[BATCH].concurrency:
+            return self._next_batch()
+        return None
+
+    def _dispatch(self) -> List[Ticket]:
+        """Concede as vagas livres (chamado com o lock); retorna os tickets a notificar"""
+        granted = []
+        while sum(self._running.values()) < self.capacity:
+            ticket = self._next()
+            if ticket is None:
+                break
+            self._dequeued(ticket)
+            if not ticket.future.set_running_or_notify_cancel():
+                continue
+            ticket.granted_at = time.monotonic()
+            self._running[ticket.priority] += 1
+            if ticket.priority == BATCH:
+                self._tenant_running[ticket.tenant] = self._tenant_running.get(ticket.tenant, 0) + 1
+                self._grant_seq += 1
+                self._last_granted[ticket.tenant] = self._grant_seq
+            granted.append(ticket)
+        return granted
+
+    @staticmethod
+    def _notify(granted: List[Ticket]):
+        # Fora do lock: callbacks podem pedir ou devolver vagas
+        for ticket in granted:
+            SCHEDULER_WAIT_SECONDS.observe(ticket.granted_at - ticket.created, priority=ticket.priority)
+            ticket.future.set_result(ticket)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "running": dict(self._running),
+                "queued": dict(self._queued),
+                "limits": {priority: vars(limits) for priority, limits in self.limits.items()},
+                "batch_tenants": {tenant: {"queued": sum(ticket._queued for ticket in queue),
+                                           "running": self._tenant_running.get(tenant, 0)}
+                                  for tenant, queue in self._batch.items()},
+            }
+
+
+_scheduler: Optional[GenerationScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> GenerationScheduler:
+    """Escalonador compartilhado pelo processo"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GenerationScheduler()
+        return _scheduler
@@ -0,0 +1,259 @@
+"""
+Cliente do serviço de geração (generation_service.py) e teste de carga local.
+
+    client = GenerationClient("http://127.0.0.1:8765")
+    pdf_bytes, headers = client.bundle("final", document_to_payload(document_data))
+    job_id = client.submit("mid", payload); client.wait(job_id); client.result(job_id)
+
+Teste de carga (cada thread mantém uma conexão keep-alive; os estudantes
+sintéticos são os do benchmark.py):
+    python service_client.py load --requests 100 --concurrency 8 --students 20 --kind final
+    python service_client.py load --mode async --kind mid
+    python service_client.py load --mode async --priority batch --tenant coordenacao
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from models import DocumentData
+
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class ServiceError(RuntimeError):
+    """Resposta de erro do serviço (status HTTP e corpo JSON)"""
+
+    def __init__(self, status: int, body: dict, retry_after: Optional[float] = None):
+        super().__init__(f"{status}: {body.get('error', '')} {'; '.join(body.get('details', []))}".strip())
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+def document_to_payload(document_data: DocumentData) -> dict:
+    """DocumentData no formato JSON aceito pelo serviço"""
+    return {
+        "user": asdict(document_data.user),
+        "internship": asdict(document_data.internship),
+        "shifts": [asdict(shift) for shift in document_data.shifts],
+        "activity_descriptions": {
+            activity.encounter_date: activity.description for activity in document_data.activity_descriptions
+        },
+    }
+
+
+class GenerationClient:
+    """Cliente HTTP/1.1 com uma conexão keep-alive (não compartilhar entre threads)"""
+
+    def __init__(self, url: str = DEFAULT_URL, token: str = "", timeout: float = 330, tenant: str = ""):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.token = token
+        self.timeout = timeout
+        self.tenant = tenant
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None
+                 ) -> Tuple[int, Dict[str, str], bytes]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self.tenant:
+            headers["X-Tenant"] = self.tenant
+        # Uma nova tentativa se o servidor fechou a conexão ociosa
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+            if response.getheader("Connection", "").lower() == "close":
+                self.close()
+            return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+
+    def _json(self, method: str, path: str, payload: Optional[dict] = None, expected=(200,)) -> dict:
+        status, headers, data = self._request(method, path, payload)
+        body = json.loads(data) if data else {}
+        if status not in expected:
+            retry_after = headers.get("retry-after")
+            raise ServiceError(status, body, float(retry_after) if retry_after else None)
+        return body
+
+    def health(self) -> dict:
+        return self._json("GET", "/health")
+
+    @staticmethod
+    def _query(priority: str) -> str:
+        return f"?priority={priority}" if priority else ""
+
+    def bundle(self, kind: str, payload: dict, priority: str = "") -> Tuple[bytes, Dict[str, str]]:
+        """Geração síncrona: bytes do PDF mesclado (final) ou do ZIP (mid) e os cabeçalhos"""
+        status, headers, data = self._request("POST", f"/v1/bundles/{kind}{self._query(priority)}", payload)
+        if status != 200:
+            retry_after = headers.get("retry-after")
+            raise ServiceError(status, json.loads(data) if data else {}, float(retry_after) if retry_after else None)
+        return data, headers
+
+    def submit(self, kind: str, payload: dict, priority: str = "") -> str:
+        return self._json("POST", f"/v1/jobs/{kind}{self._query(priority)}", payload, expected=(202,))["job_id"]
+
+    def job(self, job_id: str) -> dict:
+        return self._json("GET", f"/v1/jobs/{job_id}")
+
+    def wait(self, job_id: str, poll_interval: float = 0.2, timeout: float = 330) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.job(job_id)
+            if job["status"] in ("done", "failed"):
+                return job
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Trabalho {job_id} não terminou em {timeout}s")
+            time.sleep(poll_interval)
+
+    def result(self, job_id: str) -> bytes:
+        status, headers, data = self._request("GET", f"/v1/jobs/{job_id}/result")
+        if status != 200:
+            raise ServiceError(status, json.loads(data) if data else {})
+        return data
+
+
+# ----------------------------------------------------------------------
+# Teste de carga
+# ----------------------------------------------------------------------
+@dataclass
+class LoadTestResult:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    bytes_received: int = 0
+    elapsed: float = 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def summary(self) -> str:
+        ok = self.statuses.get(200, 0)
+        lines = [
+            f"Pedidos: {sum(self.statuses.values())} em {self.elapsed:.2f}s "
+            f"({sum(self.statuses.values()) / self.elapsed if self.elapsed else 0:.1f}/s)",
+            f"Status: {dict(sorted(self.statuses.items()))}",
+        ]
+        if self.latencies:
+            lines.append(
+                f"Latência (ms): média {statistics.mean(self.latencies) * 1000:.0f} | "
+                f"p50 {self.percentile(50) * 1000:.0f} | p95 {self.percentile(95) * 1000:.0f} | "
+                f"máx {max(self.latencies) * 1000:.0f}")
+        lines.append(f"Recebidos: {self.bytes_received / 1024:.0f} KiB em {ok} resposta(s) 200")
+        return "\n".join(lines)
+
+
+def run_load_test(url: str, payloads: Sequence[dict], requests: int, concurrency: int,
+                  kind: str = "final", mode: str = "sync", token: str = "",
+                  priority: str = "", tenant: str = "") -> LoadTestResult:
+    """Envia `requests` pedidos (alternando os payloads) com `concurrency` conexões keep-alive"""
+    result = LoadTestResult()
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        client = GenerationClient(url, token, tenant=tenant)
+        try:
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                payload = payloads[index % len(payloads)]
+                started = time.perf_counter()
+                size = 0
+                try:
+                    if mode == "sync":
+                        data, _ = client.bundle(kind, payload, priority)
+                    else:
+                        job = client.wait(client.submit(kind, payload, priority))
+                        data = client.result(job["job_id"]) if job["status"] == "done" else b""
+                    size, status = len(data), 200
+                except ServiceError as e:
+                    status = e.status
+                except (OSError, http.client.HTTPException):
+                    status = 0
+                with lock:
+                    result.statuses[status] += 1
+                    if status == 200:
+                        result.latencies.append(time.perf_counter() - started)
+                        result.bytes_received += size
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cliente e teste de carga do serviço de geração")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--token", default="")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("health", help="Situação do serviço")
+    load = subparsers.add_parser("load", help="Teste de carga com estudantes sintéticos")
+    load.add_argument("--requests", type=int, default=50)
+    load.add_argument("--concurrency", type=int, default=4)
+    load.add_argument("--students", type=int, default=10, help="Estudantes distintos (os pedidos se repetem)")
+    load.add_argument("--kind", choices=["final", "mid"], default="final")
+    load.add_argument("--mode", choices=["sync", "async"], default="sync")
+    load.add_argument("--priority", choices=["interactive", "batch"], default="",
+                      help="Classe dos pedidos (padrão: a do endpoint)")
+    load.add_argument("--tenant", default="", help="Cabeçalho X-Tenant (divisão justa entre lotes)")
+    args = parser.parse_args(argv)
+
+    client = GenerationClient(args.url, args.token)
+    try:
+        if args.command == "health":
+            print(json.dumps(client.health(), indent=2))
+            return 0
+        client.health()
+    except (OSError, ServiceError) as e:
+        print(f"Erro: serviço indisponível em {args.url}: {e}")
+        return 1
+    finally:
+        client.close()
+
+    from benchmark import make_cohort
+    payloads = [document_to_payload(document_data) for document_data in make_cohort(args.students)]
+    result = run_load_test(args.url, payloads, args.requests, args.concurrency, args.kind, args.mode,
+                           args.token, args.priority, args.tenant)
+    print(result.summary())
+    return 0 if result.statuses.get(200, 0) == args.requests else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Importação e exportação em lote de turnos e descrições de atividades.
+
+Formatos aceitos: CSV, XLSX (via openpyxl) e ICS (iCalendar). Planilhas
+usam as colunas:
+    data (DD/MM/YYYY ou YYYY-MM-DD), horario_inicio, horario_fim (HH:MM),
+    atividade, descricao (opcional)
+No ICS, cada VEVENT é um turno: DTSTART/DTEND, SUMMARY (atividade) e
+DESCRIPTION (descrição).
+
+A validação é feita em uma única passada vetorizada (pandas/numpy) sobre todas
+as linhas: formato de data e horário, horário de término após o início,
+turnos duplicados e datas que caem em feriados (pelo índice de feriados de
+date_utils). Linhas inválidas são relatadas com o número da linha do arquivo.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from models import ShiftData
+from date_utils import HolidayIndex, get_holiday_index
+from tabular_io import (
+    ImportIssue, TabularFormatError, XLSX_AVAILABLE, ics_escape, ics_unescape,
+    normalize_columns, read_csv, read_ics_events, read_xlsx, write_csv,
+    write_ics_lines, write_xlsx,
+)
+
+
+COLUMNS = ["data", "horario_inicio", "horario_fim", "atividade", "descricao"]
+REQUIRED_COLUMNS = ["data", "horario_inicio", "horario_fim"]
+COLUMN_ALIASES = {
+    "data": ["date", "dia", "data do encontro"],
+    "horario_inicio": ["inicio", "hora inicio", "horario de inicio", "start"],
+    "horario_fim": ["fim", "termino", "hora fim", "horario de fim", "horario de termino", "end"],
+    "atividade": ["atividade realizada", "activity", "summary"],
+    "descricao": ["descricao da atividade", "description"],
+}
+
+# formato -> (extensão, MIME)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "ics": (".ics", "text/calendar"),
+}
+
+_TIME_PATTERN = r"^(\d{1,2}):(\d{2})(?::\d{2})?$"
+# date(1970, 1, 1).toordinal(): converte datetime64 em ordinais de date
+_EPOCH_ORDINAL = 719163
+
+
+@dataclass
+class ShiftImport:
+    """Resultado da importação: turnos válidos, descrições por data e problemas"""
+    shifts: List[ShiftData] = field(default_factory=list)
+    descriptions: Dict[str, str] = field(default_factory=dict)
+    errors: List[ImportIssue] = field(default_factory=list)
+    warnings: List[ImportIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "xlsx" or XLSX_AVAILABLE]
+
+
+# ----------------------------------------------------------------------
+# ICS
+# ----------------------------------------------------------------------
+def read_ics(data: bytes) -> pd.DataFrame:
+    """Converte os VEVENTs de um calendário em linhas no formato das planilhas"""
+    def _split(value: str):
+        # 20250901T080000[Z] -> (01/09/2025, 08:00); datas sem horário ficam sem horário
+        match = re.match(r"^(\d{4})(\d{2})(\d{2})(?:T(\d{2})(\d{2}))?", value or "")
+        if not match:
+            return value or "", ""
+        y, m, d, hh, mm = match.groups()
+        return f"{d}/{m}/{y}", f"{hh}:{mm}" if hh else ""
+
+    records = []
+    for event in read_ics_events(data):
+        start_date, start_time = _split(event.get("DTSTART", ""))
+        _, end_time = _split(event.get("DTEND", ""))
+        records.append({
+            "data": start_date,
+            "horario_inicio": start_time,
+            "horario_fim": end_time,
+            "atividade": ics_unescape(event.get("SUMMARY", "")),
+            "descricao": ics_unescape(event.get("DESCRIPTION", "")),
+        })
+    return pd.DataFrame(records, columns=COLUMNS)
+
+
+def write_ics(df: pd.DataFrame) -> bytes:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Estagio Filler//Turnos//PT"]
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    for row in df.itertuples(index=False):
+        day = datetime.strptime(row.data, "%d/%m/%Y").strftime("%Y%m%d")
+        start = row.horario_inicio.replace(":", "")
+        end = row.horario_fim.replace(":", "")
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{day}T{start}-{end}@estagio",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{day}T{start}00",
+            f"DTEND:{day}T{end}00",
+            f"SUMMARY:{ics_escape(row.atividade)}",
+        ]
+        if row.descricao:
+            lines.append(f"DESCRIPTION:{ics_escape(row.descricao)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return write_ics_lines(lines)
+
+
+# ----------------------------------------------------------------------
+# Importação
+# ----------------------------------------------------------------------
+def read_shift_table(data: bytes, filename: str) -> pd.DataFrame:
+    """Lê CSV, XLSX ou ICS (pela extensão) e devolve as colunas canônicas"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        df = read_csv(data)
+    elif extension in (".xlsx", ".xlsm"):
+        df = read_xlsx(data)
+    elif extension in (".ics", ".ical"):
+        df = read_ics(data)
+    else:
+        raise TabularFormatError(f"Formato não suportado: {extension or filename}")
+    return normalize_columns(df, COLUMN_ALIASES)
+
+
+def _parse_minutes(values: pd.Series) -> pd.Series:
+    """HH:MM -> minutos desde 00:00 (NaN se inválido)"""
+    parts = values.str.extract(_TIME_PATTERN).astype(float)
+    minutes = parts[0] * 60 + parts[1]
+    return minutes.where((parts[0] < 24) & (parts[1] < 60))
+
+
+def validate_shift_table(df: pd.DataFrame, mark_holidays: bool = False,
+                         holiday_index: Optional[HolidayIndex] = None,
+                         first_row: int = 2) -> ShiftImport:
+    """Valida todas as linhas de uma vez e converte as válidas em turnos"""
+    result = ShiftImport()
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        result.errors.append(ImportIssue(1, f"Colunas obrigatórias ausentes: {', '.join(missing)}"))
+        return result
+    if df.empty:
+        return result
+
+    df = df.reindex(columns=COLUMNS, fill_value="").fillna("").astype(str)
+    df = df.apply(lambda col: col.str.strip()).reset_index(drop=True)
+    rows = np.arange(len(df)) + first_row
+
+    # Datas: DD/MM/YYYY ou ISO
+    dates = pd.to_datetime(df["data"], format="%d/%m/%Y", errors="coerce")
+    dates = dates.fillna(pd.to_datetime(df["data"], format="%Y-%m-%d", errors="coerce"))
+    bad_date = dates.isna().to_numpy()
+
+    start = _parse_minutes(df["horario_inicio"])
+    end = _parse_minutes(df["horario_fim"])
+    bad_time = (start.isna() | end.isna()).to_numpy()
+    bad_order = ~bad_time & (end <= start).to_numpy()
+
+    valid = ~(bad_date | bad_time | bad_order)
+    date_keys = dates.dt.strftime("%d/%m/%Y").where(~bad_date, "")
+    start_keys = (start // 60).map("{:02.0f}".format, na_action="ignore") + ":" + \
+        (start % 60).map("{:02.0f}".format, na_action="ignore")
+    end_keys = (end // 60).map("{:02.0f}".format, na_action="ignore") + ":" + \
+        (end % 60).map("{:02.0f}".format, na_action="ignore")
+
+    # Duplicados (mesma data e horários): mantém a primeira ocorrência. Linhas
+    # inválidas nunca têm a mesma chave de uma válida
+    keys = pd.DataFrame({"d": date_keys, "s": start_keys, "e": end_keys})
+    duplicate = valid & keys.duplicated(keep="first").to_numpy()
+
+    # Feriados pelo índice (ordinais de todas as datas válidas de uma vez)
+    index = holiday_index or get_holiday_index()
+    ordinals = np.where(bad_date, 0, dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+                        + _EPOCH_ORDINAL)
+    on_holiday = np.zeros(len(df), dtype=bool)
+    on_holiday[~bad_date] = index.mask(ordinals[~bad_date])
+
+    activity = df["atividade"].to_numpy(dtype=object)
+    marked_holiday = activity == "FERIADO"
+    if mark_holidays:
+        activity = np.where(on_holiday & valid, "FERIADO", activity)
+    missing_activity = valid & (activity == "")
+
+    for i in np.flatnonzero(~valid | duplicate | missing_activity):
+        row = int(rows[i])
+        if bad_date[i]:
+            result.errors.append(ImportIssue(row, f"Data inválida '{df.at[i, 'data']}' (use DD/MM/YYYY)"))
+        elif bad_time[i]:
+            result.errors.append(ImportIssue(
+                row, f"Horário inválido '{df.at[i, 'horario_inicio']}'-'{df.at[i, 'horario_fim']}' (use HH:MM)"))
+        elif bad_order[i]:
+            result.errors.append(ImportIssue(row, "Horário de término deve ser posterior ao de início"))
+        elif duplicate[i]:
+            result.errors.append(ImportIssue(
+                row, f"Turno duplicado ({date_keys[i]} {start_keys[i]}-{end_keys[i]})"))
+        else:
+            result.errors.append(ImportIssue(row, "Atividade não informada"))
+
+    accepted = valid & ~duplicate & ~missing_activity
+    for i in np.flatnonzero(accepted & on_holiday & ~marked_holiday):
+        day = date.fromordinal(int(ordinals[i]))
+        action = "marcado como FERIADO" if mark_holidays else "mantido"
+        result.warnings.append(ImportIssue(int(rows[i]), f"{date_keys[i]} é feriado ({index.name(day)}) — {action}"))
+
+    descriptions = df["descricao"].to_numpy(dtype=object)
+    for i in np.flatnonzero(accepted):
+        result.shifts.append(ShiftData(
+            horario_inicio=start_keys[i],
+            horario_fim=end_keys[i],
+            data=date_keys[i],
+            atividade_realizada=activity[i],
+        ))
+        if descriptions[i]:
+            result.descriptions[date_keys[i]] = descriptions[i]
+    return result
+
+
+def import_shifts(data: bytes, filename: str, mark_holidays: bool = False,
+                  polo: Optional[str] = None) -> ShiftImport:
+    """Lê e valida um arquivo de turnos (CSV, XLSX ou ICS); feriados conforme o calendário do polo"""
+    try:
+        df = read_shift_table(data, filename)
+    except TabularFormatError as e:
+        return ShiftImport(errors=[ImportIssue(0, str(e))])
+    # No ICS, as "linhas" são os eventos (a partir de 1)
+    first_row = 1 if filename.lower().endswith((".ics", ".ical")) else 2
+    return validate_shift_table(df, mark_holidays=mark_holidays,
+                                holiday_index=get_holiday_index(polo), first_row=first_row)
+
+
+# ----------------------------------------------------------------------
+# Exportação
+# ----------------------------------------------------------------------
+def shifts_to_frame(shifts: Iterable[ShiftData], descriptions: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """Turnos ordenados por data e horário, com a descrição de cada data"""
+    descriptions = descriptions or {}
+    df = pd.DataFrame(
+        [(s.data, s.horario_inicio, s.horario_fim, s.atividade_realizada, descriptions.get(s.data, ""))
+         for s in shifts],
+        columns=COLUMNS,
+    )
+    order = pd.to_datetime(df["data"], format="%d/%m/%Y", errors="coerce")
+    return df.assign(_order=order).sort_values(["_order", "horario_inicio"], kind="stable") \
+        .drop(columns="_order").reset_index(drop=True)
+
+
+def export_shifts(shifts: Iterable[ShiftData], descriptions: Optional[Dict[str, str]] = None,
+                  fmt: str = "csv") -> bytes:
+    """Exporta turnos e descrições em CSV, XLSX ou ICS"""
+    df = shifts_to_frame(shifts, descriptions)
+    if fmt == "csv":
+        return write_csv(df)
+    if fmt == "xlsx":
+        return write_xlsx(df, sheet_name="Turnos")
+    if fmt == "ics":
+        return write_ics(df)
+    raise ValueError(f"Formato de exportação desconhecido: {fmt}")
@@ -1,32 +1,290 @@
 """
 Aplicação para supervisores configurarem o template de estágio.
+
+Período, horários e dias da semana reexecutam a página (o cronograma depende
+deles). As demais seções são fragmentos (st.fragment) e as descrições de cada
+encontro são formulários (st.form): digitar não reexecuta nada, e salvar uma
+descrição reexecuta apenas as abas de descrições.
 """
 import streamlit as st
 from datetime import date, time
-import json
-import os
-from typing import Dict, List
-from date_utils import generate_date_range, is_brazilian_holiday
+from typing import Dict, List, Tuple
+from models import ShiftData
+from schedule import Schedule, ScheduleDiff, ScheduleSpec
+from shift_io import EXPORT_FORMATS, available_formats, export_shifts, import_shifts
+from tabular_io import import_formats
+
+
+# Problemas de importação listados na tela
+MAX_IMPORT_ISSUES = 20
+from config_store import get_store
+from template_repository import TemplateKey, get_template_repository
+
+
+def select_template_key(templates) -> TemplateKey:
+    """Seleciona o template editado: padrão, existente ou nova disciplina/turma/semestre"""
+    st.header("🎯 Template")
+    
+    existing = templates.keys()
+    if TemplateKey() not in existing:
+        existing.insert(0, TemplateKey())
+    
+    choice = st.selectbox(
+        "Template a configurar",
+        existing + [None],
+        format_func=lambda k: "➕ Novo template (disciplina/turma/semestre)" if k is None else k.label()
+    )
+    if choice is not None:
+        return choice
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        codigo_disciplina = st.text_input("Código da Disciplina", placeholder="7433-100")
+    with col2:
+        turma = st.text_input("Turma", placeholder="Turma A")
+    with col3:
+        semestre = st.text_input("Semestre", placeholder="2025/2")
+    st.caption("Campos em branco valem para qualquer valor (ex: somente a disciplina = todas as turmas dela).")
+    
+    try:
+        return TemplateKey(codigo_disciplina, turma, semestre)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
 
 
-TEMPLATE_CONFIG_FILE = "./internship_template.json"
+def update_schedule(templates, template_key: TemplateKey, current_config: dict,
+                    spec: ScheduleSpec) -> Tuple[Schedule, Schedule]:
+    """Retorna (cronograma editado, cronograma salvo), recalculando apenas as datas alteradas"""
+    revision = templates.revision(template_key)
+    state = st.session_state.get('schedule_state')
+    if state is None or state['key'] != template_key or state['revision'] != revision:
+        saved = Schedule.build(ScheduleSpec.from_template(current_config)) if current_config else Schedule.empty()
+        state = {'key': template_key, 'revision': revision, 'saved': saved, 'current': saved}
+    
+    state['current'], _ = state['current'].update(spec)
+    st.session_state.schedule_state = state
+    return state['current'], state['saved']
+
+
+def render_schedule_diff(diff: ScheduleDiff, descriptions: Dict[str, str]):
+    """Mostra os encontros adicionados/removidos em relação ao template salvo"""
+    if not diff:
+        return
+    
+    with st.expander(
+        f"🔄 Alterações em relação ao template salvo: +{len(diff.added)} / -{len(diff.removed)} encontro(s)",
+        expanded=False
+    ):
+        if diff.added:
+            st.write(f"**Novos encontros ({len(diff.added)}):** " + ", ".join(diff.added_keys))
+        if diff.removed:
+            st.write(f"**Encontros removidos ({len(diff.removed)}):** " + ", ".join(diff.removed_keys))
+            orphaned = [k for k in diff.removed_keys if k in descriptions]
+            if orphaned:
+                st.caption(
+                    f"As descrições de {len(orphaned)} encontro(s) removido(s) são mantidas e "
+                    f"voltam a ser usadas se a data retornar ao cronograma."
+                )
 
 
-def load_template_config() -> dict:
-    """Carrega a configuração do template de estágio"""
-    if os.path.exists(TEMPLATE_CONFIG_FILE):
-        try:
-            with open(TEMPLATE_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+@st.cache_data(max_entries=16, show_spinner=False)
+def export_schedule(date_keys: Tuple[str, ...], descriptions: Tuple[Tuple[str, str], ...], start_time: str,
+                    end_time: str, default_activity: str, fmt: str) -> bytes:
+    """Arquivo de exportação do cronograma, refeito só quando o cronograma ou as descrições mudam"""
+    shifts = [
+        ShiftData(horario_inicio=start_time, horario_fim=end_time, data=date_str,
+                  atividade_realizada=default_activity)
+        for date_str in date_keys
+    ]
+    return export_shifts(shifts, dict(descriptions), fmt)
 
 
-def save_template_config(config: dict):
-    """Salva a configuração do template de estágio"""
-    with open(TEMPLATE_CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+@st.fragment
+def render_schedule_import_export(schedule: Schedule, storage_key: str, start_time: str,
+                                  end_time: str, default_activity: str):
+    """Exporta o cronograma e importa descrições de atividades em lote (CSV, XLSX ou ICS)"""
+    st.subheader("📥 Importar/Exportar Cronograma")
+    descriptions = st.session_state.temp_descriptions
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fmt = st.selectbox("Formato de exportação", available_formats(), key="schedule_export_format")
+    extension, mime = EXPORT_FORMATS[fmt]
+    with col2:
+        st.download_button(
+            "📤 Exportar Cronograma",
+            data=export_schedule(tuple(schedule.date_keys), tuple(sorted(descriptions.items())),
+                                 start_time, end_time, default_activity, fmt),
+            file_name=f"cronograma{extension}",
+            mime=mime,
+            use_container_width=True
+        )
+    
+    uploaded = st.file_uploader(
+        "Importar descrições (coluna descricao, ou atividade se vazia)",
+        type=import_formats(),
+        key=f"schedule_import_{storage_key}"
+    )
+    if uploaded is None:
+        return
+    
+    result = import_shifts(uploaded.getvalue(), uploaded.name)
+    for issue in result.errors[:MAX_IMPORT_ISSUES]:
+        st.error(f"❌ {issue}")
+    if len(result.errors) > MAX_IMPORT_ISSUES:
+        st.caption(f"... e mais {len(result.errors) - MAX_IMPORT_ISSUES} erro(s)")
+    
+    encounter_dates = set(schedule.date_keys)
+    imported, outside = {}, []
+    for shift in result.shifts:
+        text = result.descriptions.get(shift.data) or shift.atividade_realizada
+        if shift.data not in encounter_dates:
+            outside.append(shift.data)
+        elif text and text != "FERIADO":
+            imported[shift.data] = text
+    
+    if outside:
+        st.warning(f"⚠️ {len(outside)} data(s) fora do cronograma serão ignoradas: {', '.join(outside[:10])}"
+                   + (" ..." if len(outside) > 10 else ""))
+    if imported and st.button(f"📥 Aplicar {len(imported)} descrição(ões)", type="primary"):
+        # Uma única transação para todas as descrições
+        get_store().set_activity_descriptions(imported, storage_key)
+        st.session_state.temp_descriptions = {**descriptions, **imported}
+        # Descartar o estado dos campos de texto para exibir as descrições importadas
+        for date_str in imported:
+            st.session_state.pop(f"desc_{storage_key}_{date_str}", None)
+        st.success(f"✅ {len(imported)} descrição(ões) importada(s)!")
+        st.rerun()
+
+
+WEEKDAY_NAMES = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+# Encontros por aba na edição das descrições
+DATES_PER_TAB = 10
+
+
+def save_description(storage_key: str, date_str: str):
+    """Callback do formulário de um encontro: grava somente este encontro"""
+    description = st.session_state.get(f"desc_{storage_key}_{date_str}", "").strip()
+    if description:
+        st.session_state.temp_descriptions[date_str] = description
+        get_store().set_activity_description(date_str, description, storage_key)
+        st.session_state.description_notice = f"✅ Descrição de {date_str} salva!"
+
+
+def clear_description(storage_key: str, date_str: str):
+    """Callback do formulário de um encontro: remove a descrição e esvazia o campo"""
+    # Sem o estado do campo, ele é recriado com a descrição atual (vazia)
+    st.session_state.pop(f"desc_{storage_key}_{date_str}", None)
+    if date_str in st.session_state.temp_descriptions:
+        del st.session_state.temp_descriptions[date_str]
+        get_store().remove_activity_description(date_str, storage_key)
+        st.session_state.description_notice = f"Descrição de {date_str} removida"
+
+
+@st.fragment
+def render_description_editor(filtered_dates: List[date], storage_key: str):
+    """
+    Abas com um formulário por encontro e as estatísticas de preenchimento.
+
+    Os campos ficam dentro de st.form: digitar não reexecuta a página, e salvar
+    ou limpar reexecuta somente este fragmento (os callbacks atualizam o estado antes).
+    """
+    # Aviso deixado pelos callbacks (elementos não devem ser exibidos dentro deles)
+    notice = st.session_state.pop("description_notice", None)
+    if notice:
+        st.toast(notice)
+    
+    num_tabs = (len(filtered_dates) + DATES_PER_TAB - 1) // DATES_PER_TAB
+    
+    if num_tabs > 1:
+        tab_names = [f"Encontros {i*DATES_PER_TAB+1}-{min((i+1)*DATES_PER_TAB, len(filtered_dates))}" 
+                    for i in range(num_tabs)]
+        tabs = st.tabs(tab_names)
+    else:
+        tabs = [st.container()]
+    
+    for tab_idx, tab in enumerate(tabs):
+        with tab:
+            start_idx = tab_idx * DATES_PER_TAB
+            end_idx = min(start_idx + DATES_PER_TAB, len(filtered_dates))
+            
+            for date_obj in filtered_dates[start_idx:end_idx]:
+                date_str = date_obj.strftime("%d/%m/%Y")
+                weekday = WEEKDAY_NAMES[date_obj.weekday()]
+                
+                with st.expander(f"📅 {date_str} ({weekday})", expanded=False):
+                    with st.form(key=f"form_{storage_key}_{date_str}", border=False):
+                        st.text_area(
+                            "Descrição das atividades:",
+                            value=st.session_state.temp_descriptions.get(date_str, ""),
+                            key=f"desc_{storage_key}_{date_str}",
+                            height=120,
+                            placeholder="Descreva as atividades realizadas neste encontro..."
+                        )
+                        
+                        col1, col2 = st.columns([1, 1])
+                        
+                        with col1:
+                            st.form_submit_button("💾 Salvar", on_click=save_description,
+                                                  args=(storage_key, date_str), use_container_width=True)
+                        
+                        with col2:
+                            st.form_submit_button("🗑️ Limpar", on_click=clear_description,
+                                                  args=(storage_key, date_str), use_container_width=True)
+    
+    # Estatísticas
+    st.write("---")
+    descriptions_count = len([d for d in st.session_state.temp_descriptions.values() if d.strip()])
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total de Encontros", len(filtered_dates))
+    with col2:
+        st.metric("Com Descrição", descriptions_count)
+    with col3:
+        if descriptions_count == len(filtered_dates):
+            st.metric("Status", "✅ Completo")
+        else:
+            st.metric("Faltando", len(filtered_dates) - descriptions_count)
+
+
+@st.fragment
+def render_document_date(current_config: dict, storage_key: str):
+    """Data do documento (só é lida ao salvar: editar não reexecuta a página)"""
+    st.text_input(
+        "Data do Documento",
+        value=current_config.get("document_date", "Brasília, 28 de outubro de 2025"),
+        placeholder="Ex: Brasília, 28 de outubro de 2025",
+        key=f"document_date_{storage_key}"
+    )
+
+
+@st.fragment
+def render_default_activity(current_config: dict, storage_key: str, filtered_dates: List[date]):
+    """Descrição padrão e o botão que a aplica a todos os encontros"""
+    default_activity = st.text_area(
+        "Descrição Padrão de Atividade",
+        value=current_config.get("default_activity", ""),
+        placeholder="Esta descrição será aplicada a todos os encontros. Você pode personalizá-las individualmente abaixo.",
+        height=100,
+        key=f"default_activity_{storage_key}"
+    )
+    
+    if st.button("📋 Aplicar Descrição Padrão a Todos os Encontros", type="secondary"):
+        if default_activity.strip():
+            default_descriptions = {
+                d.strftime("%d/%m/%Y"): default_activity.strip() for d in filtered_dates
+            }
+            # Uma única transação para todos os encontros
+            get_store().set_activity_descriptions(default_descriptions, storage_key)
+            st.session_state.temp_descriptions = {**st.session_state.temp_descriptions, **default_descriptions}
+            # Descartar o estado dos campos de texto para exibir a descrição aplicada
+            for date_str in default_descriptions:
+                st.session_state.pop(f"desc_{storage_key}_{date_str}", None)
+            st.success("✅ Descrição padrão aplicada a todos os encontros!")
+            st.rerun()
 
 
 def main():
@@ -40,10 +298,21 @@ def main():
     st.title("👨‍🏫 Configuração de Template de Estágio - Supervisor")
     st.markdown("---")
     
-    st.info("👤 **Área do Supervisor:** Configure o template padrão de estágio que será aplicado para todos os estagiários.")
+    st.info("👤 **Área do Supervisor:** Configure o template de estágio de cada disciplina/turma/semestre, ou o template padrão aplicado às demais turmas.")
+    
+    templates = get_template_repository()
+    template_key = select_template_key(templates)
+    storage_key = template_key.storage_key
     
     # Carregar configuração existente
-    current_config = load_template_config()
+    current_config = templates.get(template_key)
+    
+    # Descrições temporárias pertencem ao template selecionado
+    if st.session_state.get('temp_descriptions_key') != storage_key:
+        st.session_state.pop('temp_descriptions', None)
+        st.session_state.temp_descriptions_key = storage_key
+    
+    st.markdown("---")
     
     # Seção 1: Configurações de Período e Horários
     st.header("📅 Período e Horários do Estágio")
@@ -68,11 +337,7 @@ def main():
             format="DD/MM/YYYY"
         )
         
-        document_date = st.text_input(
-            "Data do Documento",
-            value=current_config.get("document_date", "Brasília, 28 de outubro de 2025"),
-            placeholder="Ex: Brasília, 28 de outubro de 2025"
-        )
+        render_document_date(current_config, storage_key)
     
     with col2:
         st.subheader("Horários")
@@ -103,19 +368,19 @@ def main():
     
     weekday_selection = {}
     with col1:
-        weekday_selection[0] = st.checkbox("Segunda", value=0 in default_weekdays, key="wd_mon")
+        weekday_selection[0] = st.checkbox("Segunda", value=0 in default_weekdays, key=f"wd_mon_{storage_key}")
     with col2:
-        weekday_selection[1] = st.checkbox("Terça", value=1 in default_weekdays, key="wd_tue")
+        weekday_selection[1] = st.checkbox("Terça", value=1 in default_weekdays, key=f"wd_tue_{storage_key}")
     with col3:
-        weekday_selection[2] = st.checkbox("Quarta", value=2 in default_weekdays, key="wd_wed")
+        weekday_selection[2] = st.checkbox("Quarta", value=2 in default_weekdays, key=f"wd_wed_{storage_key}")
     with col4:
-        weekday_selection[3] = st.checkbox("Quinta", value=3 in default_weekdays, key="wd_thu")
+        weekday_selection[3] = st.checkbox("Quinta", value=3 in default_weekdays, key=f"wd_thu_{storage_key}")
     with col5:
-        weekday_selection[4] = st.checkbox("Sexta", value=4 in default_weekdays, key="wd_fri")
+        weekday_selection[4] = st.checkbox("Sexta", value=4 in default_weekdays, key=f"wd_fri_{storage_key}")
     with col6:
-        weekday_selection[5] = st.checkbox("Sábado", value=5 in default_weekdays, key="wd_sat")
+        weekday_selection[5] = st.checkbox("Sábado", value=5 in default_weekdays, key=f"wd_sat_{storage_key}")
     with col7:
-        weekday_selection[6] = st.checkbox("Domingo", value=6 in default_weekdays, key="wd_sun")
+        weekday_selection[6] = st.checkbox("Domingo", value=6 in default_weekdays, key=f"wd_sun_{storage_key}")
     
     selected_weekdays = [day for day, selected in weekday_selection.items() if selected]
     
@@ -127,109 +392,51 @@ def main():
     st.header("📝 Descrições de Atividades por Encontro")
     
     if selected_weekdays and start_date_config <= end_date_config:
-        # Gerar datas baseado nos dias selecionados
-        all_dates = generate_date_range(start_date_config, end_date_config)
-        filtered_dates = [
-            d for d in all_dates 
-            if d.weekday() in selected_weekdays and not is_brazilian_holiday(d)
-        ]
+        # Atualizar o cronograma somente com as datas afetadas pela alteração
+        spec = ScheduleSpec(start_date_config, end_date_config, frozenset(selected_weekdays))
+        schedule, saved_schedule = update_schedule(templates, template_key, current_config, spec)
+        filtered_dates = list(schedule.dates)
         
         st.info(f"📊 **{len(filtered_dates)} encontro(s)** serão criados baseado nas configurações acima (excluindo feriados).")
         
         # Carregar descrições existentes
         current_descriptions = current_config.get("activity_descriptions", {})
         
-        # Campo para descrição padrão
-        default_activity = st.text_area(
-            "Descrição Padrão de Atividade",
-            value=current_config.get("default_activity", ""),
-            placeholder="Esta descrição será aplicada a todos os encontros. Você pode personalizá-las individualmente abaixo.",
-            height=100
-        )
-        
-        if st.button("📋 Aplicar Descrição Padrão a Todos os Encontros", type="secondary"):
-            if default_activity.strip():
-                for d in filtered_dates:
-                    date_str = d.strftime("%d/%m/%Y")
-                    current_descriptions[date_str] = default_activity.strip()
-                st.success("✅ Descrição padrão aplicada a todos os encontros!")
-                st.rerun()
-        
-        st.write("---")
-        st.subheader("Descrições Individuais por Data")
-        
-        # Dividir em tabs para melhor organização
-        dates_per_tab = 10
-        num_tabs = (len(filtered_dates) + dates_per_tab - 1) // dates_per_tab
-        
-        if num_tabs > 1:
-            tab_names = [f"Encontros {i*dates_per_tab+1}-{min((i+1)*dates_per_tab, len(filtered_dates))}" 
-                        for i in range(num_tabs)]
-            tabs = st.tabs(tab_names)
-        else:
-            tabs = [st.container()]
+        if current_config:
+            render_schedule_diff(
+                saved_schedule.diff(schedule),
+                st.session_state.get('temp_descriptions', current_descriptions)
+            )
         
         # Armazenar descrições temporárias
         if 'temp_descriptions' not in st.session_state:
             st.session_state.temp_descriptions = current_descriptions.copy()
         
-        for tab_idx, tab in enumerate(tabs):
-            with tab:
-                start_idx = tab_idx * dates_per_tab
-                end_idx = min(start_idx + dates_per_tab, len(filtered_dates))
-                
-                for date_obj in filtered_dates[start_idx:end_idx]:
-                    date_str = date_obj.strftime("%d/%m/%Y")
-                    weekday_names = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
-                    weekday = weekday_names[date_obj.weekday()]
-                    
-                    with st.expander(f"📅 {date_str} ({weekday})", expanded=False):
-                        current_desc = st.session_state.temp_descriptions.get(date_str, "")
-                        
-                        description = st.text_area(
-                            "Descrição das atividades:",
-                            value=current_desc,
-                            key=f"desc_{date_str}",
-                            height=120,
-                            placeholder="Descreva as atividades realizadas neste encontro..."
-                        )
-                        
-                        col1, col2 = st.columns([1, 1])
-                        
-                        with col1:
-                            if st.button("💾 Salvar", key=f"save_{date_str}", use_container_width=True):
-                                if description and description.strip():
-                                    st.session_state.temp_descriptions[date_str] = description.strip()
-                                    st.success("✅ Salvo!")
-                                    st.rerun()
-                        
-                        with col2:
-                            if st.button("🗑️ Limpar", key=f"clear_{date_str}", use_container_width=True):
-                                if date_str in st.session_state.temp_descriptions:
-                                    del st.session_state.temp_descriptions[date_str]
-                                    st.info("Descrição removida")
-                                    st.rerun()
+        # Campo para descrição padrão
+        render_default_activity(current_config, storage_key, filtered_dates)
+        default_activity = st.session_state.get(f"default_activity_{storage_key}", "")
         
-        # Estatísticas
         st.write("---")
-        descriptions_count = len([d for d in st.session_state.temp_descriptions.values() if d.strip()])
+        st.subheader("Descrições Individuais por Data")
         
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total de Encontros", len(filtered_dates))
-        with col2:
-            st.metric("Com Descrição", descriptions_count)
-        with col3:
-            if descriptions_count == len(filtered_dates):
-                st.metric("Status", "✅ Completo")
-            else:
-                st.metric("Faltando", len(filtered_dates) - descriptions_count)
+        # Dividir em tabs para melhor organização
+        render_description_editor(filtered_dates, storage_key)
+        
+        # Importação/exportação em lote
+        st.write("---")
+        render_schedule_import_export(
+            schedule, storage_key,
+            start_time_config.strftime("%H:%M"), end_time_config.strftime("%H:%M"),
+            default_activity.strip() or "Atividade de estágio"
+        )
     
     else:
         st.warning("⚠️ Configure o período e os dias da semana para visualizar os encontros.")
     
     # Botão de salvar configuração
     st.markdown("---")
+    document_date = st.session_state.get(f"document_date_{storage_key}", "")
+    default_activity = st.session_state.get(f"default_activity_{storage_key}", "")
     
     col1, col2, col3 = st.columns([1, 2, 1])
     
@@ -254,8 +461,8 @@ def main():
                     "activity_descriptions": st.session_state.get('temp_descriptions', {})
                 }
                 
-                save_template_config(config)
-                st.success("✅ Configuração do template salva com sucesso!")
+                templates.save(template_key, config)
+                st.success(f"✅ Configuração do template salva com sucesso! ({template_key.label()})")
                 st.success("🎓 Os estagiários agora podem usar este template ao gerar seus documentos.")
                 
                 # Mostrar resumo
@@ -276,15 +483,14 @@ def main():
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("🗑️ Limpar Template Atual", type="secondary", use_container_width=True):
-                if os.path.exists(TEMPLATE_CONFIG_FILE):
-                    os.remove(TEMPLATE_CONFIG_FILE)
+                templates.clear(template_key)
                 if 'temp_descriptions' in st.session_state:
                     del st.session_state.temp_descriptions
                 st.success("Template removido!")
                 st.rerun()
     
     st.markdown("---")
-    st.caption("💡 **Dica:** Esta configuração será usada como template pelos estagiários ao gerar seus documentos.")
+    st.caption("💡 **Dica:** Cada estagiário usa o template mais específico cadastrado para sua disciplina, turma e semestre; sem nenhum, usa o template padrão.")
 
 
 if __name__ == "__main__":
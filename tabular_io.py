@@ -0,0 +1,173 @@
+"""
+Leitura e escrita de planilhas (CSV e XLSX) e calendários (ICS).
+
+Todas as colunas são lidas como texto (sem conversão automática de tipos),
+para que a validação fique a cargo de quem importa. O suporte a XLSX depende
+do pacote openpyxl (em requirements.txt); sem ele, import_formats() oferece
+apenas CSV e ICS:
+    pip install openpyxl
+
+Para ICS há apenas o subconjunto do RFC 5545 usado nas importações: leitura
+dos VEVENTs como dicionários de propriedades e escrita de linhas com escape
+e quebra em 75 octetos.
+"""
+import csv
+import io
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+try:
+    import openpyxl  # noqa: F401
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+
+CSV_ENCODINGS = ("utf-8-sig", "latin-1")
+IMPORT_FORMATS = ("csv", "xlsx", "ics")
+
+
+class TabularFormatError(ValueError):
+    """Arquivo de planilha ilegível ou em formato não suportado"""
+
+
+@dataclass
+class ImportIssue:
+    """Problema encontrado em uma linha do arquivo importado"""
+    row: int
+    message: str
+
+    def __str__(self) -> str:
+        # Linha 0: problema no arquivo como um todo
+        return f"Linha {self.row}: {self.message}" if self.row else self.message
+
+
+def import_formats() -> List[str]:
+    """Extensões aceitas nos uploads (XLSX só com o openpyxl instalado)"""
+    return [fmt for fmt in IMPORT_FORMATS if fmt != "xlsx" or XLSX_AVAILABLE]
+
+
+def _decode(data: bytes) -> str:
+    for encoding in CSV_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise TabularFormatError("Não foi possível decodificar o arquivo CSV")
+
+
+def _require_xlsx():
+    if not XLSX_AVAILABLE:
+        raise TabularFormatError("Suporte a XLSX indisponível: instale o pacote openpyxl")
+
+
+def read_csv(data: bytes) -> pd.DataFrame:
+    """Lê um CSV separado por vírgula ou ponto e vírgula (Excel em português)"""
+    text = _decode(data)
+    try:
+        delimiter = csv.Sniffer().sniff(text[:4096], delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    try:
+        return pd.read_csv(io.StringIO(text), sep=delimiter, dtype=str, keep_default_na=False)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise TabularFormatError(f"CSV inválido: {e}") from e
+
+
+def read_xlsx(data: bytes) -> pd.DataFrame:
+    """Lê a primeira planilha de um arquivo XLSX"""
+    _require_xlsx()
+    try:
+        return pd.read_excel(io.BytesIO(data), dtype=str, keep_default_na=False)
+    except (ValueError, KeyError, OSError) as e:
+        raise TabularFormatError(f"XLSX inválido: {e}") from e
+
+
+def write_csv(df: pd.DataFrame) -> bytes:
+    # utf-8-sig para que o Excel reconheça a acentuação
+    return df.to_csv(index=False, sep=";").encode("utf-8-sig")
+
+
+def write_xlsx(df: pd.DataFrame, sheet_name: str = "Planilha") -> bytes:
+    _require_xlsx()
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, sheet_name=sheet_name)
+    return buffer.getvalue()
+
+
+def normalize_columns(df: pd.DataFrame, aliases: Dict[str, Iterable[str]]) -> pd.DataFrame:
+    """Renomeia colunas conhecidas para o nome canônico (sem diferenciar maiúsculas/acentos comuns)"""
+    lookup = {}
+    for canonical, names in aliases.items():
+        for name in (canonical, *names):
+            lookup[_simplify(name)] = canonical
+    return df.rename(columns={col: lookup.get(_simplify(col), col) for col in df.columns})
+
+
+def _simplify(name: str) -> str:
+    table = str.maketrans("áàâãéêíóôõúç", "aaaaeeiooouc")
+    return "".join(str(name).strip().lower().translate(table).replace("_", " ").split())
+
+
+# ----------------------------------------------------------------------
+# ICS
+# ----------------------------------------------------------------------
+def ics_escape(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def ics_unescape(text: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), text)
+
+
+def _ics_fold(line: str) -> List[str]:
+    """Quebra linhas com mais de 75 octetos (RFC 5545)"""
+    folded = []
+    while len(line.encode("utf-8")) > 75:
+        cut = 75
+        while len(line[:cut].encode("utf-8")) > 75:
+            cut -= 1
+        folded.append(line[:cut])
+        line = " " + line[cut:]
+    folded.append(line)
+    return folded
+
+
+def read_ics_events(data: bytes) -> List[Dict[str, str]]:
+    """VEVENTs do calendário como {PROPRIEDADE: valor} (parâmetros como VALUE=DATE são descartados)"""
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise TabularFormatError("Arquivo ICS deve estar em UTF-8") from e
+    if "BEGIN:VCALENDAR" not in text:
+        raise TabularFormatError("Arquivo ICS inválido: nenhum VCALENDAR encontrado")
+
+    # Desdobrar linhas continuadas
+    lines = []
+    for raw in text.splitlines():
+        if raw[:1] in (" ", "\t") and lines:
+            lines[-1] += raw[1:]
+        else:
+            lines.append(raw)
+
+    events, event = [], None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            event = {}
+        elif line == "END:VEVENT" and event is not None:
+            events.append(event)
+            event = None
+        elif event is not None and ":" in line:
+            name, value = line.split(":", 1)
+            event[name.split(";", 1)[0].upper()] = value
+    return events
+
+
+def write_ics_lines(lines: List[str]) -> bytes:
+    """Junta as linhas de um calendário com CRLF, quebrando as longas"""
+    folded = [part for line in lines for part in _ics_fold(line)]
+    return ("\r\n".join(folded) + "\r\n").encode("utf-8")
@@ -0,0 +1,176 @@
+"""
+Repositório de templates de estágio por disciplina, turma e semestre.
+
+Cada template é identificado por uma TemplateKey (código da disciplina, turma,
+semestre) gravada como template_key no banco de configurações. A resolução
+para um estudante procura do mais específico para o mais genérico:
+    disciplina + turma + semestre
+    disciplina + turma
+    disciplina + semestre
+    disciplina
+    template padrão (compartilhado por todas as turmas)
+
+Os templates são carregados sob demanda e mantidos em cache por chave; cada
+acesso confere apenas o número de revisão no banco, recarregando o template
+quando ele foi alterado por outra sessão ou processo.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config_store import ConfigStore, DEFAULT_TEMPLATE_KEY, get_store
+
+
+KEY_SEPARATOR = "|"
+
+
+def _normalize(value: Optional[str]) -> str:
+    """Remove espaços extras e ignora maiúsculas/minúsculas ("turma a" == "Turma A")"""
+    return " ".join(str(value or "").split()).upper()
+
+
+@dataclass(frozen=True)
+class TemplateKey:
+    """Identificação de um template: disciplina, turma e semestre (vazios = qualquer)"""
+    codigo_disciplina: str = ""
+    turma: str = ""
+    semestre: str = ""
+
+    def __post_init__(self):
+        for field_name in ("codigo_disciplina", "turma", "semestre"):
+            value = _normalize(getattr(self, field_name))
+            if KEY_SEPARATOR in value:
+                raise ValueError(f"'{KEY_SEPARATOR}' não é permitido em {field_name}")
+            object.__setattr__(self, field_name, value)
+
+    @classmethod
+    def from_storage_key(cls, storage_key: str) -> "TemplateKey":
+        if storage_key == DEFAULT_TEMPLATE_KEY:
+            return cls()
+        return cls(*storage_key.split(KEY_SEPARATOR))
+
+    @classmethod
+    def for_document(cls, document_data) -> "TemplateKey":
+        """Chave de um DocumentData (models.DocumentData)"""
+        return cls(
+            document_data.internship.codigo_disciplina,
+            document_data.user.turma,
+            document_data.user.semestre,
+        )
+
+    @property
+    def is_default(self) -> bool:
+        return not (self.codigo_disciplina or self.turma or self.semestre)
+
+    @property
+    def storage_key(self) -> str:
+        """Valor de template_key no banco ("" para o template padrão)"""
+        if self.is_default:
+            return DEFAULT_TEMPLATE_KEY
+        return KEY_SEPARATOR.join((self.codigo_disciplina, self.turma, self.semestre))
+
+    def candidates(self) -> List["TemplateKey"]:
+        """Chaves consultadas na resolução, da mais específica para o template padrão"""
+        d, t, s = self.codigo_disciplina, self.turma, self.semestre
+        keys = [TemplateKey(d, t, s), TemplateKey(d, t), TemplateKey(d, "", s),
+                TemplateKey(d), TemplateKey()]
+        unique = []
+        for key in keys:
+            if key not in unique:
+                unique.append(key)
+        return unique
+
+    def label(self) -> str:
+        """Descrição legível para as interfaces"""
+        if self.is_default:
+            return "Template padrão"
+        parts = [
+            f"Disciplina {self.codigo_disciplina}" if self.codigo_disciplina else "",
+            self.turma,
+            self.semestre,
+        ]
+        return " · ".join(part for part in parts if part)
+
+
+class TemplateRepository:
+    """Templates por chave, carregados sob demanda e mantidos em cache"""
+
+    def __init__(self, store: Optional[ConfigStore] = None):
+        self._store = store
+        # storage_key -> (revisão, configuração)
+        self._cache: Dict[str, Tuple[int, dict]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> ConfigStore:
+        return self._store if self._store is not None else get_store()
+
+    def get(self, key: TemplateKey) -> dict:
+        """Configuração do template exatamente nesta chave ({} se não houver)"""
+        storage_key = key.storage_key
+        revision = self.revision(key)
+        with self._lock:
+            cached = self._cache.get(storage_key)
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+
+        config = self.store.load_template_config(storage_key)
+        with self._lock:
+            self._cache[storage_key] = (revision, config)
+        return config
+
+    def revision(self, key: TemplateKey) -> int:
+        """Revisão atual do template nesta chave"""
+        return self.store.get_template_revision(key.storage_key)
+
+    def resolve(self, key: TemplateKey) -> Tuple[TemplateKey, dict]:
+        """Template mais específico cadastrado para a chave (ou o padrão, possivelmente vazio)"""
+        for candidate in key.candidates():
+            config = self.get(candidate)
+            if config:
+                return candidate, config
+        return TemplateKey(), {}
+
+    def resolve_for(self, document_data) -> Tuple[TemplateKey, dict]:
+        return self.resolve(TemplateKey.for_document(document_data))
+
+    def group_documents(self, documents: Iterable) -> Dict[TemplateKey, list]:
+        """Agrupa DocumentData pelo template resolvido (lotes com várias turmas em uma passada)"""
+        groups: Dict[TemplateKey, list] = {}
+        for document_data in documents:
+            resolved_key, _ = self.resolve_for(document_data)
+            groups.setdefault(resolved_key, []).append(document_data)
+        return groups
+
+    def keys(self) -> List[TemplateKey]:
+        """Chaves de todos os templates cadastrados"""
+        return [TemplateKey.from_storage_key(k) for k in self.store.list_template_keys()]
+
+    def save(self, key: TemplateKey, config: dict):
+        self.store.save_template_config(config, key.storage_key)
+        self.invalidate(key)
+
+    def clear(self, key: TemplateKey):
+        self.store.clear_template_config(key.storage_key)
+        self.invalidate(key)
+
+    def invalidate(self, key: Optional[TemplateKey] = None):
+        """Descarta o cache de uma chave (ou de todas)"""
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key.storage_key, None)
+
+
+_repository: Optional[TemplateRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_template_repository() -> TemplateRepository:
+    """Retorna o TemplateRepository compartilhado pelo processo"""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = TemplateRepository()
+        return _repository
@@ -0,0 +1,291 @@
+"""
+Aquecimento (warm-up) dos caches e conversores na partida do processo.
+
+Depois de um deploy, o primeiro estudante pagava a leitura dos templates PDF e
+DOCX, o cálculo dos calendários de feriados, a importação do PyMuPDF e do
+python-docx e a primeira execução do LibreOffice (que cria o perfil do
+usuário). O aquecimento faz esse trabalho antes do primeiro pedido:
+
+    - final: abre cada template PDF (cache em memória) e preenche em memória,
+      sem gravar nada, os documentos de um estudante de exemplo (fontes e
+      digests dos templates);
+    - mid: placeholders dos templates DOCX, assinatura e o registro de
+      layout dos PDFs pré-renderizados (mid_pdf_templates.py), com um
+      preenchimento em memória;
+    - holidays: tabela pré-calculada e o índice de feriados do calendário
+      nacional e de cada polo cadastrado (ano anterior, atual e seguinte);
+    - schedules: cronogramas compartilhados (schedule.TemplateSchedule) de cada
+      template cadastrado, para os mesmos calendários;
+    - soffice: uma conversão de um DOCX vazio, que cria o perfil padrão do
+      LibreOffice e carrega o executável no cache do sistema (dispensada
+      quando todos os relatórios intermediários estão pré-renderizados).
+
+Cada processo que gera documentos aquece a si mesmo: a página do estudante
+(em segundo plano, na primeira sessão), os workers do serviço de geração e
+os workers da fila em disco. O relatório fica disponível em
+get_warmup_report() e no /health do serviço.
+
+Uso (diagnóstico ou etapa de deploy: aquece o perfil do LibreOffice e mostra
+quanto cada etapa custa a frio):
+    python warmup.py
+    python warmup.py --steps final mid --json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence
+
+from metrics import REGISTRY
+
+
+STEPS = ("final", "mid", "holidays", "schedules", "soffice")
+# Etapas que só aquecem a memória do processo (workers do serviço)
+IN_PROCESS_STEPS = ("final", "mid", "holidays", "schedules")
+
+WARMUP_SECONDS = REGISTRY.histogram(
+    "estagio_warmup_seconds",
+    "Duração de cada etapa do aquecimento",
+    [0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60], ["step"])
+WARMUP_FAILURES = REGISTRY.counter(
+    "estagio_warmup_failures_total",
+    "Etapas do aquecimento que falharam", ["step"])
+
+
+@dataclass
+class StepResult:
+    """Resultado de uma etapa do aquecimento"""
+    name: str
+    ok: bool
+    seconds: float
+    detail: str = ""
+
+
+@dataclass
+class WarmupReport:
+    """Etapas executadas; o processo está pronto quando finished_at é preenchido"""
+    steps: List[StepResult] = field(default_factory=list)
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def ok(self) -> bool:
+        return all(step.ok for step in self.steps)
+
+    def run(self, name: str, step: Callable[[], str]) -> StepResult:
+        """Executa uma etapa; uma falha é registrada e não interrompe as seguintes"""
+        started = time.perf_counter()
+        try:
+            result = StepResult(name, True, 0.0, step())
+        except Exception as e:
+            WARMUP_FAILURES.inc(step=name)
+            result = StepResult(name, False, 0.0, f"{type(e).__name__}: {e}")
+        result.seconds = time.perf_counter() - started
+        WARMUP_SECONDS.observe(result.seconds, step=name)
+        self.steps.append(result)
+        return result
+
+    def finish(self) -> "WarmupReport":
+        self.finished_at = time.time()
+        return self
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ok": self.ok,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3),
+            "steps": [asdict(step) for step in self.steps],
+        }
+
+    def format(self) -> str:
+        status = ("pronto" if self.ok else "pronto com falhas") if self.ready else "aquecendo"
+        lines = [f"Aquecimento: {status} ({self.as_dict()['seconds']:.2f}s)"]
+        for step in self.steps:
+            mark = "ok" if step.ok else "ERRO"
+            lines.append(f"  {step.name:<10} {mark:<4} {step.seconds * 1000:8.0f} ms  {step.detail}")
+        return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------
+# Etapas
+# ----------------------------------------------------------------------
+def sample_document():
+    """Estudante de exemplo: 13 encontros, para passar pelas três folhas de frequência"""
+    from models import DocumentData, InternshipData, ShiftData, UserData
+    return DocumentData(
+        user=UserData(nome="Aquecimento", ra="0000000000", polo="", turma="", telefone_ddd="00",
+                      telefone_numero="000000000", email="aquecimento@example.com", semestre="",
+                      data="01 de Janeiro de 2026"),
+        internship=InternshipData(disciplina_estagio="Aquecimento", codigo_disciplina="", local_estagio="",
+                                  supervisor_estagio="", carga_horaria=100,
+                                  titulo_atividade_obrigatoria="Aquecimento"),
+        shifts=[ShiftData("08:00", "12:00", f"{day:02d}/03/2026", "Aquecimento") for day in range(2, 15)],
+    )
+
+
+def warm_final_templates() -> str:
+    """Templates PDF em cache e um preenchimento em memória de cada documento final"""
+    from docs_filler import DocFiller, PDFConfig
+    fillers = [filler for group in DocFiller(sample_document()).get_fillers().values() for filler in group]
+    for filler in fillers:
+        filler.get_inputs()
+        doc, _ = PDFConfig.open_template(filler.get_template_name())
+        try:
+            filler.fill_page(doc[0], doc)
+        finally:
+            doc.close()
+    return f"{len(fillers)} template(s) PDF"
+
+
+def warm_mid_templates() -> str:
+    """Templates DOCX, assinatura e registro de layout dos PDFs pré-renderizados"""
+    import mid_internship_fillers
+    from mid_pdf_templates import load_prerendered, stamp_template
+    document_data = sample_document()
+    mid_internship_fillers.load_signature()
+    prerendered = 0
+    for filler_class in mid_internship_fillers.MID_INTERNSHIP_FILLERS:
+        filler = filler_class(document_data)
+        filler.get_inputs()
+        docx_path = os.path.join(mid_internship_fillers.TEMPLATES_DIR, filler.TEMPLATE_NAME)
+        template = load_prerendered(filler.TEMPLATE_NAME, docx_path)
+        if template is not None:
+            prerendered += 1
+            stamp_template(template, filler.get_mapping()).close()
+        else:
+            doc, _ = mid_internship_fillers.load_docx_template(docx_path)
+            filler._replace_placeholders(doc, filler.get_mapping())
+    total = len(mid_internship_fillers.MID_INTERNSHIP_FILLERS)
+    return f"{total} template(s) DOCX, {prerendered} pré-renderizado(s)"
+
+
+def calendar_polos() -> List[str]:
+    """Um polo por calendário de feriados distinto ("" = só feriados nacionais)"""
+    from date_utils import get_holiday_calendar_key, get_polo_regions
+    polos: Dict[tuple, str] = {}
+    for polo in ["", *get_polo_regions()]:
+        polos.setdefault(get_holiday_calendar_key(polo), polo)
+    return list(polos.values())
+
+
+def warm_holidays() -> str:
+    """Tabela de feriados e índice de cada calendário (ano anterior, atual e seguinte)"""
+    from date_utils import INDEX_CACHE_SIZE, get_holiday_index
+    from holiday_table import get_holiday_table
+    table = get_holiday_table()
+    year = date.today().year
+    polos = calendar_polos()[:INDEX_CACHE_SIZE]
+    for polo in polos:
+        get_holiday_index(polo).between(date(year - 1, 1, 1), date(year + 1, 12, 31))
+    return f"{len(polos)} calendário(s), tabela {'carregada' if table is not None else 'ausente'}"
+
+
+def warm_schedules() -> str:
+    """Cronogramas compartilhados de cada template cadastrado, para cada calendário"""
+    from schedule import SCHEDULE_CACHE_SIZE, build_template_schedule, get_schedule_cache, template_schedule_version
+    from template_repository import get_template_repository
+    repository = get_template_repository()
+    cache = get_schedule_cache()
+    polos = calendar_polos()
+    built = 0
+    for key in repository.keys():
+        config = repository.get(key)
+        if not config:
+            continue
+        for polo in polos:
+            if built >= SCHEDULE_CACHE_SIZE:
+                return f"{built} cronograma(s) (limite do cache)"
+            version = template_schedule_version(key, repository.revision(key), config, polo)
+            cache.get(version, lambda: build_template_schedule(config, polo, version))
+            built += 1
+    return f"{built} cronograma(s)"
+
+
+def warm_soffice(force: bool = False) -> str:
+    """Uma conversão com o perfil padrão do LibreOffice (o mesmo da conversão síncrona)"""
+    from docx import Document
+    from mid_internship_fillers import CONVERSION_TIMEOUT, build_soffice_command, run_soffice
+    from mid_internship_fillers import MID_INTERNSHIP_FILLERS, TEMPLATES_DIR
+    from mid_pdf_templates import load_prerendered
+    if not shutil.which("soffice"):
+        return "LibreOffice indisponível"
+    if not force and all(load_prerendered(cls.TEMPLATE_NAME, os.path.join(TEMPLATES_DIR, cls.TEMPLATE_NAME))
+                         for cls in MID_INTERNSHIP_FILLERS):
+        return "dispensado (relatórios pré-renderizados)"
+    with tempfile.TemporaryDirectory(prefix="warmup_") as tmp_dir:
+        docx_path = os.path.join(tmp_dir, "warmup.docx")
+        Document().save(docx_path)
+        run_soffice(build_soffice_command(docx_path, outdir=tmp_dir), timeout=CONVERSION_TIMEOUT)
+        if not os.path.exists(os.path.join(tmp_dir, "warmup.pdf")):
+            raise RuntimeError("o LibreOffice não gerou o PDF")
+    return "perfil do LibreOffice pronto"
+
+
+STEP_FUNCTIONS: Dict[str, Callable[[], str]] = {
+    "final": warm_final_templates,
+    "mid": warm_mid_templates,
+    "holidays": warm_holidays,
+    "schedules": warm_schedules,
+    "soffice": warm_soffice,
+}
+
+
+# ----------------------------------------------------------------------
+# Execução
+# ----------------------------------------------------------------------
+def warm_up(steps: Sequence[str] = STEPS, report: Optional[WarmupReport] = None) -> WarmupReport:
+    """Executa as etapas neste processo e retorna o relatório"""
+    report = report if report is not None else WarmupReport()
+    for name in steps:
+        report.run(name, STEP_FUNCTIONS[name])
+    return report.finish()
+
+
+def warm_process(steps: Sequence[str] = IN_PROCESS_STEPS) -> dict:
+    """Ponto de entrada nos workers do pool (o relatório volta como dict)"""
+    report = warm_up(steps)
+    return {"pid": os.getpid(), **report.as_dict()}
+
+
+_report: Optional[WarmupReport] = None
+_report_lock = threading.Lock()
+
+
+def start_warmup(steps: Sequence[str] = STEPS) -> WarmupReport:
+    """Inicia (uma vez por processo) o aquecimento em segundo plano e retorna o relatório em andamento"""
+    global _report
+    with _report_lock:
+        if _report is None:
+            _report = WarmupReport()
+            threading.Thread(target=warm_up, args=(steps, _report), name="warmup", daemon=True).start()
+        return _report
+
+
+def get_warmup_report() -> Optional[WarmupReport]:
+    """Relatório do aquecimento deste processo (None se não foi iniciado)"""
+    return _report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aquecimento dos caches e do LibreOffice")
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=list(STEPS))
+    parser.add_argument("--json", action="store_true", help="Relatório em JSON")
+    args = parser.parse_args(argv)
+
+    report = warm_up(args.steps)
+    print(json.dumps(report.as_dict(), indent=2, ensure_ascii=False) if args.json else report.format())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())